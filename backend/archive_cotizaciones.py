@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, or_
+from app import app, db, Cotizacion
+from database import Orden, CotizacionArchivada, OrdenArchivada
+import change_feed
+
+# ==========================================
+# 🗃️ ARCHIVADO DE COTIZACIONES Y ÓRDENES ANTIGUAS
+# ==========================================
+# Mueve a cotizacion_archivo / orden_archivo lo que ya está cerrado y tiene
+# fecha_pedido anterior al horizonte (ARCHIVO_HORIZONTE_DIAS, 2 años por
+# defecto):
+#   - cotizaciones sin orden (nunca se confirmaron),
+#   - cotizaciones cuya orden está entregada o cancelada (se mueven juntas).
+# Las órdenes en proceso y sus cotizaciones no se tocan.
+#
+# Así cotizacion/orden (listas, joins, búsqueda, feed) solo tienen lo reciente
+# o abierto. Los detalles (/orders/:id, /ordenes/:id, imágenes, tickets) y las
+# cotizaciones parecidas siguen encontrando lo archivado con los mismos ids, y
+# los reportes suman las dos tablas. Cada lote es una transacción (copiar +
+# borrar), así que se puede cortar y volver a correr; pensado para un cron
+# nocturno.
+
+HORIZONTE_DIAS = int(os.getenv('ARCHIVO_HORIZONTE_DIAS', 730))
+ESTADOS_CERRADOS = ('entregado', 'cancelado')
+
+_COLUMNAS_COTIZACION = [c.name for c in Cotizacion.__table__.columns]
+_COLUMNAS_ORDEN = [c.name for c in Orden.__table__.columns]
+
+def _pendientes(corte, desde_id, lote):
+    stmt = (
+        select(Cotizacion.id, Cotizacion.cliente_id, Orden.id.label('orden_id'))
+        .outerjoin(Orden, Orden.cotizacion_id == Cotizacion.id)
+        .where(
+            Cotizacion.id > desde_id,
+            Cotizacion.fecha_pedido < corte,
+            or_(Orden.id.is_(None), Orden.estado.in_(ESTADOS_CERRADOS))
+        )
+        .order_by(Cotizacion.id)
+        .limit(lote)
+    )
+    return db.session.execute(stmt).all()
+
+def _archivar_lote(filas):
+    """Copia y borra un lote en una sola transacción; deja lápidas en el feed de cambios."""
+    cot_ids = [f.id for f in filas]
+    orden_ids = [f.orden_id for f in filas if f.orden_id is not None]
+
+    db.session.execute(insert(CotizacionArchivada).from_select(
+        _COLUMNAS_COTIZACION,
+        select(*[Cotizacion.__table__.c[n] for n in _COLUMNAS_COTIZACION]).where(Cotizacion.id.in_(cot_ids))
+    ))
+    if orden_ids:
+        db.session.execute(insert(OrdenArchivada).from_select(
+            _COLUMNAS_ORDEN,
+            select(*[Orden.__table__.c[n] for n in _COLUMNAS_ORDEN]).where(Orden.id.in_(orden_ids))
+        ))
+        db.session.execute(delete(Orden).where(Orden.id.in_(orden_ids)))
+    db.session.execute(delete(Cotizacion).where(Cotizacion.id.in_(cot_ids)))
+
+    # Para las copias locales de /ordenes/changes es lo mismo que un borrado
+    change_feed.registrar(
+        [('orden', f.orden_id, f.cliente_id, 'delete') for f in filas if f.orden_id is not None] +
+        [('cotizacion', f.id, f.cliente_id, 'delete') for f in filas]
+    )
+    db.session.commit()
+    change_feed.notificar()
+    return len(cot_ids), len(orden_ids)
+
+def archivar(horizonte_dias=HORIZONTE_DIAS, lote=500, dry_run=False):
+    corte = datetime.utcnow() - timedelta(days=horizonte_dias)
+    print(f"🗃️ Archivando cotizaciones cerradas con fecha_pedido anterior a {corte:%Y-%m-%d} "
+          f"(lotes de {lote}{', simulación' if dry_run else ''})...")
+    cotizaciones, ordenes = 0, 0
+    ultimo_id = 0
+    inicio = time.perf_counter()
+    with app.app_context():
+        while True:
+            filas = _pendientes(corte, ultimo_id, lote)
+            if not filas:
+                break
+            ultimo_id = filas[-1].id
+            if dry_run:
+                cotizaciones += len(filas)
+                ordenes += sum(1 for f in filas if f.orden_id is not None)
+                continue
+            try:
+                c, o = _archivar_lote(filas)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Lote hasta id {ultimo_id}: {e}")
+                raise
+            cotizaciones += c
+            ordenes += o
+            print(f"✅ {cotizaciones} cotizaciones / {ordenes} órdenes (hasta id {ultimo_id})")
+
+    transcurrido = time.perf_counter() - inicio
+    print(f"✨ Archivado {'simulado' if dry_run else 'completado'}. Cotizaciones: {cotizaciones}, "
+          f"órdenes: {ordenes}, {transcurrido:.1f}s")
+    return {"cotizaciones": cotizaciones, "ordenes": ordenes, "segundos": transcurrido}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mueve cotizaciones/órdenes cerradas y antiguas a las tablas de archivo.")
+    parser.add_argument('--dias', type=int, default=HORIZONTE_DIAS,
+                        help=f"Antigüedad mínima de fecha_pedido en días (default {HORIZONTE_DIAS})")
+    parser.add_argument('--lote', type=int, default=500, help="Cotizaciones por transacción (default 500)")
+    parser.add_argument('--dry-run', action='store_true', help="Solo cuenta lo que se archivaría")
+    args = parser.parse_args()
+
+    try:
+        archivar(horizonte_dias=args.dias, lote=args.lote, dry_run=args.dry_run)
+    except Exception:
+        sys.exit(1)
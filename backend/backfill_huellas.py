@@ -0,0 +1,88 @@
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select
+from app import app, db, Cotizacion
+from database import HuellaDiseno
+import image_derivatives
+import huellas_services
+
+# ==========================================
+# 🔍 BACKFILL DE HUELLAS DE DISEÑO
+# ==========================================
+# Calcula la huella (huellas_services) de las cotizaciones con imagen que aún
+# no tienen una: las anteriores al índice y las guardadas sin la huella de
+# /process (p. ej. importaciones por lote). Solo recorre las que faltan, así
+# que se puede cortar y volver a correr; las que fallan (imagen inaccesible)
+# se reintentan en la próxima corrida.
+
+def _pendientes(desde_id, lote):
+    stmt = (
+        select(Cotizacion.id, Cotizacion.datos_json)
+        .outerjoin(HuellaDiseno, HuellaDiseno.cotizacion_id == Cotizacion.id)
+        .where(
+            Cotizacion.id > desde_id,
+            HuellaDiseno.id.is_(None),
+            Cotizacion.datos_json.isnot(None),
+            Cotizacion.datos_json != ''
+        )
+        .order_by(Cotizacion.id)
+        .limit(lote)
+    )
+    return db.session.execute(stmt).all()
+
+def _huella(fila):
+    imagen = image_derivatives.cargar_imagen_guardada(fila.datos_json)
+    if imagen is None:
+        return None
+    with imagen:
+        return huellas_services.calcular(imagen)
+
+def backfill_huellas(workers=4, lote=100):
+    """
+    Recorre las cotizaciones sin huella por id, de `lote` en `lote`. Las
+    imágenes se descargan/abren en paralelo (pueden ser URLs de Cloudinary) y
+    cada lote se guarda con un solo INSERT.
+    """
+    print(f"🚀 Calculando huellas faltantes ({workers} hilos, lotes de {lote})...")
+    calculadas, sin_imagen, errores = 0, 0, 0
+    ultimo_id = 0
+    inicio = time.perf_counter()
+    with app.app_context(), ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            filas = _pendientes(ultimo_id, lote)
+            if not filas:
+                break
+            ultimo_id = filas[-1].id
+            futuros = [(fila.id, pool.submit(_huella, fila)) for fila in filas]
+            huellas = []
+            for cot_id, futuro in futuros:
+                try:
+                    huella = futuro.result()
+                except Exception as e:
+                    print(f"❌ Cotización {cot_id}: {e}")
+                    errores += 1
+                    continue
+                if huella is None:
+                    sin_imagen += 1
+                else:
+                    huellas.append((cot_id, huella))
+            huellas_services.guardar_lote(huellas)
+            calculadas += len(huellas)
+            transcurrido = time.perf_counter() - inicio
+            print(f"✅ {calculadas} huellas (hasta id {ultimo_id}, {calculadas / transcurrido:.1f} img/s)")
+
+    transcurrido = time.perf_counter() - inicio
+    print(f"✨ Backfill completado. Huellas: {calculadas}, sin imagen: {sin_imagen}, errores: {errores}, "
+          f"{transcurrido:.1f}s")
+    return {"calculadas": calculadas, "sin_imagen": sin_imagen, "errores": errores, "segundos": transcurrido}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calcula las huellas de diseño de cotizaciones que no la tienen.")
+    parser.add_argument('--workers', type=int, default=4, help="Imágenes en paralelo (default 4)")
+    parser.add_argument('--lote', type=int, default=100, help="Cotizaciones por lote (default 100)")
+    args = parser.parse_args()
+
+    resultado = backfill_huellas(workers=args.workers, lote=args.lote)
+    sys.exit(1 if resultado['errores'] else 0)
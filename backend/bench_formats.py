@@ -0,0 +1,77 @@
+import gzip
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+import response_formats
+
+# Dataset realista: órdenes como las devuelve Orden.to_summary_dict()
+N_FILAS = [100, 1000, 5000]
+REPETICIONES = 5
+
+NOMBRES = ['Colegio San Andrés', 'Club Deportivo Bolívar', 'Panadería La Espiga', 'Taller Mecánico Núñez',
+           'Unidad Educativa Santa María', 'Restaurante El Fogón', 'Farmacia Central', 'Academia de Danza Ñusta']
+TRABAJOS = ['Logo pecho izquierdo', 'Escudo espalda', 'Nombre en manga', 'Gorra frontal', 'Parche bordado']
+
+def generar_ordenes(n, semilla=42):
+    rnd = random.Random(semilla)
+    base = datetime(2024, 1, 1)
+    filas = []
+    for i in range(1, n + 1):
+        creada = base + timedelta(minutes=rnd.randint(0, 60 * 24 * 600))
+        filas.append({
+            "id": i,
+            "cotizacion_id": i + 1000,
+            "estado": rnd.choice(['en_proceso', 'en_proceso', 'entregado', 'cancelado']),
+            "fecha_entrega": (creada + timedelta(days=rnd.randint(2, 20))).date().isoformat(),
+            "detail": rnd.choice(['', 'Hilo dorado', 'Entregar en caja', 'Cliente recoge en tienda']),
+            "fecha_creacion": creada.isoformat(),
+            "cliente_id": rnd.randint(1, 400),
+            "nombre_trabajo": rnd.choice(TRABAJOS),
+            "cliente_nombre": rnd.choice(NOMBRES),
+            "precio_total": round(rnd.uniform(20, 3000), 2),
+            "cantidad": rnd.randint(1, 300),
+            "fecha_pedido": (creada - timedelta(days=rnd.randint(0, 5))).isoformat(),
+            "puntadas": rnd.randint(2000, 40000),
+            "colores": rnd.randint(1, 9),
+            "personal_id": rnd.randint(1, 30),
+            "personal_nombre": f"Empleado {rnd.randint(1, 30)}"
+        })
+    return filas
+
+def _medir(fn):
+    tiempos = []
+    resultado = None
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, statistics.median(tiempos)
+
+def bench_formats():
+    """Tamaño y tiempo de codificación de cada combinación formato + compresión."""
+    codificadores = {
+        'json': lambda f: json.dumps(f, ensure_ascii=False).encode(),
+        'columnar': lambda f: json.dumps(response_formats.a_columnar(f), ensure_ascii=False, separators=(',', ':')).encode(),
+    }
+    if response_formats.msgpack is not None:
+        codificadores['msgpack'] = lambda f: response_formats.msgpack.packb(response_formats.a_columnar(f), use_bin_type=True)
+    compresiones = {'-': lambda b: b, 'gzip': lambda b: gzip.compress(b, compresslevel=6)}
+    if response_formats.brotli is not None:
+        compresiones['br'] = lambda b: response_formats.brotli.compress(b, quality=5)
+
+    for n in N_FILAS:
+        filas = generar_ordenes(n)
+        print(f"\n📦 {n} órdenes")
+        print(f"{'formato':<10} | {'compresión':<10} | {'bytes':>10} | {'vs json':>8} | {'ms':>7}")
+        referencia = None
+        for nombre, codificar in codificadores.items():
+            crudo, ms_codificar = _medir(lambda: codificar(filas))
+            for comp, comprimir in compresiones.items():
+                cuerpo, ms_comprimir = _medir(lambda: comprimir(crudo))
+                referencia = referencia or len(cuerpo)
+                print(f"{nombre:<10} | {comp:<10} | {len(cuerpo):>10} | {len(cuerpo) / referencia:>7.0%} | {ms_codificar + ms_comprimir:>7.1f}")
+
+if __name__ == '__main__':
+    bench_formats()
@@ -0,0 +1,108 @@
+import os
+import statistics
+import sys
+import time
+
+# Bases locales en memoria para no tocar MySQL/PostgreSQL
+os.environ.setdefault('DATABASE_MYSQL', 'sqlite:///:memory:')
+os.environ.setdefault('DATABASE_POSTGRESQL', 'sqlite:///:memory:')
+
+from werkzeug.security import generate_password_hash, check_password_hash
+from app import app, db
+from database import Personal
+import db_services
+
+REPETICIONES = 5
+TAMANOS_PERSONAL = [1, 10, 30, 100]
+METODOS_CANDIDATOS = ['scrypt:16384:8:1', 'scrypt:32768:8:1', 'scrypt:65536:8:1', 'pbkdf2:sha256:600000']
+
+def _preparar_personal(n, hash_otro, hash_objetivo):
+    Personal.query.delete()
+    db.session.commit()
+    for i in range(n - 1):
+        db.session.add(Personal(
+            # pyrefly: ignore [unexpected-keyword]
+            nombre=f"Empleado {i}", usuario=f"empleado{i}", rol='empleado', password_hash=hash_otro, activo=True
+        ))
+    objetivo = Personal(
+        # pyrefly: ignore [unexpected-keyword]
+        nombre="Objetivo", usuario="objetivo", rol='empleado', password_hash=hash_objetivo, activo=True
+    )
+    db.session.add(objetivo)
+    db.session.commit()
+    return objetivo.id
+
+def _medir(fn):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+def _cambio_anterior(current):
+    # Algoritmo previo: probar el hash de cada usuario activo hasta encontrar uno
+    for u in db_services.get_all_active_users():
+        if check_password_hash(u.password_hash, current):
+            return u
+
+def bench_password():
+    """
+    Compara POST /config/password (una verificación por usuario) con el recorrido
+    anterior sobre todo el personal. El tiempo nuevo debe ser constante en N.
+    """
+    hash_otro = generate_password_hash('otra-clave')
+    hash_objetivo = generate_password_hash('clave-objetivo')
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        print(f"{'personal':>9} | {'nuevo (ms)':>10} | {'anterior (ms)':>13}")
+        for n in TAMANOS_PERSONAL:
+            user_id = _preparar_personal(n, hash_otro, hash_objetivo)
+            payload = {"user_id": user_id, "current_password": 'clave-objetivo', "new_password": 'clave-objetivo'}
+
+            def cambio_nuevo():
+                res = client.post('/config/password', json=payload)
+                assert res.status_code == 200, res.get_json()
+                # El endpoint regenera el hash; se restaura para la siguiente vuelta
+                db_services.update_user_password(user_id, hash_objetivo)
+
+            nuevo = _medir(cambio_nuevo)
+            anterior = _medir(lambda: _cambio_anterior('clave-objetivo'))
+            print(f"{n:>9} | {nuevo:>10.1f} | {anterior:>13.1f}")
+
+def _memoria_mb(metodo):
+    # scrypt usa 128 * N * r bytes por verificación
+    partes = metodo.split(':')
+    if partes[0] != 'scrypt':
+        return 0.0
+    n, r = int(partes[1]), int(partes[2])
+    return 128 * n * r / (1024 * 1024)
+
+def bench_metodos():
+    """
+    Mide en esta máquina el costo de cada PASSWORD_HASH_METHOD candidato y el
+    throughput de logins con el pool acotado (PASSWORD_WORKERS hilos).
+    Correr en el servidor de producción antes de cambiar el método.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import password_services
+
+    workers = password_services.PASSWORD_WORKERS
+    print(f"{'método':<22} | {'verificar (ms)':>14} | {'memoria (MB)':>12} | {'logins/s ({} hilos)'.format(workers):>20}")
+    for metodo in METODOS_CANDIDATOS:
+        h = generate_password_hash('clave', metodo)
+        ms = _medir(lambda: check_password_hash(h, 'clave'))
+        total = workers * 4
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda _: check_password_hash(h, 'clave'), range(total)))
+        por_segundo = total / (time.perf_counter() - inicio)
+        print(f"{metodo:<22} | {ms:>14.1f} | {_memoria_mb(metodo):>12.1f} | {por_segundo:>20.1f}")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'metodos':
+        bench_metodos()
+    else:
+        bench_password()
@@ -0,0 +1,93 @@
+import os
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+# Bases locales en memoria para no tocar MySQL/PostgreSQL
+os.environ.setdefault('DATABASE_MYSQL', 'sqlite:///:memory:')
+os.environ.setdefault('DATABASE_POSTGRESQL', 'sqlite:///:memory:')
+
+from app import app, db
+from database import Clientes, Personal, Cotizacion, Orden
+import db_services
+import serializers
+import response_formats
+import query_stats
+
+N_ORDENES = [100, 1000, 5000]
+N_CLIENTES = 200
+N_PERSONAL = 20
+REPETICIONES = 5
+
+def _sembrar(n, semilla=42):
+    rnd = random.Random(semilla)
+    Orden.query.delete()
+    Cotizacion.query.delete()
+    Clientes.query.delete()
+    Personal.query.delete()
+    db.session.commit()
+    # pyrefly: ignore [unexpected-keyword]
+    db.session.add_all(Clientes(id=i, nombre=f"Cliente {i}") for i in range(1, N_CLIENTES + 1))
+    db.session.add_all(
+        # pyrefly: ignore [unexpected-keyword]
+        Personal(id=i, nombre=f"Empleado {i}", usuario=f"empleado{i}", rol='empleado', password_hash='x')
+        for i in range(1, N_PERSONAL + 1)
+    )
+    base = datetime(2024, 1, 1)
+    for i in range(1, n + 1):
+        pedido = base + timedelta(minutes=rnd.randint(0, 60 * 24 * 600))
+        db.session.add(Cotizacion(
+            # pyrefly: ignore [unexpected-keyword]
+            id=i, cliente_id=rnd.randint(1, N_CLIENTES), configuracion_id=1, nombre_trabajo=f"Trabajo {i}",
+            # pyrefly: ignore [unexpected-keyword]
+            fecha_pedido=pedido, puntadas=rnd.randint(2000, 40000), colores=rnd.randint(1, 9),
+            # pyrefly: ignore [unexpected-keyword]
+            ancho=10, alto=8, cantidad=rnd.randint(1, 300), precio_unitario=12.5, precio_total=rnd.randint(20, 3000),
+            # pyrefly: ignore [unexpected-keyword]
+            personal_id=rnd.randint(1, N_PERSONAL)
+        ))
+        db.session.add(Orden(
+            # pyrefly: ignore [unexpected-keyword]
+            id=i, cotizacion_id=i, estado='en_proceso', fecha_entrega=(pedido + timedelta(days=7)).date(),
+            # pyrefly: ignore [unexpected-keyword]
+            fecha_creacion=pedido, personal_id=rnd.randint(1, N_PERSONAL)
+        ))
+    db.session.commit()
+
+def _medir(fn):
+    tiempos = []
+    resultado, consultas = None, 0
+    for _ in range(REPETICIONES):
+        db.session.expunge_all()  # sin identity map caliente entre vueltas
+        with query_stats.medir() as stats:
+            inicio = time.perf_counter()
+            resultado = fn()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas = stats.consultas
+    return resultado, statistics.median(tiempos), consultas
+
+def bench_serializacion():
+    """
+    Compara GET /ordenes armado con to_summary_dict() + json contra el camino
+    rápido (SELECT de columnas + conversores precompilados + orjson).
+    Verifica además que ambos produzcan exactamente el mismo JSON.
+    """
+    print(f"orjson: {'sí' if response_formats.orjson is not None else 'no (json estándar)'}")
+    with app.app_context():
+        db.create_all()
+        print(f"{'órdenes':>8} | {'to_dict (ms)':>12} | {'consultas':>9} | {'rápido (ms)':>11} | {'consultas':>9} | {'x':>5}")
+        for n in N_ORDENES:
+            _sembrar(n)
+            anterior, ms_anterior, q_anterior = _medir(
+                lambda: json.dumps([o.to_summary_dict() for o in db_services.get_all_ordenes()]).encode()
+            )
+            rapido, ms_rapido, q_rapido = _medir(
+                lambda: response_formats.dumps(serializers.ordenes_resumen())
+            )
+            assert json.loads(anterior) == json.loads(rapido), "El camino rápido no coincide con to_summary_dict()"
+            print(f"{n:>8} | {ms_anterior:>12.1f} | {q_anterior:>9} | {ms_rapido:>11.1f} | {q_rapido:>9} | {ms_anterior / ms_rapido:>5.1f}")
+
+if __name__ == '__main__':
+    bench_serializacion()
@@ -0,0 +1,219 @@
+import os
+import json
+import base64
+import hashlib
+import binascii
+import tempfile
+import urllib.parse
+import urllib.request
+
+# ==========================================
+# 🗄️ ALMACÉN DE IMÁGENES DIRECCIONADO POR CONTENIDO
+# ==========================================
+# Las imágenes se guardan fuera de las tablas, con el sha256 del contenido como
+# nombre: un mismo logo subido N veces se guarda una sola vez. En
+# cotizacion.datos_json queda solo la referencia compacta "blob:sha256:<hex>"
+# (o dentro de "imagen_procesada" si datos_json es el JSON legacy).
+
+PREFIJO_REF = 'blob:sha256:'
+
+# Descargas de imágenes guardadas como URL: solo de hosts propios y con tope de tamaño
+# (datos_json viene del cliente; sin esto el servidor bajaría cualquier URL).
+HOSTS_PERMITIDOS = {
+    h.strip().lower() for h in os.getenv('IMAGEN_HOSTS_PERMITIDOS', 'res.cloudinary.com').split(',') if h.strip()
+}
+DESCARGA_MAX_BYTES = int(float(os.getenv('IMAGEN_DESCARGA_MAX_MB', 15)) * 1024 * 1024)
+
+EXTENSIONES = {
+    'image/png': 'png', 'image/jpeg': 'jpg', 'image/webp': 'webp', 'image/gif': 'gif', 'image/svg+xml': 'svg'
+}
+TIPOS = {ext: mime for mime, ext in EXTENSIONES.items()}
+
+def tipo_de_contenido(contenido):
+    """Content type según los primeros bytes (PNG, JPEG, GIF, WebP), o None si no es una imagen conocida."""
+    if contenido.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if contenido.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if contenido[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if contenido[:4] == b'RIFF' and contenido[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+def es_referencia(valor):
+    return isinstance(valor, str) and valor.startswith(PREFIJO_REF)
+
+def digest_de(ref):
+    return ref[len(PREFIJO_REF):]
+
+def decodificar_data_url(valor):
+    """
+    Devuelve (bytes, content_type) de un data URL o Base64 crudo (legacy, PNG).
+    Devuelve (None, None) si el valor no es una imagen inline. El content
+    type sale de los bytes decodificados, no de la cabecera del data URL: un
+    texto que por casualidad es Base64 válido ("null", "abcd") no es imagen.
+    """
+    if not valor or not isinstance(valor, str) or valor.startswith('http') or es_referencia(valor):
+        return None, None
+    datos = valor.partition(',')[2] if valor.startswith('data:') else valor
+    try:
+        contenido = base64.b64decode(datos, validate=True)
+    except (binascii.Error, ValueError):
+        return None, None
+    content_type = tipo_de_contenido(contenido)
+    if content_type is None:
+        return None, None
+    return contenido, content_type
+
+class DescargaNoPermitida(Exception):
+    """URL fuera de IMAGEN_HOSTS_PERMITIDOS o más grande que IMAGEN_DESCARGA_MAX_MB."""
+
+def _hosts_permitidos():
+    hosts = set(HOSTS_PERMITIDOS)
+    base = urllib.parse.urlsplit(os.getenv('BLOB_BASE_URL', ''))
+    if base.hostname:
+        hosts.add(base.hostname.lower())
+    return hosts
+
+def descargar(url, timeout=10):
+    """Baja una imagen de un host permitido, leyendo como máximo DESCARGA_MAX_BYTES."""
+    partes = urllib.parse.urlsplit(url)
+    if partes.scheme not in ('http', 'https') or (partes.hostname or '').lower() not in _hosts_permitidos():
+        raise DescargaNoPermitida(f"Host no permitido: {partes.hostname}")
+    with urllib.request.urlopen(url, timeout=timeout) as res:
+        largo = res.headers.get('Content-Length')
+        if largo and largo.isdigit() and int(largo) > DESCARGA_MAX_BYTES:
+            raise DescargaNoPermitida(f"Imagen de {int(largo)} bytes")
+        contenido = res.read(DESCARGA_MAX_BYTES + 1)
+    if len(contenido) > DESCARGA_MAX_BYTES:
+        raise DescargaNoPermitida(f"Imagen de más de {DESCARGA_MAX_BYTES} bytes")
+    return contenido
+
+class FilesystemBlobStore:
+    """Guarda cada blob en <root>/<ab>/<cd>/<sha256>.<ext>."""
+    def __init__(self, root, base_url='/blobs'):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(root, exist_ok=True)
+
+    def _ruta(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def _buscar(self, digest):
+        carpeta = os.path.dirname(self._ruta(digest))
+        if os.path.isdir(carpeta):
+            for nombre in os.listdir(carpeta):
+                if nombre.split('.', 1)[0] == digest:
+                    return os.path.join(carpeta, nombre)
+        return None
+
+    def put(self, contenido, content_type='image/png'):
+        digest = hashlib.sha256(contenido).hexdigest()
+        if not self._buscar(digest):
+            ruta = f"{self._ruta(digest)}.{EXTENSIONES.get(content_type, 'bin')}"
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            # Escritura atómica: otro proceso nunca ve un archivo a medias
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(contenido)
+            os.replace(tmp, ruta)
+        return PREFIJO_REF + digest
+
+    def open(self, digest):
+        """(ruta, content_type) del blob, o (None, None) si no existe."""
+        ruta = self._buscar(digest) if all(c in '0123456789abcdef' for c in digest) and len(digest) == 64 else None
+        if not ruta:
+            return None, None
+        ext = ruta.rsplit('.', 1)[-1] if '.' in os.path.basename(ruta) else ''
+        return ruta, TIPOS.get(ext, 'application/octet-stream')
+
+    def get(self, ref):
+        ruta, _ = self.open(digest_de(ref))
+        if not ruta:
+            return None
+        with open(ruta, 'rb') as f:
+            return f.read()
+
+    def url(self, ref):
+        url = f"{self.base_url}/{digest_de(ref)}"
+        if url.startswith('/'):
+            # URL relativa: se completa con el host de la API para que el frontend la pueda usar
+            from flask import has_request_context, request
+            if has_request_context():
+                return request.host_url.rstrip('/') + url
+        return url
+
+class CloudinaryBlobStore:
+    """Adaptador Cloudinary: el public_id es el digest, así que no duplica."""
+    def __init__(self, folder='zequitex_blobs'):
+        self.folder = folder
+
+    def put(self, contenido, content_type='image/png'):
+        import cloudinary.uploader
+        digest = hashlib.sha256(contenido).hexdigest()
+        cloudinary.uploader.upload(
+            contenido, folder=self.folder, public_id=digest,
+            overwrite=False, unique_filename=False, resource_type="image"
+        )
+        return PREFIJO_REF + digest
+
+    def get(self, ref):
+        return descargar(self.url(ref))
+
+    def url(self, ref):
+        from cloudinary import CloudinaryImage
+        return CloudinaryImage(f"{self.folder}/{digest_de(ref)}").build_url(
+            secure=True, fetch_format="auto", quality="auto"
+        )
+
+_store = None
+
+def get_store():
+    """Almacén configurado por BLOB_STORE (filesystem | cloudinary)."""
+    global _store
+    if _store is None:
+        if os.getenv('BLOB_STORE', 'filesystem') == 'cloudinary':
+            _store = CloudinaryBlobStore(os.getenv('BLOB_CLOUDINARY_FOLDER', 'zequitex_blobs'))
+        else:
+            root = os.getenv('BLOB_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'blobs'))
+            _store = FilesystemBlobStore(root, os.getenv('BLOB_BASE_URL', '/blobs'))
+    return _store
+
+def compactar_datos_json(valor, store=None):
+    """
+    Guarda en el almacén la imagen inline de `valor` y devuelve el valor con la
+    referencia en su lugar. Soporta los dos formatos de datos_json: la imagen
+    sola (data URL / Base64) o el JSON legacy con "imagen_procesada".
+    """
+    if isinstance(valor, str) and valor.lstrip().startswith('{'):
+        try:
+            datos = json.loads(valor)
+        except ValueError:
+            return valor
+        imagen = datos.get('imagen_procesada') if isinstance(datos, dict) else None
+        contenido, content_type = decodificar_data_url(imagen)
+        if contenido is None:
+            return valor
+        datos['imagen_procesada'] = (store or get_store()).put(contenido, content_type)
+        return json.dumps(datos, ensure_ascii=False)
+
+    contenido, content_type = decodificar_data_url(valor)
+    if contenido is None:
+        return valor
+    return (store or get_store()).put(contenido, content_type)
+
+def resolver_imagen(valor):
+    """Convierte las referencias de blob de datos_json en URLs; lo demás se devuelve igual."""
+    if not isinstance(valor, str) or PREFIJO_REF not in valor:
+        return valor
+    if es_referencia(valor):
+        return get_store().url(valor)
+    try:
+        datos = json.loads(valor)
+    except ValueError:
+        return valor
+    if isinstance(datos, dict) and es_referencia(datos.get('imagen_procesada')):
+        datos['imagen_procesada'] = get_store().url(datos['imagen_procesada'])
+        return json.dumps(datos, ensure_ascii=False)
+    return valor
@@ -0,0 +1,261 @@
+from database import db, Cotizacion
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert, select
+import csv
+import io
+import json
+import report_services
+import db_services
+import blob_store
+import change_feed
+
+# ==========================================
+# 📥 IMPORTACIÓN MASIVA (CSV / NDJSON)
+# ==========================================
+# Las filas se leen del stream de a una, se validan y se insertan en lotes
+# (INSERT multi-fila, un commit por lote). Nunca se carga el archivo completo.
+
+TAMANO_LOTE = 500
+MAX_ERRORES_REPORTADOS = 1000
+
+def detectar_formato(formato, filename):
+    formato = (formato or '').lower()
+    if not formato and filename:
+        formato = filename.rsplit('.', 1)[-1].lower()
+    if formato in ('jsonl', 'ndjson', 'json'):
+        return 'ndjson'
+    if formato == 'csv':
+        return 'csv'
+    return None
+
+def leer_filas(stream, formato):
+    """Genera (numero_fila, dict) desde un stream binario CSV o NDJSON."""
+    texto = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        for numero, fila in enumerate(csv.DictReader(texto), start=2):  # fila 1 = cabecera
+            yield numero, {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in fila.items() if k}
+    else:
+        for numero, linea in enumerate(texto, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError as e:
+                yield numero, e
+                continue
+            yield numero, fila if isinstance(fila, dict) else ValueError("La línea no es un objeto JSON")
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, str) and valor == '')
+
+def _entero(fila, campo, errores, default=None, minimo=None, requerido=False):
+    valor = fila.get(campo)
+    if _vacio(valor):
+        if requerido:
+            errores.append(f"'{campo}' es obligatorio")
+        return default
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        errores.append(f"'{campo}' debe ser entero")
+        return default
+    if minimo is not None and numero < minimo:
+        errores.append(f"'{campo}' debe ser >= {minimo}")
+    return numero
+
+def _decimal(fila, campo, errores, default='0'):
+    valor = fila.get(campo)
+    if _vacio(valor):
+        return Decimal(default)
+    try:
+        numero = Decimal(str(valor))
+    except InvalidOperation:
+        errores.append(f"'{campo}' debe ser numérico")
+        return Decimal(default)
+    if numero < 0:
+        errores.append(f"'{campo}' no puede ser negativo")
+    return numero
+
+def _texto(fila, campo, errores, max_len=None, requerido=False, default=None):
+    valor = fila.get(campo)
+    if _vacio(valor):
+        if requerido:
+            errores.append(f"'{campo}' es obligatorio")
+        return default
+    valor = str(valor)
+    if max_len and len(valor) > max_len:
+        errores.append(f"'{campo}' supera {max_len} caracteres")
+    return valor
+
+def _booleano(valor):
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+    return bool(valor)
+
+def validar_cliente(fila):
+    errores = []
+    registro = {
+        "nombre": _texto(fila, 'nombre', errores, max_len=100, requerido=True),
+        "numero_referencia": _texto(fila, 'numero_referencia', errores, max_len=50),
+        "domicilio": _texto(fila, 'domicilio', errores),
+        "estado": True,
+        "created_at": datetime.utcnow()
+    }
+    return registro, errores
+
+def validar_cotizacion(fila, configuracion_default):
+    errores = []
+    fecha_pedido = datetime.utcnow()
+    if not _vacio(fila.get('fecha_pedido')):
+        try:
+            fecha_pedido = datetime.fromisoformat(str(fila['fecha_pedido']))
+        except ValueError:
+            errores.append("'fecha_pedido' debe ser ISO 8601 (YYYY-MM-DD[THH:MM:SS])")
+    nombre_trabajo = _texto(fila, 'nombre_trabajo', errores, max_len=150, default='Cotización')
+    precio_total = _decimal(fila, 'precio_total', errores)
+    registro = {
+        "cliente_id": _entero(fila, 'cliente_id', errores, requerido=True),
+        "configuracion_id": _entero(fila, 'configuracion_id', errores, default=configuracion_default),
+        "nombre_trabajo": nombre_trabajo,
+        "fecha_pedido": fecha_pedido,
+        "puntadas": _entero(fila, 'puntadas', errores, default=0, minimo=0),
+        "colores": _entero(fila, 'colores', errores, default=1, minimo=1),
+        "ancho": _decimal(fila, 'ancho', errores),
+        "alto": _decimal(fila, 'alto', errores),
+        "bastidor": _texto(fila, 'bastidor', errores, max_len=100, default=''),
+        "tipo_tela": _texto(fila, 'tipo_tela', errores, max_len=50, default=''),
+        "tiene_sublimacion": int(_booleano(fila.get('tiene_sublimacion', False))),
+        "cantidad": _entero(fila, 'cantidad', errores, default=1, minimo=1),
+        "precio_unitario": _decimal(fila, 'precio_unitario', errores),
+        "precio_total": precio_total,
+        "datos_json": _texto(fila, 'datos_json', errores),
+        "detalles": _texto(fila, 'detalles', errores, default=f"{nombre_trabajo} - Total: {precio_total}"),
+        "personal_id": _entero(fila, 'personal_id', errores)
+    }
+    if registro['configuracion_id'] is None:
+        errores.append("'configuracion_id' es obligatorio (no hay configuración de precios activa)")
+    return registro, errores
+
+def _insertar_lote(modelo, lote):
+    if modelo is Cotizacion:
+        lote = [{**r, "datos_json": blob_store.compactar_datos_json(r.get('datos_json'))} for r in lote]
+        ids = db.session.execute(
+            insert(modelo).returning(modelo.id, sort_by_parameter_order=True), lote
+        ).scalars().all()
+        report_services.aplicar(sumar=[a for r in lote for a in report_services.aportes_de_cotizacion(r)])
+        change_feed.registrar([('cotizacion', cot_id, r['cliente_id'], 'upsert') for cot_id, r in zip(ids, lote)])
+    else:
+        db.session.execute(insert(modelo), lote)
+    db.session.commit()
+    if modelo is Cotizacion:
+        change_feed.notificar()
+
+def importar(modelo, filas, validar, dry_run=False, tamano_lote=TAMANO_LOTE):
+    """
+    Valida e inserta filas en lotes. Las filas inválidas no se insertan y se
+    reportan con su número de línea; las válidas se insertan igual. Con
+    dry_run solo se cuentan las válidas (insertadas queda en 0).
+    """
+    resultado = {"procesadas": 0, "validas": 0, "insertadas": 0, "con_errores": 0, "errores": []}
+    pendientes = []
+
+    def reportar(numero, errores):
+        resultado['con_errores'] += 1
+        if len(resultado['errores']) < MAX_ERRORES_REPORTADOS:
+            resultado['errores'].append({"fila": numero, "errores": errores})
+
+    def vaciar():
+        if not pendientes:
+            return
+        if modelo is Cotizacion:
+            # Validación de FK contra MySQL: una consulta por lote y por tabla
+            clientes = db_services.get_existing_client_ids(r['cliente_id'] for _, r in pendientes)
+            configuraciones = db_services.get_existing_pricing_ids(r['configuracion_id'] for _, r in pendientes)
+            validos = []
+            for numero, r in pendientes:
+                errores = []
+                if r['cliente_id'] not in clientes:
+                    errores.append(f"cliente_id {r['cliente_id']} no existe")
+                if r['configuracion_id'] not in configuraciones:
+                    errores.append(f"configuracion_id {r['configuracion_id']} no existe")
+                if errores:
+                    reportar(numero, errores)
+                else:
+                    validos.append((numero, r))
+            pendientes[:] = validos
+        lote = [r for _, r in pendientes]
+        resultado['validas'] += len(lote)
+        if lote and not dry_run:
+            try:
+                _insertar_lote(modelo, lote)
+                resultado['insertadas'] += len(lote)
+            except Exception as e:
+                db.session.rollback()
+                resultado['validas'] -= len(lote)
+                for numero, _ in pendientes:
+                    reportar(numero, [f"Error SQL en el lote: {e}"])
+        pendientes.clear()
+
+    for numero, fila in filas:
+        resultado['procesadas'] += 1
+        if isinstance(fila, Exception):
+            reportar(numero, [f"Formato inválido: {fila}"])
+            continue
+        registro, errores = validar(fila)
+        if errores:
+            reportar(numero, errores)
+            continue
+        pendientes.append((numero, registro))
+        if len(pendientes) >= tamano_lote:
+            vaciar()
+    vaciar()
+
+    if dry_run:
+        resultado['dry_run'] = True
+    return resultado
+
+# ==========================================
+# 📤 EXPORTACIÓN EN STREAMING
+# ==========================================
+
+COLUMNAS_CLIENTES = ['id', 'nombre', 'numero_referencia', 'domicilio', 'created_at']
+COLUMNAS_COTIZACIONES = [
+    'id', 'cliente_id', 'configuracion_id', 'nombre_trabajo', 'fecha_pedido', 'puntadas', 'colores',
+    'ancho', 'alto', 'bastidor', 'tipo_tela', 'tiene_sublimacion', 'cantidad', 'precio_unitario',
+    'precio_total', 'detalles', 'personal_id'
+]
+
+def _valor_exportable(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return valor
+
+def _filas_stream(modelo, columnas, filtros, tamano_lote):
+    # yield_per + stream_results => cursor del lado del servidor (psycopg2/pymysql SSCursor)
+    stmt = select(*[getattr(modelo, c) for c in columnas]).where(*filtros).order_by(modelo.id)
+    stmt = stmt.execution_options(yield_per=tamano_lote, stream_results=True)
+    for fila in db.session.execute(stmt):
+        yield [_valor_exportable(v) for v in fila]
+
+def exportar(modelo, columnas, formato, filtros=(), tamano_lote=1000):
+    """Generador de texto (CSV o NDJSON) listo para un Response en streaming."""
+    if formato == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columnas)
+        for i, fila in enumerate(_filas_stream(modelo, columnas, filtros, tamano_lote), start=1):
+            writer.writerow(fila)
+            if i % 200 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+    else:
+        for fila in _filas_stream(modelo, columnas, filtros, tamano_lote):
+            yield json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + '\n'
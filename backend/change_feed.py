@@ -0,0 +1,184 @@
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, delete, func, text, event, bindparam
+from sqlalchemy.orm import Session
+from database import db, Cotizacion, CambioOrden
+import serializers
+
+# ==========================================
+# 🔄 FEED INCREMENTAL DE ÓRDENES
+# ==========================================
+# Cada escritura de órdenes/cotizaciones agrega una fila a orden_cambios en la
+# MISMA transacción. GET /ordenes/changes?since=<cursor> devuelve solo lo que
+# cambió después del cursor: el estado actual de lo creado/modificado y una
+# "lápida" (delete) por lo borrado. Los clientes mantienen su copia local sin
+# volver a bajar la lista completa.
+#
+# El cursor no es el id (se asigna al INSERT, y una transacción larga puede
+# hacer commit de un id menor después de que un lector ya pasó por uno mayor)
+# sino `posicion`, que se asigna al hacer commit: un hook before_commit toma
+# LOCK_POSICION_CAMBIOS, numera las filas de la transacción después de la
+# última posición y el lock se libera con el mismo commit. Solo se serializa
+# ese tramo final, no la escritura entera, y las posiciones se vuelven
+# visibles en orden. Los lectores ignoran las filas sin posición.
+
+MAX_ESPERA = 25            # segundos máximos de long-poll
+INTERVALO_SONDEO = 1.0     # cambios hechos por otros workers se ven a lo sumo 1s después
+LIMITE = 500
+RETENCION_DIAS = int(os.getenv('CAMBIOS_RETENCION_DIAS', 30))
+# Cada long-poll ocupa un hilo de gunicorn mientras espera: como mucho la
+# mitad de WEB_THREADS por proceso, el resto responde sin esperar.
+MAX_ESPERANDO = int(os.getenv('CAMBIOS_MAX_ESPERANDO', max(int(os.getenv('WEB_THREADS', 4)) // 2, 1)))
+
+# Clave de pg_advisory_xact_lock para numerar posiciones al hacer commit
+LOCK_POSICION_CAMBIOS = 0x43414d42
+
+_PENDIENTES = 'cambios_sin_posicion'
+
+_condicion = threading.Condition()
+_cupos_espera = threading.BoundedSemaphore(MAX_ESPERANDO)
+_ultima_poda = 0.0
+
+@event.listens_for(Session, 'before_commit')
+def _asignar_posiciones(session):
+    """Numera, justo antes del commit, las filas del log que agregó esta transacción."""
+    if session.in_nested_transaction():
+        return
+    ids = session.info.pop(_PENDIENTES, None)
+    if not ids:
+        return
+    bind = db.engines['postgresql']
+    if bind.dialect.name == 'postgresql':
+        session.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": LOCK_POSICION_CAMBIOS},
+                        bind_arguments={"bind": bind})
+    ultima = session.execute(select(func.max(CambioOrden.posicion))).scalar() or 0
+    tabla = CambioOrden.__table__
+    session.execute(
+        update(tabla).where(tabla.c.id == bindparam('b_id')).values(posicion=bindparam('b_posicion')),
+        [{"b_id": cambio_id, "b_posicion": ultima + i} for i, cambio_id in enumerate(sorted(ids), start=1)]
+    )
+
+@event.listens_for(Session, 'after_transaction_end')
+def _descartar_pendientes(session, transaction):
+    # Rollback de la transacción de afuera: las filas pendientes ya no existen
+    if transaction.parent is None:
+        session.info.pop(_PENDIENTES, None)
+
+def cliente_de_cotizacion(cot_id):
+    return db.session.execute(select(Cotizacion.cliente_id).where(Cotizacion.id == cot_id)).scalar()
+
+def registrar(cambios):
+    """
+    Agrega al log una lista de (tipo, entidad_id, cliente_id, operacion) dentro
+    de la transacción actual; el commit lo hace quien escribe la entidad.
+    """
+    if not cambios:
+        return
+    ahora = datetime.utcnow()
+    ids = db.session.execute(insert(CambioOrden).returning(CambioOrden.id), [
+        {"tipo": tipo, "entidad_id": entidad_id, "cliente_id": cliente_id, "operacion": operacion, "fecha": ahora}
+        for tipo, entidad_id, cliente_id, operacion in cambios
+    ]).scalars().all()
+    # La posición (el cursor) se asigna en _asignar_posiciones, al hacer commit
+    db.session.info.setdefault(_PENDIENTES, []).extend(ids)
+
+def notificar():
+    """Despierta los long-poll de este proceso (llamar después del commit)."""
+    with _condicion:
+        _condicion.notify_all()
+
+def podar(dias=RETENCION_DIAS):
+    """Borra el log más viejo que `dias`; los clientes con un cursor anterior reciben reset."""
+    limite = datetime.utcnow() - timedelta(days=dias)
+    db.session.execute(delete(CambioOrden).where(CambioOrden.fecha < limite))
+    db.session.commit()
+
+def _podar_cada_hora():
+    global _ultima_poda
+    if time.monotonic() - _ultima_poda > 3600:
+        _ultima_poda = time.monotonic()
+        try:
+            podar()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ No se pudo podar orden_cambios: {e}")
+
+def cursor_actual(cliente_id=None):
+    stmt = select(func.max(CambioOrden.posicion))
+    if cliente_id is not None:
+        stmt = stmt.where(CambioOrden.cliente_id == cliente_id)
+    return db.session.execute(stmt).scalar() or 0
+
+def _requiere_reset(since):
+    """El cursor ya no se puede continuar: el log se podó después de él o la base es otra."""
+    minimo, maximo = db.session.execute(select(func.min(CambioOrden.posicion), func.max(CambioOrden.posicion))).one()
+    if maximo is None:
+        return since > 0
+    return since > maximo or since < minimo - 1
+
+def cambios_desde(since, cliente_id=None, limite=LIMITE):
+    """
+    Cambios con posición > since, compactados: por cada orden/cotización solo
+    cuenta el último cambio. Devuelve el nuevo cursor y si quedó más por leer.
+    """
+    if since and _requiere_reset(since):
+        return {"cursor": cursor_actual(cliente_id), "changes": [], "has_more": False, "reset": True}
+
+    stmt = select(CambioOrden.posicion, CambioOrden.tipo, CambioOrden.entidad_id, CambioOrden.operacion).where(
+        CambioOrden.posicion > since
+    )
+    if cliente_id is not None:
+        stmt = stmt.where(CambioOrden.cliente_id == cliente_id)
+    filas = db.session.execute(stmt.order_by(CambioOrden.posicion).limit(limite + 1)).all()
+    has_more = len(filas) > limite
+    filas = filas[:limite]
+
+    ultimo = {}
+    for fila in filas:
+        ultimo.pop((fila.tipo, fila.entidad_id), None)  # se reinserta al final: orden del último cambio
+        ultimo[(fila.tipo, fila.entidad_id)] = fila.operacion
+
+    vigentes = {
+        'orden': {o['id']: o for o in serializers.ordenes_por_ids(
+            [i for (t, i), op in ultimo.items() if t == 'orden' and op == 'upsert'])},
+        'cotizacion': {c['id']: c for c in serializers.cotizaciones_por_ids(
+            [i for (t, i), op in ultimo.items() if t == 'cotizacion' and op == 'upsert'])},
+    }
+    changes = []
+    for (tipo, entidad_id), operacion in ultimo.items():
+        datos = vigentes[tipo].get(entidad_id) if operacion == 'upsert' else None
+        if datos is None:
+            # Borrada (o borrada después del cursor): lápida
+            changes.append({"tipo": tipo, "op": "delete", "id": entidad_id})
+        else:
+            changes.append({"tipo": tipo, "op": "upsert", "id": entidad_id, "data": datos})
+
+    cursor = filas[-1].posicion if filas else since
+    return {"cursor": cursor, "changes": changes, "has_more": has_more, "reset": False}
+
+def esperar_cambios(since, cliente_id=None, espera=0, limite=LIMITE):
+    """
+    Long-poll: responde apenas haya cambios o al cumplirse `espera` segundos.
+    Si ya hay MAX_ESPERANDO esperando en este proceso responde enseguida con
+    "espera_rechazada": true (el cliente vuelve a preguntar más tarde).
+    """
+    _podar_cada_hora()
+    if espera <= 0:
+        return cambios_desde(since, cliente_id, limite)
+    if not _cupos_espera.acquire(blocking=False):
+        return {**cambios_desde(since, cliente_id, limite), "espera_rechazada": True}
+    try:
+        fin = time.monotonic() + min(espera, MAX_ESPERA)
+        while True:
+            resultado = cambios_desde(since, cliente_id, limite)
+            restante = fin - time.monotonic()
+            if resultado['changes'] or resultado['reset'] or restante <= 0:
+                return resultado
+            # Sin conexión tomada mientras se espera
+            db.session.close()
+            with _condicion:
+                _condicion.wait(timeout=min(INTERVALO_SONDEO, restante))
+    finally:
+        _cupos_espera.release()
@@ -0,0 +1,53 @@
+import argparse
+from sqlalchemy import text
+from app import app, db
+import blob_store
+import migrate_images
+
+COMPACT_CHECKPOINT = migrate_images.CHECKPOINT_FILE.replace('migrate_images', 'compact_blobs')
+
+class BlobStoreUploader:
+    """Adapta el almacén de blobs a la interfaz de subida de migrate_images."""
+    def __init__(self, store):
+        self.store = store
+
+    def upload(self, cot_id, datos_json):
+        return blob_store.compactar_datos_json(datos_json, self.store)
+
+def reclamar_espacio(full=False):
+    """
+    VACUUM de cotizacion para que PostgreSQL reutilice (o devuelva, con FULL)
+    el espacio de los Base64 reemplazados. FULL bloquea la tabla: usar fuera de horario.
+    """
+    engine = db.engines['postgresql']
+    if engine.dialect.name != 'postgresql':
+        return
+    sentencia = "VACUUM (FULL, ANALYZE) cotizacion" if full else "VACUUM (ANALYZE) cotizacion"
+    # VACUUM no puede correr dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        antes = conn.execute(text("SELECT pg_total_relation_size('cotizacion')")).scalar()
+        print(f"🧹 {sentencia}...")
+        conn.execute(text(sentencia))
+        despues = conn.execute(text("SELECT pg_total_relation_size('cotizacion')")).scalar()
+    print(f"   Tamaño de cotizacion: {antes / 1024 / 1024:.1f} MB → {despues / 1024 / 1024:.1f} MB")
+
+def compact_blobs(workers=4, reanudar=True, full=False):
+    """
+    Mueve las imágenes inline de cotizacion.datos_json al almacén de blobs
+    (BLOB_STORE) y deja solo la referencia. Reanudable por checkpoint.
+    """
+    resultado = migrate_images.migrate_images(
+        BlobStoreUploader(blob_store.get_store()), workers=workers,
+        reanudar=reanudar, checkpoint_path=COMPACT_CHECKPOINT
+    )
+    with app.app_context():
+        reclamar_espacio(full)
+    return resultado
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mueve las imágenes inline de cotizacion al almacén de blobs.")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--desde-cero', action='store_true', help="Ignora el checkpoint y recorre todo")
+    parser.add_argument('--full', action='store_true', help="VACUUM FULL: devuelve el espacio al SO (bloquea la tabla)")
+    args = parser.parse_args()
+    compact_blobs(args.workers, reanudar=not args.desde_cero, full=args.full)
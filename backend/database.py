@@ -3,8 +3,11 @@ from werkzeug.security import generate_password_hash
 from datetime import datetime
 from sqlalchemy import text
 from decimal import Decimal
+from blob_store import resolver_imagen
+from replicas import SesionConReplicas
 
-db = SQLAlchemy()
+# La sesión manda las lecturas de los GET a réplicas si hay configuradas (ver replicas.py)
+db = SQLAlchemy(session_options={"class_": SesionConReplicas})
 
 # --- CLIENTES ---
 class Clientes(db.Model):
@@ -112,6 +115,8 @@ class Cotizacion(db.Model):
         return None
 
     def to_dict(self):
+        # Una sola lectura: Query.get no retiene el objeto y una segunda llamada vuelve a consultar
+        personal = self.personal
         return {
             "id": self.id,
             "cliente_id": self.cliente_id,
@@ -128,13 +133,14 @@ class Cotizacion(db.Model):
             "cantidad": self.cantidad,
             "precio_unitario": float(self.precio_unitario) if self.precio_unitario else 0,
             "precio_total": float(self.precio_total) if self.precio_total else 0,
-            "datos_json": self.datos_json,
+            "datos_json": resolver_imagen(self.datos_json),
             "detalles": self.detalles,
             "personal_id": self.personal_id,
-            "personal_nombre": self.personal.nombre if self.personal else None
+            "personal_nombre": personal.nombre if personal else None
         }
 
     def to_summary_dict(self):
+        personal = self.personal
         return {
             "id": self.id,
             "cliente_id": self.cliente_id,
@@ -152,13 +158,15 @@ class Cotizacion(db.Model):
             "precio_unitario": float(self.precio_unitario) if self.precio_unitario else 0,
             "precio_total": float(self.precio_total) if self.precio_total else 0,
             "personal_id": self.personal_id,
-            "personal_nombre": self.personal.nombre if self.personal else None
+            "personal_nombre": personal.nombre if personal else None
         }
 
 # --- ÓRDENES (Nueva tabla) ---
 class Orden(db.Model):
     __bind_key__ = 'postgresql'
     __tablename__ = 'orden'
+    # Una sola orden por cotización, garantizado por la base (dos POST /ordenes simultáneos no pasan los dos)
+    __table_args__ = (db.UniqueConstraint('cotizacion_id', name='uq_orden_cotizacion_id'),)
     
     id = db.Column(db.Integer, primary_key=True)
     cotizacion_id = db.Column(db.Integer, db.ForeignKey('cotizacion.id'), nullable=False)
@@ -177,7 +185,10 @@ class Orden(db.Model):
         return None
 
     def to_dict(self):
+        # Una sola lectura de cada uno: Query.get no retiene el objeto y una segunda llamada vuelve a consultar
         cot = self.cotizacion
+        cliente = cot.cliente if cot else None
+        personal = self.personal
         return {
             "id": self.id,
             "cotizacion_id": self.cotizacion_id,
@@ -188,7 +199,7 @@ class Orden(db.Model):
             # Datos expandidos de la cotización
             "cliente_id": cot.cliente_id if cot else None,
             "nombre_trabajo": cot.nombre_trabajo if cot else None,
-            "cliente_nombre": cot.cliente.nombre if cot and cot.cliente else None,
+            "cliente_nombre": cliente.nombre if cliente else None,
             "precio_total": float(cot.precio_total) if cot and cot.precio_total else 0,
             "cantidad": cot.cantidad if cot else 0,
             "fecha_pedido": cot.fecha_pedido.isoformat() if cot and cot.fecha_pedido else None,
@@ -200,15 +211,17 @@ class Orden(db.Model):
             "bastidor": cot.bastidor if cot else '',
             "tipo_tela": cot.tipo_tela if cot else '',
             "tiene_sublimacion": cot.tiene_sublimacion if cot else False,
-            "datos_json": cot.datos_json if cot else None,
+            "datos_json": resolver_imagen(cot.datos_json) if cot else None,
             # Precio unitario también es útil
             "precio_unitario": float(cot.precio_unitario) if cot and cot.precio_unitario is not None else 0.0,
             "personal_id": self.personal_id,
-            "personal_nombre": self.personal.nombre if self.personal else None
+            "personal_nombre": personal.nombre if personal else None
         }
 
     def to_summary_dict(self):
         cot = self.cotizacion
+        cliente = cot.cliente if cot else None
+        personal = self.personal
         return {
             "id": self.id,
             "cotizacion_id": self.cotizacion_id,
@@ -218,16 +231,208 @@ class Orden(db.Model):
             "fecha_creacion": self.fecha_creacion.isoformat() if self.fecha_creacion else None,
             "cliente_id": cot.cliente_id if cot else None,
             "nombre_trabajo": cot.nombre_trabajo if cot else None,
-            "cliente_nombre": cot.cliente.nombre if cot and cot.cliente else None,
+            "cliente_nombre": cliente.nombre if cliente else None,
             "precio_total": float(cot.precio_total) if cot and cot.precio_total else 0,
             "cantidad": cot.cantidad if cot else 0,
             "fecha_pedido": cot.fecha_pedido.isoformat() if cot and cot.fecha_pedido else None,
             "puntadas": cot.puntadas if cot else 0,
             "colores": cot.colores if cot else 1,
             "personal_id": self.personal_id,
-            "personal_nombre": self.personal.nombre if self.personal else None
+            "personal_nombre": personal.nombre if personal else None
         }
 
+# --- ARCHIVO (cotizaciones/órdenes cerradas y antiguas, movidas por archive_cotizaciones.py) ---
+# Mismas columnas que Cotizacion/Orden (el job copia por nombre) y mismos ids.
+# Son de solo lectura: las listas no las miran, los detalles sí.
+class CotizacionArchivada(db.Model):
+    __bind_key__ = 'postgresql'
+    __tablename__ = 'cotizacion_archivo'
+    __table_args__ = (
+        db.Index('ix_cotizacion_archivo_cliente_id', 'cliente_id'),
+        db.Index('ix_cotizacion_archivo_fecha_pedido', 'fecha_pedido'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cliente_id = db.Column(db.Integer, nullable=False)
+    configuracion_id = db.Column(db.Integer, nullable=False)
+    nombre_trabajo = db.Column(db.String(150), nullable=False)
+    fecha_pedido = db.Column(db.DateTime)
+    puntadas = db.Column(db.Integer)
+    colores = db.Column(db.Integer)
+    ancho = db.Column(db.Numeric(10, 2))
+    alto = db.Column(db.Numeric(10, 2))
+    bastidor = db.Column(db.String(100))
+    tipo_tela = db.Column(db.String(50))
+    tiene_sublimacion = db.Column(db.SmallInteger)
+    cantidad = db.Column(db.Integer)
+    precio_unitario = db.Column(db.Numeric(10, 2))
+    precio_total = db.Column(db.Numeric(10, 2))
+    datos_json = db.Column(db.Text)
+    detalles = db.Column(db.Text)
+    personal_id = db.Column(db.Integer, nullable=True)
+    archivada_en = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    cliente = Cotizacion.cliente
+    configuracion = Cotizacion.configuracion
+    personal = Cotizacion.personal
+    to_dict = Cotizacion.to_dict
+    to_summary_dict = Cotizacion.to_summary_dict
+
+class OrdenArchivada(db.Model):
+    __bind_key__ = 'postgresql'
+    __tablename__ = 'orden_archivo'
+    __table_args__ = (
+        db.Index('ix_orden_archivo_cotizacion_id', 'cotizacion_id'),
+        db.Index('ix_orden_archivo_fecha_creacion', 'fecha_creacion'),
+        db.Index('ix_orden_archivo_fecha_entrega', 'fecha_entrega'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    cotizacion_id = db.Column(db.Integer, db.ForeignKey('cotizacion_archivo.id'), nullable=False)
+    estado = db.Column(db.String(20), nullable=False)
+    fecha_entrega = db.Column(db.Date, nullable=True)
+    detail = db.Column(db.Text)
+    fecha_creacion = db.Column(db.DateTime)
+    personal_id = db.Column(db.Integer, nullable=True)
+    archivada_en = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    cotizacion = db.relationship('CotizacionArchivada', backref=db.backref('orden', uselist=False))
+
+    personal = Orden.personal
+    to_dict = Orden.to_dict
+    to_summary_dict = Orden.to_summary_dict
+
+# --- CAMBIOS (feed incremental de órdenes/cotizaciones, mantenido por change_feed) ---
+class CambioOrden(db.Model):
+    __bind_key__ = 'postgresql'
+    __tablename__ = 'orden_cambios'
+    __table_args__ = (
+        db.Index('ix_orden_cambios_posicion', 'posicion', unique=True),
+        db.Index('ix_orden_cambios_cliente_id', 'cliente_id', 'posicion'),
+    )
+
+    # Integer en SQLite para que sea autoincremental
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    # Cursor de GET /ordenes/changes: orden de commit, la asigna change_feed al hacer commit (NULL hasta entonces)
+    posicion = db.Column(db.BigInteger, nullable=True)
+    tipo = db.Column(db.String(12), nullable=False)  # orden, cotizacion
+    entidad_id = db.Column(db.Integer, nullable=False)
+    cliente_id = db.Column(db.Integer)
+    operacion = db.Column(db.String(8), nullable=False)  # upsert, delete
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# --- RESPUESTAS IDEMPOTENTES (Idempotency-Key de los POST de creación, mantenido por idempotencia.py) ---
+class RespuestaIdempotente(db.Model):
+    __bind_key__ = 'postgresql'
+    __tablename__ = 'idempotencia'
+    __table_args__ = (db.Index('ix_idempotencia_expira', 'expira'),)
+
+    clave = db.Column(db.String(255), primary_key=True)
+    ruta = db.Column(db.String(120), primary_key=True)  # "POST /orders"
+    huella = db.Column(db.String(64), nullable=False)   # sha256 del cuerpo del request
+    estado = db.Column(db.String(12), nullable=False, default='en_proceso')  # en_proceso, hecha (commit de la vista), completa
+    status = db.Column(db.Integer)
+    tipo = db.Column(db.String(80))
+    cuerpo = db.Column(db.Text)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expira = db.Column(db.DateTime, nullable=False)
+
+# --- HUELLAS DE DISEÑO (hash perceptual por cotización, mantenido por huellas_services) ---
+class HuellaDiseno(db.Model):
+    __bind_key__ = 'postgresql'
+    __tablename__ = 'cotizacion_huellas'
+
+    # El id es el cursor con el que cada proceso trae las huellas nuevas a su índice en memoria
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    # Sin FK: la huella se queda aunque la cotización pase a cotizacion_archivo
+    cotizacion_id = db.Column(db.Integer, nullable=False, unique=True)
+    # Hashes de 64 bits guardados con signo (BIGINT)
+    dhash = db.Column(db.BigInteger, nullable=False)
+    phash = db.Column(db.BigInteger, nullable=False)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# --- REPORTES (tablas de resumen diario, mantenidas por report_services) ---
+class ReporteDiario(db.Model):
+    __bind_key__ = 'postgresql'
+    __tablename__ = 'reporte_diario'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    cotizaciones = db.Column(db.Integer, nullable=False, default=0)
+    monto_cotizado = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    ordenes = db.Column(db.Integer, nullable=False, default=0)
+    monto_ordenes = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    ordenes_canceladas = db.Column(db.Integer, nullable=False, default=0)
+
+class ReporteDiarioPersonal(db.Model):
+    __bind_key__ = 'postgresql'
+    __tablename__ = 'reporte_diario_personal'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    personal_id = db.Column(db.Integer, primary_key=True)  # 0 = sin asignar
+    ordenes_entregadas = db.Column(db.Integer, nullable=False, default=0)
+    puntadas = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ReporteDiarioCliente(db.Model):
+    __bind_key__ = 'postgresql'
+    __tablename__ = 'reporte_diario_cliente'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    cliente_id = db.Column(db.Integer, primary_key=True)
+    ordenes = db.Column(db.Integer, nullable=False, default=0)
+    monto = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+def crear_indices_busqueda():
+    """
+    Crea (si no existen) los índices que usa GET /search.
+    MySQL: FULLTEXT sobre clientes(nombre, numero_referencia). La collation de la
+    tabla (utf8mb4_*_ci) ya ignora tildes y mayúsculas.
+    PostgreSQL: pg_trgm + unaccent con índices GIN sobre expresión para
+    cotizacion.nombre_trabajo / detalles.
+    """
+    try:
+        with db.engine.connect() as conn:
+            if conn.dialect.name == 'mysql':
+                result = conn.execute(text("SHOW INDEX FROM clientes WHERE Key_name = 'ft_clientes_busqueda'"))
+                if not result.fetchone():
+                    print("🔎 Índice: Creando FULLTEXT 'ft_clientes_busqueda' en 'clientes'...")
+                    conn.execute(text("ALTER TABLE clientes ADD FULLTEXT INDEX ft_clientes_busqueda (nombre, numero_referencia)"))
+                result = conn.execute(text("SHOW INDEX FROM clientes WHERE Key_name = 'ix_clientes_numero_referencia'"))
+                if not result.fetchone():
+                    print("🔎 Índice: Creando 'ix_clientes_numero_referencia' en 'clientes'...")
+                    conn.execute(text("CREATE INDEX ix_clientes_numero_referencia ON clientes (numero_referencia)"))
+                conn.commit()
+    except Exception as e_idx:
+        print(f"⚠️ Error creando índices de búsqueda en MySQL: {e_idx}")
+
+    try:
+        with db.engines['postgresql'].connect() as conn:
+            if conn.dialect.name == 'postgresql':
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+                # unaccent() no es IMMUTABLE, así que no puede indexarse directamente.
+                # Este envoltorio fija el diccionario y sí puede usarse en índices.
+                conn.execute(text(
+                    "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+                    "AS $$ SELECT public.unaccent('public.unaccent', $1) $$ "
+                    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+                ))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_cotizacion_nombre_trabajo_trgm ON cotizacion "
+                    "USING gin (f_unaccent(lower(nombre_trabajo)) gin_trgm_ops)"
+                ))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_cotizacion_detalles_trgm ON cotizacion "
+                    "USING gin (f_unaccent(lower(coalesce(detalles, ''))) gin_trgm_ops)"
+                ))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_cotizacion_cliente_id ON cotizacion (cliente_id)"))
+                # Usados por los recálculos diarios de report_services
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_cotizacion_fecha_pedido ON cotizacion (fecha_pedido)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_orden_fecha_creacion ON orden (fecha_creacion)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_orden_fecha_entrega ON orden (fecha_entrega)"))
+                conn.commit()
+    except Exception as e_idx:
+        print(f"⚠️ Error creando índices de búsqueda en PostgreSQL: {e_idx}")
+
 def init_db_data(app):
     with app.app_context():
         # Crear las tablas en sus respectivos binds (MySQL y PostgreSQL)
@@ -236,26 +441,53 @@ def init_db_data(app):
         # Ejecutar migraciones automáticas en MySQL (default bind)
         try:
             with db.engine.connect() as conn:
-                # 1. Tabla 'personal'
-                result = conn.execute(text("SHOW COLUMNS FROM personal LIKE 'celular'"))
-                if not result.fetchone():
-                    print("⚙️ Migración: Agregando columna 'celular' a 'personal'...")
-                    conn.execute(text("ALTER TABLE personal ADD COLUMN celular VARCHAR(20) DEFAULT NULL"))
-                result = conn.execute(text("SHOW COLUMNS FROM personal LIKE 'domicilio'"))
-                if not result.fetchone():
-                    print("⚙️ Migración: Agregando columna 'domicilio' a 'personal'...")
-                    conn.execute(text("ALTER TABLE personal ADD COLUMN domicilio TEXT DEFAULT NULL"))
+                # SHOW COLUMNS es de MySQL; en otros motores (p. ej. SQLite en loadtest.py)
+                # create_all() ya crea las tablas con todas sus columnas
+                if conn.dialect.name == 'mysql':
+                    # 1. Tabla 'personal'
+                    result = conn.execute(text("SHOW COLUMNS FROM personal LIKE 'celular'"))
+                    if not result.fetchone():
+                        print("⚙️ Migración: Agregando columna 'celular' a 'personal'...")
+                        conn.execute(text("ALTER TABLE personal ADD COLUMN celular VARCHAR(20) DEFAULT NULL"))
+                    result = conn.execute(text("SHOW COLUMNS FROM personal LIKE 'domicilio'"))
+                    if not result.fetchone():
+                        print("⚙️ Migración: Agregando columna 'domicilio' a 'personal'...")
+                        conn.execute(text("ALTER TABLE personal ADD COLUMN domicilio TEXT DEFAULT NULL"))
                 
-                # 2. Tabla 'configuracion_precios'
-                result = conn.execute(text("SHOW COLUMNS FROM configuracion_precios LIKE 'corte_impresion'"))
-                if not result.fetchone():
-                    print("⚙️ Migración: Agregando columna 'corte_impresion' a 'configuracion_precios'...")
-                    conn.execute(text("ALTER TABLE configuracion_precios ADD COLUMN corte_impresion DECIMAL(10,2) DEFAULT NULL"))
+                    # 2. Tabla 'configuracion_precios'
+                    result = conn.execute(text("SHOW COLUMNS FROM configuracion_precios LIKE 'corte_impresion'"))
+                    if not result.fetchone():
+                        print("⚙️ Migración: Agregando columna 'corte_impresion' a 'configuracion_precios'...")
+                        conn.execute(text("ALTER TABLE configuracion_precios ADD COLUMN corte_impresion DECIMAL(10,2) DEFAULT NULL"))
                 
-                conn.commit()
+                    conn.commit()
         except Exception as e_mig:
             print(f"⚠️ Error durante la migración automática del esquema MySQL: {e_mig}")
 
+        # Migraciones en PostgreSQL
+        try:
+            with db.engines['postgresql'].connect() as conn:
+                if conn.dialect.name == 'postgresql':
+                    # Una orden por cotización (antes solo lo revisaba la app)
+                    result = conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'uq_orden_cotizacion_id'"))
+                    if not result.fetchone():
+                        duplicadas = conn.execute(text(
+                            "SELECT cotizacion_id FROM orden GROUP BY cotizacion_id HAVING count(*) > 1"
+                        )).scalars().all()
+                        if duplicadas:
+                            print(f"⚠️ Migración: hay cotizaciones con más de una orden {duplicadas[:20]}; "
+                                  "resolverlas para crear 'uq_orden_cotizacion_id'")
+                        else:
+                            print("⚙️ Migración: Agregando UNIQUE 'uq_orden_cotizacion_id' a 'orden'...")
+                            conn.execute(text("ALTER TABLE orden ADD CONSTRAINT uq_orden_cotizacion_id UNIQUE (cotizacion_id)"))
+                            # El índice de la restricción reemplaza al simple
+                            conn.execute(text("DROP INDEX IF EXISTS ix_orden_cotizacion_id"))
+                    conn.commit()
+        except Exception as e_mig:
+            print(f"⚠️ Error durante la migración automática del esquema PostgreSQL: {e_mig}")
+
+        crear_indices_busqueda()
+
         if not ConfiguracionPrecios.query.first():
             print("💰 Creando precios iniciales...")
             precios = ConfiguracionPrecios(
@@ -1,4 +1,13 @@
-from database import db, Personal, Clientes, ConfiguracionPrecios, Cotizacion, Orden
+from database import db, Personal, Clientes, ConfiguracionPrecios, Cotizacion, Orden, CotizacionArchivada, OrdenArchivada
+from sqlalchemy import func, or_, literal, text, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer
+import report_services
+import blob_store
+import change_feed
+import huellas_services
+import ticket_services
+import image_derivatives
 from datetime import datetime
 from decimal import Decimal
 
@@ -15,6 +24,20 @@ def get_user_by_id(user_id):
 def get_all_active_users():
     return Personal.query.filter_by(activo=True).all()
 
+def get_users_by_ids(user_ids):
+    ids = {uid for uid in user_ids if uid}
+    if not ids:
+        return []
+    return Personal.query.filter(Personal.id.in_(ids)).all()
+
+def get_user_names(user_ids):
+    """Resuelve {id: nombre} del personal en una sola consulta."""
+    ids = {uid for uid in user_ids if uid}
+    if not ids:
+        return {}
+    rows = db.session.query(Personal.id, Personal.nombre).filter(Personal.id.in_(ids)).all()
+    return {row.id: row.nombre for row in rows}
+
 def create_user(nombre, usuario, password_hash, rol='empleado', celular=None, domicilio=None):
     new_user = Personal(
         # pyrefly: ignore [unexpected-keyword]
@@ -36,6 +59,19 @@ def create_user(nombre, usuario, password_hash, rol='empleado', celular=None, do
     db.session.commit()
     return new_user
 
+def ensure_default_admin():
+    if not get_user_by_username('admin', active_only=False):
+        import password_services
+        print("👤 Creando admin por defecto...")
+        create_user(
+            nombre='Administrador Principal', 
+            usuario='admin', 
+            rol='administrador', 
+            password_hash=password_services.hash_password('12345678'),
+            celular=None,
+            domicilio=None
+        )
+
 def update_user_password(user_id, password_hash):
     user = get_user_by_id(user_id)
     if user:
@@ -55,8 +91,8 @@ def update_user(user_id, data):
     if 'celular' in data: user.celular = data['celular']
     if 'domicilio' in data: user.domicilio = data['domicilio']
     if 'password' in data and data['password'].strip() != '':
-        from werkzeug.security import generate_password_hash
-        user.password_hash = generate_password_hash(data['password'])
+        import password_services
+        user.password_hash = password_services.hash_password(data['password'])
     
     db.session.commit()
     return user
@@ -185,22 +221,97 @@ def create_cotizacion(data):
         # pyrefly: ignore [unexpected-keyword]
         precio_total=Decimal(str(data.get('precio_total', 0.0))),
         # pyrefly: ignore [unexpected-keyword]
-        datos_json=data.get('datos_json'),
+        datos_json=blob_store.compactar_datos_json(data.get('datos_json')),
         # pyrefly: ignore [unexpected-keyword]
         detalles=data.get('detalles'),
         # pyrefly: ignore [unexpected-keyword]
         personal_id=data.get('personal_id')
     )
     db.session.add(new_cotizacion)
+    db.session.flush()
+    report_services.aplicar(sumar=report_services.aportes_de_cotizacion(new_cotizacion))
+    change_feed.registrar([('cotizacion', new_cotizacion.id, new_cotizacion.cliente_id, 'upsert')])
+    # Huella del diseño que devolvió /process (si no viene, la calcula backfill_huellas.py)
+    huella = huellas_services.parsear(data.get('huella'))
+    if huella:
+        huellas_services.registrar(new_cotizacion.id, huella)
     db.session.commit()
+    change_feed.notificar()
+    # Las miniaturas que generó /process pasan a ser las de la cotización (sin volver a bajar la imagen)
+    image_derivatives.enlazar_en_segundo_plano(data.get('imagen_id'), f"cot-{new_cotizacion.id}")
     return new_cotizacion
 
+def create_cotizaciones_batch(registros, ordenes=None):
+    """
+    Inserta varias cotizaciones (y opcionalmente sus órdenes) en una sola
+    transacción: un INSERT multi-fila con RETURNING por tabla.
+    `ordenes` es una lista paralela a `registros` (dict o None por cotización).
+    Devuelve (ids_cotizacion, ids_orden), las dos alineadas con `registros`
+    (None en ids_orden donde no se creó orden).
+    """
+    registros = [{**r, "datos_json": blob_store.compactar_datos_json(r.get('datos_json'))} for r in registros]
+    try:
+        ids = db.session.execute(
+            insert(Cotizacion).returning(Cotizacion.id, sort_by_parameter_order=True), registros
+        ).scalars().all()
+
+        orden_ids = []
+        filas_orden = []
+        if ordenes:
+            ahora = datetime.utcnow()
+            filas_orden = [
+                {**orden, "cotizacion_id": cot_id, "fecha_creacion": ahora}
+                for cot_id, orden in zip(ids, ordenes) if orden is not None
+            ]
+        if filas_orden:
+            orden_ids = db.session.execute(
+                insert(Orden).returning(Orden.id, sort_by_parameter_order=True), filas_orden
+            ).scalars().all()
+
+        cotizacion_de = dict(zip(ids, registros))
+        report_services.aplicar(sumar=(
+            [a for r in registros for a in report_services.aportes_de_cotizacion(r)]
+            + [a for f in filas_orden for a in report_services.aportes_de_orden(f, cotizacion_de[f['cotizacion_id']])]
+        ))
+        clientes = [r.get('cliente_id') for r in registros]
+        cliente_de = dict(zip(ids, clientes))
+        change_feed.registrar(
+            [('cotizacion', cot_id, cliente, 'upsert') for cot_id, cliente in zip(ids, clientes)]
+            + [('orden', orden_id, cliente_de.get(f['cotizacion_id']), 'upsert') for orden_id, f in zip(orden_ids, filas_orden)]
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    change_feed.notificar()
+    orden_de = dict(zip((f['cotizacion_id'] for f in filas_orden), orden_ids))
+    return ids, [orden_de.get(cot_id) for cot_id in ids]
+
+def get_existing_client_ids(client_ids):
+    ids = {cid for cid in client_ids if cid is not None}
+    if not ids:
+        return set()
+    return {row.id for row in db.session.query(Clientes.id).filter(Clientes.id.in_(ids))}
+
+def get_existing_pricing_ids(config_ids):
+    ids = {cid for cid in config_ids if cid is not None}
+    if not ids:
+        return set()
+    return {row.id for row in db.session.query(ConfiguracionPrecios.id).filter(ConfiguracionPrecios.id.in_(ids))}
+
 def get_cotizacion_by_id(cot_id):
     return Cotizacion.query.get(cot_id)
 
 def get_cotizaciones_by_client(client_id):
     return Cotizacion.query.filter_by(cliente_id=client_id).order_by(Cotizacion.fecha_pedido.desc()).all()
 
+def get_cotizacion_o_archivada(cot_id):
+    """Para detalles de solo lectura: si no está en cotizacion, se busca en el archivo."""
+    return get_cotizacion_by_id(cot_id) or CotizacionArchivada.query.get(cot_id)
+
+def get_cotizaciones_archivadas_by_client(client_id):
+    return CotizacionArchivada.query.filter_by(cliente_id=client_id).order_by(CotizacionArchivada.fecha_pedido.desc()).all()
+
 # --- ÓRDENES ---
 def get_all_ordenes():
     return Orden.query.order_by(Orden.fecha_entrega.asc(), Orden.fecha_creacion.desc()).all()
@@ -211,9 +322,16 @@ def get_ordenes_by_client(client_id):
 def get_orden_by_id(orden_id):
     return Orden.query.get(orden_id)
 
+def get_orden_o_archivada(orden_id):
+    """Para detalles de solo lectura: si no está en orden, se busca en el archivo."""
+    return get_orden_by_id(orden_id) or OrdenArchivada.query.get(orden_id)
+
 def get_orden_by_cotizacion_id(cot_id):
     return Orden.query.filter_by(cotizacion_id=cot_id).first()
 
+class OrdenDuplicada(Exception):
+    """La cotización ya tiene una orden (uq_orden_cotizacion_id)."""
+
 def create_orden(cotizacion_id, estado='en_proceso', fecha_entrega=None, detail=None, personal_id=None):
     new_orden = Orden(
         # pyrefly: ignore [unexpected-keyword]
@@ -228,13 +346,25 @@ def create_orden(cotizacion_id, estado='en_proceso', fecha_entrega=None, detail=
         personal_id=personal_id
     )
     db.session.add(new_orden)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # Otro request creó la orden entre la verificación y el INSERT
+        db.session.rollback()
+        if get_orden_by_cotizacion_id(cotizacion_id):
+            raise OrdenDuplicada(cotizacion_id)
+        raise
+    report_services.aplicar(sumar=report_services.aportes_de_orden(new_orden, new_orden.cotizacion))
+    change_feed.registrar([('orden', new_orden.id, change_feed.cliente_de_cotizacion(cotizacion_id), 'upsert')])
     db.session.commit()
+    change_feed.notificar()
     return new_orden
 
 def update_orden(orden_id, data):
     orden = get_orden_by_id(orden_id)
     if not orden:
         return None
+    antes = report_services.aportes_de_orden(orden, orden.cotizacion)
     
     if 'estado' in data:
         orden.estado = data['estado']
@@ -245,13 +375,110 @@ def update_orden(orden_id, data):
     if 'personal_id' in data:
         orden.personal_id = data['personal_id']
         
+    db.session.flush()
+    report_services.aplicar(sumar=report_services.aportes_de_orden(orden, orden.cotizacion), restar=antes)
+    change_feed.registrar([('orden', orden.id, change_feed.cliente_de_cotizacion(orden.cotizacion_id), 'upsert')])
     db.session.commit()
+    change_feed.notificar()
+    ticket_services.invalidar(f"orden-{orden.id}")
     return orden
 
 def delete_orden(orden_id):
     orden = get_orden_by_id(orden_id)
     if not orden:
         return False
+    aporte = report_services.aportes_de_orden(orden, orden.cotizacion)
+    cliente_id = change_feed.cliente_de_cotizacion(orden.cotizacion_id)
     db.session.delete(orden)
+    db.session.flush()
+    report_services.aplicar(restar=aporte)
+    change_feed.registrar([('orden', orden_id, cliente_id, 'delete')])
     db.session.commit()
+    change_feed.notificar()
+    ticket_services.invalidar(f"orden-{orden_id}")
     return True
+
+# --- BÚSQUEDA ---
+_CARACTERES_BOOLEAN_MODE = '+-<>()~*"@'
+
+def _normalizar_termino(termino):
+    return ' '.join((termino or '').split())
+
+def _escapar_like(termino):
+    # "100%" busca el texto "100%", no "100" seguido de cualquier cosa (se usa con escape='\\')
+    return termino.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _termino_fulltext(termino):
+    # "juan per" -> "+juan* +per*" (todas las palabras, por prefijo)
+    limpio = ''.join(' ' if ch in _CARACTERES_BOOLEAN_MODE else ch for ch in termino)
+    return ' '.join(f"+{palabra}*" for palabra in limpio.split())
+
+def search_clients(termino, limit=20, offset=0):
+    """
+    Busca clientes activos por nombre o número de referencia.
+    Devuelve lista de (cliente, score) ordenada por relevancia.
+    """
+    termino = _normalizar_termino(termino)
+    if not termino:
+        return []
+
+    query = Clientes.query.filter(Clientes.estado == True)
+    if db.engine.dialect.name == 'mysql' and _termino_fulltext(termino):
+        from sqlalchemy.dialects.mysql import match
+        score = match(Clientes.nombre, Clientes.numero_referencia, against=_termino_fulltext(termino)).in_boolean_mode()
+        query = query.with_entities(Clientes, score.label('score')).filter(
+            or_(score > 0, Clientes.numero_referencia.like(f"{_escapar_like(termino)}%", escape='\\'))
+        ).order_by(text('score DESC'), Clientes.id.desc())
+    else:
+        patron = f"%{_escapar_like(termino.lower())}%"
+        query = query.with_entities(Clientes, literal(1.0).label('score')).filter(
+            or_(func.lower(Clientes.nombre).like(patron, escape='\\'), Clientes.numero_referencia.like(patron, escape='\\'))
+        ).order_by(Clientes.nombre.asc())
+
+    return query.offset(offset).limit(limit).all()
+
+def search_cotizaciones(termino, limit=20, offset=0, solo_con_orden=False):
+    """
+    Busca cotizaciones por nombre de trabajo o detalles (sin tildes, por similitud).
+    Devuelve lista de (cotizacion, orden|None, score) ordenada por relevancia.
+    datos_json (la imagen, a veces en Base64) no se carga: los resultados no la usan.
+    """
+    termino = _normalizar_termino(termino)
+    if not termino:
+        return []
+
+    query = db.session.query(Cotizacion)
+    if db.engines['postgresql'].dialect.name == 'postgresql':
+        q_norm = func.f_unaccent(func.lower(termino))
+        nombre_norm = func.f_unaccent(func.lower(Cotizacion.nombre_trabajo))
+        detalles_norm = func.f_unaccent(func.lower(func.coalesce(Cotizacion.detalles, '')))
+        patron = literal('%').concat(func.f_unaccent(func.lower(_escapar_like(termino)))).concat('%')
+        score = func.greatest(func.word_similarity(q_norm, nombre_norm), func.word_similarity(q_norm, detalles_norm))
+        condicion = or_(
+            nombre_norm.like(patron, escape='\\'), detalles_norm.like(patron, escape='\\'),
+            q_norm.op('<%')(nombre_norm), q_norm.op('<%')(detalles_norm)
+        )
+    else:
+        patron = f"%{_escapar_like(termino.lower())}%"
+        score = literal(1.0)
+        condicion = or_(func.lower(Cotizacion.nombre_trabajo).like(patron, escape='\\'),
+                        func.lower(Cotizacion.detalles).like(patron, escape='\\'))
+
+    query = (query.with_entities(Cotizacion, Orden, score.label('score'))
+             .options(defer(Cotizacion.datos_json, raiseload=True))
+             .filter(condicion))
+    if solo_con_orden:
+        query = query.join(Orden, Orden.cotizacion_id == Cotizacion.id)
+    else:
+        query = query.outerjoin(Orden, Orden.cotizacion_id == Cotizacion.id)
+    query = query.order_by(score.desc(), Cotizacion.fecha_pedido.desc())
+
+    return query.offset(offset).limit(limit).all()
+
+def get_client_names(client_ids):
+    """Resuelve {id: nombre} en una sola consulta (evita Cotizacion.cliente fila por fila)."""
+    ids = {cid for cid in client_ids if cid is not None}
+    if not ids:
+        return {}
+    rows = db.session.query(Clientes.id, Clientes.nombre).filter(Clientes.id.in_(ids)).all()
+    return {row.id: row.nombre for row in rows}
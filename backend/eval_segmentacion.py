@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from PIL import Image
+import numpy as np
+
+from image_services import (crear_sesion, quitar_fondo, calcular_estimacion_puntadas,
+                            obtener_colores_dominantes_avanzado)
+
+# ==========================================
+# 🧠 MODELO DE SEGMENTACIÓN: REDUCIDO VS COMPLETO
+# ==========================================
+# Antes de cambiar REMBG_MODEL / REMBG_MODEL_PATH en producción:
+#
+#   python eval_segmentacion.py cuantizar --salida modelos/u2net_int8.onnx
+#   python eval_segmentacion.py comparar --logos ./logos_referencia --candidato modelos/u2net_int8.onnx
+#
+# `cuantizar` exporta u2net (u otro modelo de rembg con el mismo preprocesado)
+# a int8: dinámica por defecto, o estática (QDQ) calibrando con --calibracion,
+# que suele ser la más rápida en CPU.
+# `comparar` corre cada logo con el modelo de referencia y el candidato y
+# reporta lo que le importa a la cotización: IoU de la máscara, diferencia en
+# calcular_estimacion_puntadas y en el conjunto de colores detectados, además
+# del tiempo por imagen. El candidato puede ser un nombre de rembg (u2netp,
+# silueta...) o la ruta a un .onnx.
+
+EXTENSIONES = ('.png', '.jpg', '.jpeg', '.webp')
+ALFA_MASCARA = 128
+ANCHO_CM = 10
+DENSIDAD = 135
+LADO_U2NET = 320
+
+def _sesion(modelo):
+    if modelo.endswith('.onnx'):
+        return crear_sesion(ruta=modelo)
+    return crear_sesion(modelo, ruta=None)
+
+def _logos(directorio):
+    rutas = sorted(os.path.join(directorio, n) for n in os.listdir(directorio) if n.lower().endswith(EXTENSIONES))
+    if not rutas:
+        raise SystemExit(f"❌ No hay imágenes en {directorio}")
+    return rutas
+
+# --- CUANTIZACIÓN ---
+
+def _entrada_u2net(ruta):
+    """Mismo preprocesado que rembg aplica a u2net (320x320, normalización ImageNet)."""
+    img = Image.open(ruta).convert('RGB').resize((LADO_U2NET, LADO_U2NET), Image.Resampling.LANCZOS)
+    x = np.asarray(img, dtype=np.float32)
+    x = x / max(float(np.max(x)), 1e-6)
+    x = (x - (0.485, 0.456, 0.406)) / (0.229, 0.224, 0.225)
+    return x.transpose(2, 0, 1)[np.newaxis].astype(np.float32)
+
+def cuantizar(modelo, salida, calibracion=None):
+    from onnxruntime.quantization import quantize_dynamic, quantize_static, QuantType, QuantFormat, CalibrationDataReader
+
+    origen = type(_sesion(modelo)).download_models()  # descarga el modelo si falta y da su ruta
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    if calibracion is None:
+        # ConvInteger de ONNX Runtime en CPU solo acepta pesos uint8
+        quantize_dynamic(origen, salida, weight_type=QuantType.QUInt8)
+    else:
+        import onnxruntime as ort
+        entrada = ort.InferenceSession(origen, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+        class Logos(CalibrationDataReader):
+            def __init__(self):
+                self.rutas = iter(_logos(calibracion))
+
+            def get_next(self):
+                ruta = next(self.rutas, None)
+                return None if ruta is None else {entrada: _entrada_u2net(ruta)}
+
+        quantize_static(origen, salida, Logos(), quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    mb = lambda ruta: os.path.getsize(ruta) / (1024 * 1024)
+    print(f"✅ {os.path.basename(origen)} ({mb(origen):.0f} MB) -> {salida} ({mb(salida):.0f} MB)")
+    print(f"   Probar con: python eval_segmentacion.py comparar --candidato {salida}")
+
+# --- COMPARACIÓN ---
+
+def _correr(sesion, imagen):
+    inicio = time.perf_counter()
+    salida = quitar_fondo(imagen, session=sesion)
+    ms = (time.perf_counter() - inicio) * 1000
+    return {
+        "ms": ms,
+        "mascara": np.asarray(salida.getchannel('A')) >= ALFA_MASCARA,
+        "puntadas": calcular_estimacion_puntadas(salida, ANCHO_CM, DENSIDAD)['estimatedStitches'],
+        "colores": {c['hex'] for c in obtener_colores_dominantes_avanzado(salida)},
+    }
+
+def _iou(a, b):
+    union = np.count_nonzero(a | b)
+    return 1.0 if union == 0 else np.count_nonzero(a & b) / union
+
+def comparar(logos, referencia, candidato):
+    rutas = _logos(logos)
+    sesiones = {"referencia": _sesion(referencia), "candidato": _sesion(candidato)}
+    # Calentamiento: la primera inferencia incluye inicialización de ONNX Runtime
+    with Image.open(rutas[0]) as img:
+        for sesion in sesiones.values():
+            quitar_fondo(img, session=sesion)
+
+    filas = []
+    print(f"{'logo':<28} | {'IoU':>5} | {'puntadas ref':>12} | {'cand':>7} | {'Δ%':>6} | {'colores':>7} | {'ms ref':>7} | {'ms cand':>7}")
+    for ruta in rutas:
+        with Image.open(ruta) as img:
+            img.load()
+            ref = _correr(sesiones["referencia"], img)
+            cand = _correr(sesiones["candidato"], img)
+        error = abs(cand["puntadas"] - ref["puntadas"]) / ref["puntadas"] if ref["puntadas"] else 0.0
+        union_colores = ref["colores"] | cand["colores"]
+        fila = {
+            "logo": os.path.basename(ruta),
+            "iou": round(_iou(ref["mascara"], cand["mascara"]), 4),
+            "puntadas_referencia": ref["puntadas"],
+            "puntadas_candidato": cand["puntadas"],
+            "error_puntadas": round(error, 4),
+            "colores_iguales": ref["colores"] == cand["colores"],
+            "jaccard_colores": round(len(ref["colores"] & cand["colores"]) / len(union_colores), 3) if union_colores else 1.0,
+            "ms_referencia": round(ref["ms"], 1),
+            "ms_candidato": round(cand["ms"], 1),
+        }
+        filas.append(fila)
+        print(f"{fila['logo'][:28]:<28} | {fila['iou']:>5.3f} | {ref['puntadas']:>12} | {cand['puntadas']:>7} | "
+              f"{error * 100:>6.1f} | {'=' if fila['colores_iguales'] else '≠':>7} | {ref['ms']:>7.0f} | {cand['ms']:>7.0f}")
+
+    ms_ref = statistics.median(f["ms_referencia"] for f in filas)
+    ms_cand = statistics.median(f["ms_candidato"] for f in filas)
+    resumen = {
+        "referencia": referencia,
+        "candidato": candidato,
+        "logos": len(filas),
+        "iou_promedio": round(statistics.mean(f["iou"] for f in filas), 4),
+        "iou_minimo": min(f["iou"] for f in filas),
+        "error_puntadas_promedio": round(statistics.mean(f["error_puntadas"] for f in filas), 4),
+        "error_puntadas_maximo": max(f["error_puntadas"] for f in filas),
+        "colores_iguales": sum(f["colores_iguales"] for f in filas),
+        "jaccard_colores_promedio": round(statistics.mean(f["jaccard_colores"] for f in filas), 3),
+        "ms_mediana_referencia": ms_ref,
+        "ms_mediana_candidato": ms_cand,
+        "aceleracion": round(ms_ref / ms_cand, 2) if ms_cand else None,
+        "detalle": filas,
+    }
+    print(f"\n📊 {candidato} vs {referencia} en {len(filas)} logos")
+    print(f"   IoU máscara: promedio {resumen['iou_promedio']:.3f}, mínimo {resumen['iou_minimo']:.3f}")
+    print(f"   Puntadas: error promedio {resumen['error_puntadas_promedio'] * 100:.1f}%, "
+          f"máximo {resumen['error_puntadas_maximo'] * 100:.1f}%")
+    print(f"   Colores: {resumen['colores_iguales']}/{len(filas)} idénticos, Jaccard promedio {resumen['jaccard_colores_promedio']:.2f}")
+    print(f"   Tiempo (mediana): {ms_ref:.0f} ms -> {ms_cand:.0f} ms (x{resumen['aceleracion']})")
+    return resumen
+
+def main():
+    parser = argparse.ArgumentParser(description="Modelo de segmentación reducido: cuantización y comparación contra el completo.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('cuantizar', help="Exporta un modelo de rembg a int8")
+    p.add_argument('--modelo', default='u2net', help="Modelo de rembg de origen (default u2net)")
+    p.add_argument('--salida', default=os.path.join('modelos', 'u2net_int8.onnx'))
+    p.add_argument('--calibracion', metavar='DIR', help="Logos para cuantización estática (sin esto: dinámica)")
+
+    p = sub.add_parser('comparar', help="Compara un candidato contra el modelo completo")
+    p.add_argument('--logos', default='logos_referencia', help="Directorio con los logos de referencia")
+    p.add_argument('--referencia', default='u2net', help="Modelo de referencia (default u2net)")
+    p.add_argument('--candidato', required=True, help="Nombre de modelo de rembg o ruta a un .onnx")
+    p.add_argument('--json', metavar='ARCHIVO', help="Guarda el resultado en ARCHIVO")
+
+    args = parser.parse_args()
+    if args.comando == 'cuantizar':
+        cuantizar(args.modelo, args.salida, args.calibracion)
+        return 0
+    resumen = comparar(args.logos, args.referencia, args.candidato)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(resumen, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
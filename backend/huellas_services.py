@@ -0,0 +1,262 @@
+import os
+import hmac
+import time
+import hashlib
+import secrets
+import threading
+import numpy as np
+from PIL import Image
+from sqlalchemy import select, insert, or_
+from database import db, HuellaDiseno, Orden, CotizacionArchivada, OrdenArchivada
+import serializers
+
+# ==========================================
+# 🔍 DISEÑOS PARECIDOS (hash perceptual)
+# ==========================================
+# Cada diseño procesado tiene una "huella" de dos hashes de 64 bits:
+#   - pHash de la silueta (canal alfa después de quitar el fondo): no cambia
+#     al recolorear, redimensionar o volver a fotografiar el mismo logo,
+#   - dHash de la luminancia: separa diseños distintos con la misma silueta
+#     (p. ej. dos escudos redondos).
+# Las huellas se guardan en cotizacion_huellas al guardar la cotización
+# (/process devuelve la huella firmada con HMAC y el frontend la manda en el
+# payload; una huella sin firma válida se descarta, así nadie puede asociar
+# un hash inventado a una cotización) y las que faltan se calculan con
+# backfill_huellas.py.
+#
+# Cada proceso arma un BK-tree sobre el pHash (búsqueda por distancia de
+# Hamming sin recorrer todo) y en cada consulta trae solo las huellas nuevas
+# desde la última (cursor = id de cotizacion_huellas). Un id que se saltó
+# (su transacción todavía no hacía commit) se vuelve a buscar durante
+# HUELLAS_ESPERA_HUECOS_SEG.
+
+UMBRAL_PHASH = int(os.getenv('HUELLAS_UMBRAL_PHASH', 10))
+UMBRAL_DHASH = int(os.getenv('HUELLAS_UMBRAL_DHASH', 20))
+MAX_SIMILARES = int(os.getenv('HUELLAS_MAX_SIMILARES', 5))
+ESPERA_HUECOS_SEG = float(os.getenv('HUELLAS_ESPERA_HUECOS_SEG', 60))
+MAX_HUECO = 1000
+# Con gunicorn (preload_app) el secreto aleatorio se genera en el master y lo
+# comparten los workers; definir HUELLAS_SECRETO si hay varios servidores.
+_SECRETO = (os.getenv('HUELLAS_SECRETO') or secrets.token_hex(32)).encode()
+LADO_DCT = 32
+LADO_HASH = 8
+ALFA_OPACO = 240
+# Coeficientes DCT a menos de este % del mayor cuentan como 0: en siluetas
+# simétricas muchos valen ~0 y cambiarían de bit con solo redimensionar
+ZONA_MUERTA = 0.01
+
+def _matriz_dct(n):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[np.newaxis, :] + 1) * k[:, np.newaxis] / (2 * n))
+    m[0] *= 1 / np.sqrt(2)
+    return m * np.sqrt(2 / n)
+
+_DCT = _matriz_dct(LADO_DCT)
+
+def _a_entero(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+def _con_signo(h):
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+def _sin_signo(h):
+    return h + (1 << 64) if h < 0 else h
+
+def distancia(a, b):
+    return bin(a ^ b).count('1')
+
+def _gris(imagen_pil):
+    """Luminancia con lo transparente sobre blanco (igual que se ve el diseño)."""
+    if 'A' in imagen_pil.getbands():
+        fondo = Image.new('RGBA', imagen_pil.size, (255, 255, 255, 255))
+        return Image.alpha_composite(fondo, imagen_pil.convert('RGBA')).convert('L')
+    return imagen_pil.convert('L')
+
+def _silueta(imagen_pil):
+    """Canal alfa si el diseño tiene fondo recortado; si no, la luminancia."""
+    if 'A' in imagen_pil.getbands():
+        alfa = imagen_pil.getchannel('A')
+        if np.count_nonzero(np.asarray(alfa) < ALFA_OPACO) > alfa.width * alfa.height // 100:
+            return alfa
+    return _gris(imagen_pil)
+
+def dhash(gris):
+    a = np.asarray(gris.resize((LADO_HASH + 1, LADO_HASH), Image.Resampling.LANCZOS), dtype=np.int16)
+    return _a_entero(a[:, 1:] > a[:, :-1])
+
+def phash(canal):
+    a = np.asarray(canal.resize((LADO_DCT, LADO_DCT), Image.Resampling.LANCZOS), dtype=np.float64)
+    bajas = (_DCT @ a @ _DCT.T)[:LADO_HASH, :LADO_HASH].ravel()[1:]  # sin el término DC
+    umbral = np.median(bajas) + ZONA_MUERTA * np.abs(bajas).max()
+    return _a_entero(np.concatenate([[False], bajas > umbral]))
+
+def calcular(imagen_pil):
+    """Huella (dhash, phash) de un diseño procesado."""
+    return dhash(_gris(imagen_pil)), phash(_silueta(imagen_pil))
+
+def a_texto(huella):
+    return f"{huella[0]:016x}{huella[1]:016x}"
+
+def _firma(texto):
+    return hmac.new(_SECRETO, texto.encode(), hashlib.sha256).hexdigest()[:32]
+
+def firmar(huella):
+    """Texto '<huella>.<hmac>' que devuelve /process."""
+    texto = a_texto(huella)
+    return f"{texto}.{_firma(texto)}"
+
+def parsear(texto):
+    """Huella desde el texto firmado de /process; None si no es válida o la firma no coincide."""
+    if not isinstance(texto, str):
+        return None
+    texto, _, firma = texto.partition('.')
+    if len(texto) != 32 or not hmac.compare_digest(firma.encode(), _firma(texto).encode()):
+        return None
+    try:
+        return int(texto[:16], 16), int(texto[16:], 16)
+    except ValueError:
+        return None
+
+def registrar(cotizacion_id, huella):
+    """Guarda la huella dentro de la transacción actual; el commit lo hace quien crea la cotización."""
+    db.session.add(HuellaDiseno(
+        # pyrefly: ignore [unexpected-keyword]
+        cotizacion_id=cotizacion_id,
+        # pyrefly: ignore [unexpected-keyword]
+        dhash=_con_signo(huella[0]),
+        # pyrefly: ignore [unexpected-keyword]
+        phash=_con_signo(huella[1])
+    ))
+
+def guardar_lote(huellas):
+    """Inserta [(cotizacion_id, huella)] y hace commit (backfill)."""
+    if not huellas:
+        return
+    db.session.execute(insert(HuellaDiseno), [
+        {"cotizacion_id": cot_id, "dhash": _con_signo(d), "phash": _con_signo(p)} for cot_id, (d, p) in huellas
+    ])
+    db.session.commit()
+
+# --- ÍNDICE (BK-tree sobre pHash) ---
+
+class _Nodo:
+    __slots__ = ('hash', 'ids', 'hijos')
+
+    def __init__(self, h, cot_id):
+        self.hash = h
+        self.ids = [cot_id]
+        self.hijos = {}
+
+class BKTree:
+    def __init__(self):
+        self.raiz = None
+        self.total = 0
+
+    def agregar(self, h, cot_id):
+        self.total += 1
+        if self.raiz is None:
+            self.raiz = _Nodo(h, cot_id)
+            return
+        nodo = self.raiz
+        while True:
+            d = distancia(h, nodo.hash)
+            if d == 0:
+                nodo.ids.append(cot_id)
+                return
+            hijo = nodo.hijos.get(d)
+            if hijo is None:
+                nodo.hijos[d] = _Nodo(h, cot_id)
+                return
+            nodo = hijo
+
+    def buscar(self, h, radio):
+        """[(distancia, cotizacion_id)] con distancia <= radio."""
+        encontrados = []
+        pendientes = [self.raiz] if self.raiz else []
+        while pendientes:
+            nodo = pendientes.pop()
+            d = distancia(h, nodo.hash)
+            if d <= radio:
+                encontrados.extend((d, cot_id) for cot_id in nodo.ids)
+            # Desigualdad triangular: solo los hijos a distancia d ± radio pueden tener candidatos
+            for dh, hijo in nodo.hijos.items():
+                if d - radio <= dh <= d + radio:
+                    pendientes.append(hijo)
+        return encontrados
+
+class IndiceHuellas:
+    def __init__(self):
+        self.arbol = BKTree()
+        self.dhash = {}     # cotizacion_id -> dhash
+        self.cursor = 0
+        self.huecos = {}    # id saltado -> cuándo se vio el salto
+        self.lock = threading.Lock()
+
+    def sincronizar(self):
+        ahora = time.monotonic()
+        self.huecos = {i: t for i, t in self.huecos.items() if ahora - t < ESPERA_HUECOS_SEG}
+        condicion = HuellaDiseno.id > self.cursor
+        if self.huecos:
+            condicion = or_(condicion, HuellaDiseno.id.in_(list(self.huecos)))
+        filas = db.session.execute(
+            select(HuellaDiseno.id, HuellaDiseno.cotizacion_id, HuellaDiseno.dhash, HuellaDiseno.phash)
+            .where(condicion).order_by(HuellaDiseno.id)
+        ).all()
+        for fila in filas:
+            if self.huecos.pop(fila.id, None) is None:
+                # Ids entre el cursor y esta fila: transacciones sin commit todavía (o revertidas)
+                if self.cursor and 1 < fila.id - self.cursor <= MAX_HUECO:
+                    self.huecos.update((i, ahora) for i in range(self.cursor + 1, fila.id))
+                self.cursor = max(self.cursor, fila.id)
+            self.arbol.agregar(_sin_signo(fila.phash), fila.cotizacion_id)
+            self.dhash[fila.cotizacion_id] = _sin_signo(fila.dhash)
+
+    def buscar(self, huella, limite=MAX_SIMILARES):
+        """[(cotizacion_id, distancia_phash, distancia_dhash)] de los más parecidos."""
+        d_hash, p_hash = huella
+        with self.lock:
+            self.sincronizar()
+            candidatos = self.arbol.buscar(p_hash, UMBRAL_PHASH)
+            medidos = [(cot_id, dp, distancia(d_hash, self.dhash[cot_id])) for dp, cot_id in candidatos]
+        medidos = [m for m in medidos if m[2] <= UMBRAL_DHASH]
+        medidos.sort(key=lambda m: (m[1] + m[2], -m[0]))  # empate: la cotización más reciente
+        return medidos[:limite]
+
+_indice = IndiceHuellas()
+
+def buscar_similares(huella, limite=MAX_SIMILARES):
+    """Cotizaciones previas con diseño parecido, con las puntadas y precios que se guardaron."""
+    encontrados = _indice.buscar(huella, limite)
+    if not encontrados:
+        return []
+    ids = [cot_id for cot_id, _, _ in encontrados]
+    cotizaciones = {c['id']: c for c in serializers.cotizaciones_por_ids(ids)}
+    con_orden = set(db.session.execute(select(Orden.cotizacion_id).where(Orden.cotizacion_id.in_(ids))).scalars())
+    archivadas = [cot_id for cot_id in ids if cot_id not in cotizaciones]
+    if archivadas:
+        # Diseños viejos: la cotización pudo pasar a cotizacion_archivo
+        cotizaciones.update({c.id: c.to_summary_dict() for c in db.session.execute(
+            select(CotizacionArchivada).where(CotizacionArchivada.id.in_(archivadas))).scalars()})
+        con_orden.update(db.session.execute(
+            select(OrdenArchivada.cotizacion_id).where(OrdenArchivada.cotizacion_id.in_(archivadas))).scalars())
+    similares = []
+    for cot_id, dp, dd in encontrados:
+        cot = cotizaciones.get(cot_id)
+        if cot is None:
+            continue  # cotización borrada
+        similares.append({
+            "cotizacion_id": cot_id,
+            "cliente_id": cot["cliente_id"],
+            "nombre_trabajo": cot["nombre_trabajo"],
+            "fecha_pedido": cot["fecha_pedido"],
+            "puntadas": cot["puntadas"],
+            "colores": cot["colores"],
+            "ancho": cot["ancho"],
+            "alto": cot["alto"],
+            "precio_unitario": cot["precio_unitario"],
+            "precio_total": cot["precio_total"],
+            "con_orden": cot_id in con_orden,
+            "distancia_silueta": dp,
+            "distancia_detalle": dd,
+        })
+    return similares
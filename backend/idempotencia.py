@@ -0,0 +1,192 @@
+import os
+import time
+import hashlib
+import functools
+from datetime import datetime, timedelta
+from flask import request, jsonify, make_response, Response
+from sqlalchemy import delete, update, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import db, RespuestaIdempotente
+
+# ==========================================
+# 🔁 IDEMPOTENCY-KEY EN LOS POST DE CREACIÓN
+# ==========================================
+# Un teléfono con mala conexión reintenta POST /orders o /ordenes sin saber si
+# el primero llegó. Si el request trae `Idempotency-Key`, la primera vez se
+# "reserva" la clave (INSERT en idempotencia, la PK resuelve la carrera entre
+# workers), se ejecuta la vista y se guarda su respuesta. Los reintentos con la
+# misma clave y la misma ruta:
+#   - ya terminada: reciben la respuesta guardada tal cual (Idempotent-Replayed: true),
+#     sin volver a insertar nada;
+#   - todavía en curso: 409 con Retry-After;
+#   - con otro cuerpo: 422 (la clave se reutilizó para otra cosa).
+# Las respuestas 5xx no se guardan: la clave se libera y el reintento se ejecuta.
+#
+# El commit de la vista (el INSERT protegido) pasa la reserva a 'hecha' en la
+# MISMA transacción (hook before_commit), y solo si la reserva sigue siendo la
+# de este request. Así:
+#   - una reserva 'en_proceso' de más de IDEMPOTENCIA_RESERVA_SEG se puede
+#     volver a tomar (el worker murió), y si el dueño era solo lento su commit
+#     falla en vez de insertar dos veces;
+#   - si el worker muere entre el commit y guardar la respuesta, la clave queda
+#     'hecha': los reintentos reciben 409, el trabajo no se repite.
+# Las claves viven IDEMPOTENCIA_TTL_HORAS.
+
+IDEMPOTENCIA_TTL_HORAS = float(os.getenv('IDEMPOTENCIA_TTL_HORAS', 24))
+IDEMPOTENCIA_RESERVA_SEG = float(os.getenv('IDEMPOTENCIA_RESERVA_SEG', 60))
+
+HEADER = 'Idempotency-Key'
+HEADER_REPETIDA = 'Idempotent-Replayed'
+MAX_CLAVE = 255
+
+_RESERVA = 'reserva_idempotente'
+
+_ultima_poda = 0.0
+
+class ReservaPerdida(Exception):
+    """Otro request tomó la clave mientras la vista corría: su commit no debe pasar."""
+
+def _de_la_reserva(clave, ruta, fecha_creacion):
+    return (RespuestaIdempotente.clave == clave, RespuestaIdempotente.ruta == ruta,
+            RespuestaIdempotente.fecha_creacion == fecha_creacion)
+
+@event.listens_for(Session, 'before_commit')
+def _marcar_hecha(session):
+    """El primer commit de la vista marca la reserva como 'hecha' junto con el trabajo."""
+    if session.in_nested_transaction():
+        return
+    reserva = session.info.pop(_RESERVA, None)
+    if reserva is None:
+        return
+    marcadas = session.execute(
+        update(RespuestaIdempotente)
+        .where(*_de_la_reserva(*reserva), RespuestaIdempotente.estado == 'en_proceso')
+        .values(estado='hecha')
+    ).rowcount
+    if marcadas != 1:
+        raise ReservaPerdida(f"La reserva de {HEADER} '{reserva[0]}' la tomó otro request")
+
+def podar():
+    """Borra las claves vencidas."""
+    db.session.execute(delete(RespuestaIdempotente).where(RespuestaIdempotente.expira < datetime.utcnow()))
+    db.session.commit()
+
+def _podar_cada_hora():
+    global _ultima_poda
+    if time.monotonic() - _ultima_poda > 3600:
+        _ultima_poda = time.monotonic()
+        try:
+            podar()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ No se pudo podar idempotencia: {e}")
+
+def _respuesta_guardada(fila):
+    return Response(fila.cuerpo, status=fila.status, mimetype=fila.tipo, headers={HEADER_REPETIDA: 'true'})
+
+def _reservar(clave, ruta, huella):
+    """
+    (fecha_creacion, None) si la clave quedó reservada para este request; si
+    no, (None, respuesta a devolver).
+    """
+    for _ in range(3):
+        ahora = datetime.utcnow()
+        db.session.add(RespuestaIdempotente(
+            # pyrefly: ignore [unexpected-keyword]
+            clave=clave,
+            # pyrefly: ignore [unexpected-keyword]
+            ruta=ruta,
+            # pyrefly: ignore [unexpected-keyword]
+            huella=huella,
+            # pyrefly: ignore [unexpected-keyword]
+            estado='en_proceso',
+            # pyrefly: ignore [unexpected-keyword]
+            fecha_creacion=ahora,
+            # pyrefly: ignore [unexpected-keyword]
+            expira=ahora + timedelta(hours=IDEMPOTENCIA_TTL_HORAS)
+        ))
+        try:
+            db.session.commit()
+            return ahora, None
+        except IntegrityError:
+            db.session.rollback()
+
+        fila = db.session.get(RespuestaIdempotente, (clave, ruta))
+        if fila is None:
+            continue  # se liberó entre el INSERT y la lectura
+        abandonada = fila.estado == 'en_proceso' and fila.fecha_creacion < ahora - timedelta(seconds=IDEMPOTENCIA_RESERVA_SEG)
+        if fila.expira < ahora or abandonada:
+            # Solo la borra quien vio esta misma reserva; el INSERT siguiente decide quién se la queda.
+            # Si el dueño seguía vivo, su commit ya no encuentra la reserva y falla (_marcar_hecha).
+            db.session.execute(delete(RespuestaIdempotente).where(*_de_la_reserva(clave, ruta, fila.fecha_creacion)))
+            db.session.commit()
+            continue
+        if fila.huella != huella:
+            return None, (jsonify({"success": False, "message": f"{HEADER} ya usada con otro contenido"}), 422)
+        if fila.estado == 'en_proceso':
+            return None, (jsonify({"success": False, "message": "La misma solicitud todavía se está procesando"}),
+                          409, {"Retry-After": "1"})
+        if fila.estado == 'hecha':
+            # Ya se guardó el trabajo; la respuesta se está guardando o se perdió. No se repite.
+            return None, (jsonify({"success": False, "message": "La misma solicitud ya se procesó; su respuesta todavía no está guardada"}),
+                          409, {"Retry-After": "1"})
+        return None, _respuesta_guardada(fila)
+    return None, (jsonify({"success": False, "message": "No se pudo reservar la clave de idempotencia, reintenta"}),
+                  409, {"Retry-After": "1"})
+
+def _liberar(clave, ruta, fecha_creacion):
+    db.session.rollback()
+    db.session.info.pop(_RESERVA, None)
+    # Si la vista ya hizo commit la reserva está 'hecha' y el trabajo existe: no se libera
+    db.session.execute(delete(RespuestaIdempotente).where(
+        *_de_la_reserva(clave, ruta, fecha_creacion), RespuestaIdempotente.estado == 'en_proceso'
+    ))
+    db.session.commit()
+
+def _guardar(clave, ruta, fecha_creacion, respuesta):
+    db.session.rollback()
+    db.session.info.pop(_RESERVA, None)
+    fila = db.session.get(RespuestaIdempotente, (clave, ruta))
+    if fila is None or fila.fecha_creacion != fecha_creacion:
+        return  # la tomó otro request
+    fila.estado = 'completa'
+    fila.status = respuesta.status_code
+    fila.tipo = respuesta.mimetype
+    fila.cuerpo = respuesta.get_data(as_text=True)
+    db.session.commit()
+
+def idempotente(vista):
+    """Decorador de vista: respeta Idempotency-Key (sin la cabecera, la vista corre como siempre)."""
+    @functools.wraps(vista)
+    def envoltura(*args, **kwargs):
+        clave = request.headers.get(HEADER, '').strip()
+        if not clave:
+            return vista(*args, **kwargs)
+        if len(clave) > MAX_CLAVE:
+            return jsonify({"success": False, "message": f"{HEADER} demasiado larga (máximo {MAX_CLAVE})"}), 400
+
+        _podar_cada_hora()
+        ruta = f"{request.method} {request.path}"
+        huella = hashlib.sha256(request.get_data()).hexdigest()
+        reservada, previa = _reservar(clave, ruta, huella)
+        if previa is not None:
+            return previa
+
+        db.session.info[_RESERVA] = (clave, ruta, reservada)
+        try:
+            respuesta = make_response(vista(*args, **kwargs))
+        except Exception:
+            _liberar(clave, ruta, reservada)
+            raise
+        try:
+            if respuesta.status_code >= 500:
+                _liberar(clave, ruta, reservada)
+            else:
+                _guardar(clave, ruta, reservada, respuesta)
+        except Exception as e:
+            # La respuesta ya está hecha; sin guardar, un reintento puede repetir el trabajo
+            db.session.rollback()
+            print(f"⚠️ No se pudo guardar la respuesta idempotente de {ruta}: {e}")
+        return respuesta
+    return envoltura
@@ -0,0 +1,185 @@
+import os
+import io
+import json
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import blob_store
+
+# ==========================================
+# 🖼️ MINIATURAS Y VISTAS PREVIAS
+# ==========================================
+# Derivados WebP generados una sola vez y guardados en un directorio local:
+#   <DERIVADOS_DIR>/<clave>/<tamaño>.webp
+# La clave es el sha256 del PNG procesado (/process) o "cot-<id>" para
+# cotizaciones guardadas. Se expulsan los menos usados cuando el directorio
+# supera DERIVADOS_MAX_MB.
+
+TAMANOS = {'thumb': 128, 'preview': 512}
+
+# Tope de píxeles al abrir imágenes guardadas (Pillow rechaza las "bombas" por encima)
+Image.MAX_IMAGE_PIXELS = int(os.getenv('IMAGEN_MAX_PIXELES', 40_000_000))
+
+DERIVADOS_DIR = os.getenv('DERIVADOS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'derivados'))
+DERIVADOS_MAX_BYTES = int(float(os.getenv('DERIVADOS_MAX_MB', 500)) * 1024 * 1024)
+
+_lock = threading.Lock()
+_total_bytes = None
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='derivados')
+
+def clave_de_contenido(contenido):
+    return hashlib.sha256(contenido).hexdigest()
+
+def clave_valida(clave):
+    return clave.replace('-', '').isalnum() and len(clave) <= 80
+
+def _ruta(clave, tamano):
+    return os.path.join(DERIVADOS_DIR, clave, f"{tamano}.webp")
+
+def _archivos():
+    for raiz, _, nombres in os.walk(DERIVADOS_DIR):
+        for nombre in nombres:
+            if nombre.endswith('.webp'):
+                yield os.path.join(raiz, nombre)
+
+def _sumar(delta):
+    global _total_bytes
+    with _lock:
+        if _total_bytes is None:
+            _total_bytes = sum(os.path.getsize(r) for r in _archivos())
+        else:
+            _total_bytes += delta
+        return _total_bytes
+
+def _expulsar():
+    """Borra los derivados con acceso más antiguo hasta quedar en el 90% del presupuesto."""
+    global _total_bytes
+    with _lock:
+        archivos = []
+        for ruta in _archivos():
+            try:
+                st = os.stat(ruta)
+                archivos.append((st.st_mtime, st.st_size, ruta))
+            except OSError:
+                continue
+        total = sum(tam for _, tam, _ in archivos)
+        objetivo = DERIVADOS_MAX_BYTES * 0.9
+        for _, tam, ruta in sorted(archivos):
+            if total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+                total -= tam
+            except OSError:
+                pass
+        _total_bytes = total
+
+def generar(imagen_pil, clave):
+    """Genera y guarda todos los tamaños de `imagen_pil` bajo `clave`."""
+    os.makedirs(os.path.join(DERIVADOS_DIR, clave), exist_ok=True)
+    if imagen_pil.mode not in ('RGBA', 'RGB'):
+        imagen_pil = imagen_pil.convert('RGBA')
+    escritos = 0
+    for tamano, lado in TAMANOS.items():
+        copia = imagen_pil.copy()
+        copia.thumbnail((lado, lado), Image.LANCZOS)
+        buffer = io.BytesIO()
+        copia.save(buffer, format='WEBP', quality=80, method=4)
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(DERIVADOS_DIR, clave))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp, _ruta(clave, tamano))
+        escritos += buffer.tell()
+    if _sumar(escritos) > DERIVADOS_MAX_BYTES:
+        _expulsar()
+
+def generar_en_segundo_plano(imagen_pil, clave):
+    """Encola la generación para no sumar latencia a /process."""
+    copia = imagen_pil.copy()
+    def tarea():
+        try:
+            generar(copia, clave)
+        except Exception as e:
+            print(f"⚠️ Error generando derivados de {clave}: {e}")
+    _executor.submit(tarea)
+
+def obtener(clave, tamano):
+    """Ruta del derivado si existe (y lo marca como recién usado), o None."""
+    ruta = _ruta(clave, tamano)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        os.utime(ruta)  # mtime = último acceso, para la expulsión LRU
+    except OSError:
+        pass
+    return ruta
+
+def cargar_imagen_guardada(datos_json):
+    """Abre la imagen de una cotización: blob, URL o Base64 (inline o en el JSON legacy)."""
+    valor = datos_json
+    if isinstance(valor, str) and valor.lstrip().startswith('{'):
+        try:
+            valor = json.loads(valor).get('imagen_procesada')
+        except (ValueError, AttributeError):
+            return None
+    if not valor:
+        return None
+    if blob_store.es_referencia(valor):
+        contenido = blob_store.get_store().get(valor)
+    elif valor.startswith('http'):
+        contenido = blob_store.descargar(valor)
+    else:
+        contenido, _ = blob_store.decodificar_data_url(valor)
+    if not contenido:
+        return None
+    imagen = Image.open(io.BytesIO(contenido))
+    if imagen.width * imagen.height > Image.MAX_IMAGE_PIXELS:
+        raise Image.DecompressionBombError(f"Imagen de {imagen.width}x{imagen.height} píxeles")
+    return imagen
+
+def enlazar(origen, clave):
+    """Copia a `clave` los derivados ya generados bajo `origen` (p. ej. imagen_id -> cot-<id>)."""
+    escritos = 0
+    for tamano in TAMANOS:
+        fuente, destino = _ruta(origen, tamano), _ruta(clave, tamano)
+        if not os.path.exists(fuente) or os.path.exists(destino):
+            continue
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(destino))
+        with os.fdopen(fd, 'wb') as f, open(fuente, 'rb') as g:
+            datos = g.read()
+            f.write(datos)
+        os.replace(tmp, destino)
+        escritos += len(datos)
+    if escritos and _sumar(escritos) > DERIVADOS_MAX_BYTES:
+        _expulsar()
+
+def enlazar_en_segundo_plano(origen, clave):
+    """
+    Encola el enlace detrás de la generación de /process (mismo executor de un
+    hilo), así en este proceso la copia ya encuentra los archivos. Si el
+    derivado se generó en otro worker y todavía no existe, cot-<id> se genera
+    la primera vez que se pide.
+    """
+    if not origen or not clave_valida(origen) or origen.startswith('cot-'):
+        return
+    def tarea():
+        try:
+            enlazar(origen, clave)
+        except Exception as e:
+            print(f"⚠️ Error enlazando derivados {origen} -> {clave}: {e}")
+    _executor.submit(tarea)
+
+def obtener_para_cotizacion(cot, tamano):
+    """Derivado de una cotización guardada; se genera la primera vez que se pide."""
+    clave = f"cot-{cot.id}"
+    ruta = obtener(clave, tamano)
+    if ruta:
+        return ruta
+    imagen = cargar_imagen_guardada(cot.datos_json)
+    if imagen is None:
+        return None
+    generar(imagen, clave)
+    return obtener(clave, tamano)
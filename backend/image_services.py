@@ -5,12 +5,100 @@ import sys
 # Evita el error: "The system cannot find the file specified" en KMeans
 os.environ["LOKY_MAX_CPU_COUNT"] = "1"
 
-from rembg import remove
 from PIL import Image
 import numpy as np
 from sklearn.cluster import KMeans
 import math
 
+# ==========================================
+# ✂️ MODELO DE SEGMENTACIÓN (rembg)
+# ==========================================
+# remove() sin sesión carga el modelo ONNX en cada llamada. Se mantiene una
+# sola sesión por proceso; serve.py la crea en el master antes del fork para
+# que los workers compartan los pesos (copy-on-write). Para eso la sesión se
+# crea sin pools de hilos propios (un_hilo=True: intra/inter-op en 1 y sin
+# spinning): los hilos no sobreviven al fork y un worker que heredara un pool
+# se colgaría en la primera inferencia. El paralelismo lo dan los hilos de
+# gunicorn, cada uno con su propio Run() sobre la sesión compartida.
+# Fuera de serve.py (app.py, eval_segmentacion.py) los hilos de ONNX Runtime
+# siguen la variable OMP_NUM_THREADS.
+# rembg se importa al crear la sesión: el resto del módulo (colores, puntadas)
+# funciona sin él, p. ej. en loadtest.py con el modelo simulado.
+#
+# REMBG_MODEL elige un modelo de rembg por nombre (u2net, u2netp, silueta...).
+# REMBG_MODEL_PATH usa en cambio un .onnx propio con el preprocesado de u2net,
+# p. ej. u2net cuantizado a int8 con `python eval_segmentacion.py cuantizar`.
+# Antes de cambiarlo en producción: `python eval_segmentacion.py comparar`.
+
+REMBG_MODEL = os.getenv('REMBG_MODEL', 'u2net')
+REMBG_MODEL_PATH = os.getenv('REMBG_MODEL_PATH')
+_rembg_session = None
+
+def opciones_sin_hilos():
+    """SessionOptions de ONNX Runtime que no arrancan pools de hilos (seguras para fork)."""
+    import onnxruntime as ort
+    opciones = ort.SessionOptions()
+    opciones.intra_op_num_threads = 1
+    opciones.inter_op_num_threads = 1
+    opciones.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opciones.add_session_config_entry('session.intra_op.allow_spinning', '0')
+    opciones.add_session_config_entry('session.inter_op.allow_spinning', '0')
+    return opciones
+
+def crear_sesion(modelo=REMBG_MODEL, ruta=REMBG_MODEL_PATH, un_hilo=False):
+    from rembg import new_session
+    nombre, extra = ('u2net_custom', {'model_path': ruta}) if ruta else (modelo, {})
+    if not un_hilo:
+        return new_session(nombre, **extra)
+    # new_session arma sus propias SessionOptions: se instancia la clase directamente
+    from rembg.sessions import sessions_class
+    clase = next((c for c in sessions_class if c.name() == nombre), None)
+    if clase is None:
+        raise ValueError(f"Modelo de rembg desconocido: {nombre}")
+    return clase(nombre, opciones_sin_hilos(), **extra)
+
+def get_rembg_session(un_hilo=False):
+    global _rembg_session
+    if _rembg_session is None:
+        _rembg_session = crear_sesion(un_hilo=un_hilo)
+    return _rembg_session
+
+def quitar_fondo(imagen_pil, session=None):
+    from rembg import remove
+    return remove(imagen_pil, session=session or get_rembg_session())
+
+# Muchos logos llegan como PNG con el fondo ya recortado: pasarlos por rembg
+# cuesta segundos de CPU y a veces se come contornos finos. Antes de segmentar
+# se mira el canal alfa (reducido a LADO_PRECHEQUEO px):
+#   - una parte del área es transparente (ni opaca completa ni vacía),
+#   - el marco de la imagen es casi todo transparente (el fondo toca los bordes),
+#   - los semitransparentes son pocos frente a lo opaco (recorte limpio, no una sombra).
+LADO_PRECHEQUEO = 256
+ALFA_TRANSPARENTE = 16
+ALFA_OPACO = 240
+FONDO_MIN = float(os.getenv('FONDO_TRANSPARENTE_MIN', 0.05))       # fracción mínima de área transparente
+FONDO_BORDE_MIN = float(os.getenv('FONDO_BORDE_TRANSPARENTE_MIN', 0.9))
+SEMITRANSPARENTE_MAX = 0.25                                          # semitransparentes / opacos
+
+def ya_es_transparente(imagen_pil):
+    """True si la imagen ya trae el fondo recortado y no necesita rembg."""
+    if 'A' not in imagen_pil.getbands() and 'transparency' not in imagen_pil.info:
+        return False
+    muestra = imagen_pil.convert('RGBA')
+    muestra.thumbnail((LADO_PRECHEQUEO, LADO_PRECHEQUEO), Image.Resampling.NEAREST)
+    alfa = np.asarray(muestra.getchannel('A'))
+
+    transparente = alfa < ALFA_TRANSPARENTE
+    opacos = np.count_nonzero(alfa >= ALFA_OPACO)
+    semitransparentes = alfa.size - opacos - np.count_nonzero(transparente)
+    if transparente.mean() < FONDO_MIN or opacos == 0:
+        return False
+
+    borde = np.concatenate([transparente[0, :], transparente[-1, :], transparente[:, 0], transparente[:, -1]])
+    if borde.mean() < FONDO_BORDE_MIN:
+        return False
+    return semitransparentes <= SEMITRANSPARENTE_MAX * opacos
+
 # ==========================================
 # 🎨 CONFIGURACIÓN DE COLORES
 # ==========================================
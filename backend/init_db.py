@@ -0,0 +1,17 @@
+from app import app
+from database import init_db_data
+import db_services
+
+def init_db():
+    """
+    Inicialización única de la base: tablas, migraciones automáticas, índices,
+    precios iniciales y admin por defecto. Correr una vez por despliegue, no en
+    cada worker.
+    """
+    init_db_data(app)
+    with app.app_context():
+        db_services.ensure_default_admin()
+    print("✅ Base de datos inicializada.")
+
+if __name__ == '__main__':
+    init_db()
@@ -0,0 +1,377 @@
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import statistics
+import urllib.request
+import urllib.error
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# ==========================================
+# 🧪 PRUEBA DE CARGA SIN SERVIDORES DE PRODUCCIÓN
+# ==========================================
+# Levanta la API contra bases locales (archivos SQLite por defecto, o las URLs
+# que se pasen, p. ej. un PostgreSQL desechable), siembra volúmenes realistas
+# y la golpea con tráfico mixto concurrente. Al final reporta throughput y
+# latencias por endpoint.
+#
+# /process corre con el modelo de segmentación y la subida a Cloudinary
+# simulados dentro de este proceso (--latencia-modelo fija cuánto tarda el
+# modelo falso), para medir la API y no a rembg ni a la red.
+
+MEZCLA_DEFAULT = {
+    'GET /ordenes': 25,
+    'GET /clients/:id/orders': 20,
+    'GET /clients/:id/ordenes': 10,
+    'GET /orders/:id': 20,
+    'GET /ordenes/:id': 10,
+    'POST /orders': 10,
+    'POST /process': 5,
+}
+
+TRABAJOS = ['Logo pecho izquierdo', 'Escudo espalda', 'Nombre en manga', 'Gorra frontal', 'Parche bordado']
+TELAS = ['Algodón', 'Polo', 'Drill', 'Jean', 'Gabardina']
+BASTIDORES = ['10x10', '15x15', '20x20', '30x30']
+
+def _url_sqlite(ruta):
+    # timeout: los hilos del servidor esperan el lock de escritura en vez de fallar
+    return f"sqlite:///{ruta}?timeout=30"
+
+def _configurar_entorno(args):
+    """Debe correr antes de importar app: la configuración se lee al importar."""
+    os.makedirs(args.dir, exist_ok=True)
+    os.environ['DATABASE_MYSQL'] = args.mysql_url or _url_sqlite(os.path.join(args.dir, 'mysql.db'))
+    os.environ['DATABASE_POSTGRESQL'] = args.postgresql_url or _url_sqlite(os.path.join(args.dir, 'postgresql.db'))
+    if args.mysql_replica_url:
+        os.environ['DATABASE_MYSQL_REPLICAS'] = args.mysql_replica_url
+    if args.postgresql_replica_url:
+        os.environ['DATABASE_POSTGRESQL_REPLICAS'] = args.postgresql_replica_url
+    os.environ.setdefault('BLOB_DIR', os.path.join(args.dir, 'blobs'))
+    os.environ.setdefault('DERIVADOS_DIR', os.path.join(args.dir, 'derivados'))
+
+def _sqlite_wal(engine):
+    from sqlalchemy import event
+    if engine.dialect.name != 'sqlite':
+        return
+    @event.listens_for(engine, 'connect')
+    def _pragma(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")  # lectores concurrentes con un escritor
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+def _simular_process(latencia_ms):
+    """Reemplaza en este proceso el modelo y la subida a Cloudinary usados por /process."""
+    import app as app_module
+    import cloudinary
+    import cloudinary.uploader
+
+    def quitar_fondo_simulado(imagen_pil):
+        time.sleep(latencia_ms / 1000)
+        return imagen_pil.convert('RGBA')
+
+    def upload_simulado(archivo, **kwargs):
+        return {"public_id": f"{kwargs.get('folder', 'loadtest')}/{uuid.uuid4().hex}"}
+
+    app_module.quitar_fondo = quitar_fondo_simulado
+    cloudinary.uploader.upload = upload_simulado
+    if not cloudinary.config().cloud_name:
+        cloudinary.config(cloud_name='loadtest')
+
+# ==========================================
+# 🌱 SIEMBRA
+# ==========================================
+
+def _en_lotes(tabla, filas, tamano=2000):
+    from sqlalchemy import insert
+    from database import db
+    for i in range(0, len(filas), tamano):
+        db.session.execute(insert(tabla), filas[i:i + tamano])
+    db.session.commit()
+
+def _ajustar_secuencias(*modelos):
+    """Los ids sembrados son explícitos: en PostgreSQL hay que mover la secuencia detrás del máximo."""
+    from sqlalchemy import text
+    from database import db
+    for modelo in modelos:
+        if db.session.get_bind(mapper=modelo.__mapper__).dialect.name == 'postgresql':
+            tabla = modelo.__tablename__
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), (SELECT coalesce(max(id), 1) FROM {tabla}))"
+            ), bind_arguments={"mapper": modelo.__mapper__})
+    db.session.commit()
+
+def sembrar(clientes, personal, cotizaciones, pct_ordenes, semilla=42):
+    """Siembra datos con la forma de producción; devuelve (ids_cliente, ids_cotizacion, ids_orden, config_id)."""
+    from database import db, Clientes, Personal, Cotizacion, Orden, ConfiguracionPrecios
+    import report_services
+
+    rnd = random.Random(semilla)
+    config_id = ConfiguracionPrecios.query.first().id
+    if Cotizacion.query.first() is None:
+        print(f"🌱 Sembrando {clientes} clientes, {personal} empleados, {cotizaciones} cotizaciones...")
+        inicio = time.perf_counter()
+        base_cliente = (db.session.query(db.func.max(Clientes.id)).scalar() or 0) + 1
+        _en_lotes(Clientes, [
+            {"id": base_cliente + i, "nombre": f"Cliente {base_cliente + i}",
+             "numero_referencia": f"7{rnd.randint(1000000, 9999999)}", "domicilio": f"Calle {rnd.randint(1, 500)}",
+             "estado": True}
+            for i in range(clientes)
+        ])
+        base_personal = (db.session.query(db.func.max(Personal.id)).scalar() or 0) + 1
+        _en_lotes(Personal, [
+            {"id": base_personal + i, "nombre": f"Empleado {i}", "usuario": f"loadtest{base_personal + i}",
+             "rol": 'empleado', "password_hash": 'loadtest', "activo": True}
+            for i in range(personal)
+        ])
+        ids_cliente = range(base_cliente, base_cliente + clientes)
+        ids_personal = range(base_personal, base_personal + personal)
+        hoy = datetime.utcnow()
+        filas_cot, filas_orden = [], []
+        for i in range(1, cotizaciones + 1):
+            pedido = hoy - timedelta(minutes=rnd.randint(0, 60 * 24 * 540))
+            cantidad = rnd.randint(1, 300)
+            unitario = round(rnd.uniform(8, 60), 2)
+            filas_cot.append({
+                "id": i, "cliente_id": rnd.choice(ids_cliente), "configuracion_id": config_id,
+                "nombre_trabajo": rnd.choice(TRABAJOS), "fecha_pedido": pedido,
+                "puntadas": rnd.randint(2000, 40000), "colores": rnd.randint(1, 9),
+                "ancho": round(rnd.uniform(4, 30), 2), "alto": round(rnd.uniform(4, 30), 2),
+                "bastidor": rnd.choice(BASTIDORES), "tipo_tela": rnd.choice(TELAS),
+                "tiene_sublimacion": int(rnd.random() < 0.2), "cantidad": cantidad,
+                "precio_unitario": unitario, "precio_total": round(unitario * cantidad, 2),
+                "datos_json": None, "detalles": None, "personal_id": rnd.choice(ids_personal),
+            })
+            if rnd.random() < pct_ordenes:
+                filas_orden.append({
+                    "id": len(filas_orden) + 1, "cotizacion_id": i,
+                    "estado": rnd.choice(['en_proceso', 'en_proceso', 'entregado', 'cancelado']),
+                    "fecha_entrega": (pedido + timedelta(days=rnd.randint(2, 20))).date(),
+                    "detail": rnd.choice([None, 'Hilo dorado', 'Entregar en caja']),
+                    "fecha_creacion": pedido + timedelta(hours=rnd.randint(1, 48)),
+                    "personal_id": rnd.choice(ids_personal),
+                })
+        _en_lotes(Cotizacion, filas_cot)
+        _en_lotes(Orden, filas_orden)
+        _ajustar_secuencias(Clientes, Personal, Cotizacion, Orden)
+        desde, hasta = report_services.rango_historial()
+        if desde:
+            report_services.refrescar_rango(desde, hasta)
+            db.session.commit()
+        print(f"✅ Siembra lista en {time.perf_counter() - inicio:.1f}s ({len(filas_orden)} órdenes)")
+
+    ids_cliente = [r[0] for r in db.session.query(Clientes.id).all()]
+    ids_cot = [r[0] for r in db.session.query(Cotizacion.id).all()]
+    ids_orden = [r[0] for r in db.session.query(Orden.id).all()]
+    return ids_cliente, ids_cot, ids_orden, config_id
+
+# ==========================================
+# 🚦 TRÁFICO
+# ==========================================
+
+def _imagen_de_prueba(lado=400):
+    from PIL import Image, ImageDraw
+    imagen = Image.new('RGB', (lado, lado), 'white')
+    dibujo = ImageDraw.Draw(imagen)
+    dibujo.ellipse((lado // 8, lado // 8, lado * 7 // 8, lado * 7 // 8), fill=(200, 30, 40))
+    dibujo.rectangle((lado // 3, lado // 3, lado * 2 // 3, lado * 2 // 3), fill=(20, 60, 160))
+    buffer = io.BytesIO()
+    imagen.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def _multipart(campos, archivo):
+    limite = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos.items():
+        partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode())
+    nombre, nombre_archivo, contenido = archivo
+    partes.append(
+        f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"; filename="{nombre_archivo}"\r\n'
+        f'Content-Type: image/png\r\n\r\n'.encode() + contenido + b'\r\n'
+    )
+    partes.append(f'--{limite}--\r\n'.encode())
+    return b''.join(partes), f'multipart/form-data; boundary={limite}'
+
+class Trafico:
+    def __init__(self, base_url, datos, mezcla, semilla=7):
+        self.base_url = base_url.rstrip('/')
+        self.ids_cliente, self.ids_cot, self.ids_orden, self.config_id = datos
+        vacios = {'GET /ordenes/:id'} if not self.ids_orden else set()
+        self.endpoints = [e for e in mezcla if e not in vacios]
+        self.pesos = [mezcla[e] for e in self.endpoints]
+        self.imagen = _imagen_de_prueba()
+        self.semilla = semilla
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+
+    def _peticion(self, rnd, endpoint):
+        if endpoint == 'GET /ordenes':
+            return 'GET', '/ordenes', None, None
+        if endpoint == 'GET /clients/:id/orders':
+            return 'GET', f"/clients/{rnd.choice(self.ids_cliente)}/orders", None, None
+        if endpoint == 'GET /clients/:id/ordenes':
+            return 'GET', f"/clients/{rnd.choice(self.ids_cliente)}/ordenes", None, None
+        if endpoint == 'GET /orders/:id':
+            return 'GET', f"/orders/{rnd.choice(self.ids_cot)}", None, None
+        if endpoint == 'GET /ordenes/:id':
+            return 'GET', f"/ordenes/{rnd.choice(self.ids_orden)}", None, None
+        if endpoint == 'POST /orders':
+            cantidad = rnd.randint(1, 100)
+            cuerpo = {
+                "cliente_id": rnd.choice(self.ids_cliente), "configuracion_id": self.config_id,
+                "nombre_trabajo": rnd.choice(TRABAJOS), "puntadas": rnd.randint(2000, 40000),
+                "colores": rnd.randint(1, 9), "ancho": 10, "alto": 8, "bastidor": rnd.choice(BASTIDORES),
+                "tipo_tela": rnd.choice(TELAS), "cantidad": cantidad, "precio_unitario": 15,
+                "precio_total": 15 * cantidad,
+            }
+            return 'POST', '/orders', json.dumps(cuerpo).encode(), 'application/json'
+        if endpoint == 'POST /process':
+            cuerpo, tipo = _multipart({"width": rnd.choice([5, 8, 10, 15])}, ('image', 'logo.png', self.imagen))
+            return 'POST', '/process', cuerpo, tipo
+        raise ValueError(f"Endpoint desconocido en la mezcla: {endpoint}")
+
+    def _registrar(self, endpoint, ms, ok):
+        with self.lock:
+            self.latencias[endpoint].append(ms)
+            if not ok:
+                self.errores[endpoint] += 1
+
+    def _cliente(self, indice, fin, max_peticiones):
+        rnd = random.Random(self.semilla + indice)
+        hechas = 0
+        while time.perf_counter() < fin and (max_peticiones is None or hechas < max_peticiones):
+            endpoint = rnd.choices(self.endpoints, self.pesos)[0]
+            metodo, ruta, cuerpo, tipo = self._peticion(rnd, endpoint)
+            req = urllib.request.Request(self.base_url + ruta, data=cuerpo, method=metodo)
+            req.add_header('Accept-Encoding', 'gzip')
+            if tipo:
+                req.add_header('Content-Type', tipo)
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=60) as res:
+                    res.read()
+                    ok = res.status < 400
+            except urllib.error.HTTPError as e:
+                e.read()
+                ok = e.code == 404  # un id borrado por otra petición no es un error del servidor
+            except Exception:
+                ok = False
+            self._registrar(endpoint, (time.perf_counter() - inicio) * 1000, ok)
+            hechas += 1
+
+    def correr(self, concurrencia, duracion, max_peticiones=None):
+        fin = time.perf_counter() + duracion
+        hilos = [threading.Thread(target=self._cliente, args=(i, fin, max_peticiones), daemon=True)
+                 for i in range(concurrencia)]
+        inicio = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        return time.perf_counter() - inicio
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+def reporte(trafico, segundos):
+    """Tabla por endpoint; devuelve también el resumen como dict (para --json)."""
+    resumen = {}
+    print(f"\n{'endpoint':<26} | {'n':>6} | {'err':>4} | {'req/s':>7} | {'p50':>7} | {'p95':>7} | {'p99':>7} | {'max':>7}")
+    todas = []
+    for endpoint in trafico.endpoints:
+        lat = trafico.latencias.get(endpoint, [])
+        todas.extend(lat)
+        fila = {
+            "n": len(lat), "errores": trafico.errores.get(endpoint, 0), "rps": len(lat) / segundos,
+            "p50_ms": _percentil(lat, 50), "p95_ms": _percentil(lat, 95), "p99_ms": _percentil(lat, 99),
+            "max_ms": max(lat) if lat else 0.0,
+        }
+        resumen[endpoint] = fila
+        print(f"{endpoint:<26} | {fila['n']:>6} | {fila['errores']:>4} | {fila['rps']:>7.1f} | "
+              f"{fila['p50_ms']:>7.1f} | {fila['p95_ms']:>7.1f} | {fila['p99_ms']:>7.1f} | {fila['max_ms']:>7.1f}")
+    total_err = sum(trafico.errores.values())
+    print(f"{'TOTAL':<26} | {len(todas):>6} | {total_err:>4} | {len(todas) / segundos:>7.1f} | "
+          f"{_percentil(todas, 50):>7.1f} | {_percentil(todas, 95):>7.1f} | {_percentil(todas, 99):>7.1f} | "
+          f"{max(todas) if todas else 0.0:>7.1f}")
+    print(f"(latencias en ms, {segundos:.1f}s, media {statistics.mean(todas) if todas else 0:.1f} ms)")
+    resumen["total"] = {"n": len(todas), "errores": total_err, "rps": len(todas) / segundos, "segundos": segundos}
+    return resumen
+
+def _mezcla(texto):
+    """'GET /ordenes=30,POST /orders=5' -> dict; los endpoints no mencionados quedan con su peso default."""
+    mezcla = dict(MEZCLA_DEFAULT)
+    for parte in filter(None, (texto or '').split(',')):
+        endpoint, _, peso = parte.rpartition('=')
+        if endpoint.strip() not in MEZCLA_DEFAULT:
+            raise argparse.ArgumentTypeError(f"Endpoint desconocido: {endpoint.strip()}")
+        mezcla[endpoint.strip()] = int(peso)
+    return {e: p for e, p in mezcla.items() if p > 0}
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API con bases locales y tráfico mixto.")
+    parser.add_argument('--dir', default=os.path.join(tempfile.gettempdir(), 'zequitex_loadtest'),
+                        help="Directorio de las bases SQLite, blobs y derivados (se reutiliza entre corridas)")
+    parser.add_argument('--mysql-url', help="URL para el bind por defecto (default: SQLite en --dir)")
+    parser.add_argument('--postgresql-url', help="URL para el bind 'postgresql' (default: SQLite en --dir)")
+    parser.add_argument('--mysql-replica-url', help="Réplica(s) de lectura del bind por defecto, separadas por coma")
+    parser.add_argument('--postgresql-replica-url', help="Réplica(s) de lectura del bind 'postgresql', separadas por coma")
+    parser.add_argument('--clientes', type=int, default=2000)
+    parser.add_argument('--personal', type=int, default=25)
+    parser.add_argument('--cotizaciones', type=int, default=30000)
+    parser.add_argument('--pct-ordenes', type=float, default=0.6, help="Fracción de cotizaciones con orden (default 0.6)")
+    parser.add_argument('--concurrencia', type=int, default=8, help="Clientes simultáneos (default 8)")
+    parser.add_argument('--duracion', type=float, default=30, help="Segundos de tráfico (default 30)")
+    parser.add_argument('--peticiones', type=int, help="Tope de peticiones por cliente (además de --duracion)")
+    parser.add_argument('--mezcla', type=_mezcla, default=dict(MEZCLA_DEFAULT),
+                        help="Pesos, p. ej. 'GET /ordenes=40,POST /process=0'")
+    parser.add_argument('--latencia-modelo', type=float, default=150, help="ms del modelo simulado en /process (default 150)")
+    parser.add_argument('--puerto', type=int, default=0, help="Puerto local del servidor (default: uno libre)")
+    parser.add_argument('--json', metavar='ARCHIVO', help="Guarda el resumen en ARCHIVO")
+    args = parser.parse_args()
+
+    _configurar_entorno(args)
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from app import app, db
+    from database import init_db_data
+
+    with app.app_context():
+        for engine in db.engines.values():
+            _sqlite_wal(engine)
+    init_db_data(app)
+    _simular_process(args.latencia_modelo)
+    with app.app_context():
+        datos = sembrar(args.clientes, args.personal, args.cotizaciones, args.pct_ordenes)
+
+    class SinLog(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass  # una línea por petición distorsiona la medición
+
+    servidor = make_server('127.0.0.1', args.puerto, app, threaded=True, request_handler=SinLog)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{servidor.server_port}"
+    print(f"🚀 API en {base_url} | {args.concurrencia} clientes | {args.duracion:.0f}s | "
+          f"bases: {os.environ['DATABASE_MYSQL'].split(':', 1)[0]} / {os.environ['DATABASE_POSTGRESQL'].split(':', 1)[0]}")
+
+    trafico = Trafico(base_url, datos, args.mezcla)
+    segundos = trafico.correr(args.concurrencia, args.duracion, args.peticiones)
+    servidor.shutdown()
+
+    resumen = reporte(trafico, segundos)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(resumen, f, indent=2)
+    return 1 if resumen["total"]["errores"] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,14 @@
 import os
+import sys
 import json
+import time
 import base64
+import argparse
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import cloudinary.uploader
+from sqlalchemy import select, update, bindparam
 from app import app, db, Cotizacion
 
 # Configuración de Cloudinary (Debe coincidir con app.py si no usas env vars)
@@ -16,67 +23,160 @@ cloudinary.config(
   api_secret = os.getenv("CLOUDINARY_API_SECRET")
 )
 
-def migrate_images():
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrate_images.checkpoint.json')
+
+# ==========================================
+# ☁️ DESTINOS DE SUBIDA
+# ==========================================
+
+def _payload_base64(image_data):
+    # Si es raw base64 (sin prefijo, legacy) se le agrega para que Cloudinary lo reconozca
+    if not image_data.startswith("data:"):
+        return "data:image/png;base64," + image_data
+    return image_data
+
+class CloudinaryUploader:
+    def upload(self, cot_id, image_data):
+        upload_result = cloudinary.uploader.upload(_payload_base64(image_data), folder="zequitex_orders")
+        return upload_result["secure_url"]
+
+class LocalUploader:
+    """Destino local para pruebas: escribe el archivo en disco y devuelve su URL."""
+    def __init__(self, directorio, base_url=None):
+        self.directorio = directorio
+        self.base_url = (base_url or 'http://localhost/zequitex_orders').rstrip('/')
+        os.makedirs(directorio, exist_ok=True)
+
+    def upload(self, cot_id, image_data):
+        contenido = base64.b64decode(_payload_base64(image_data).split(',', 1)[1])
+        nombre = f"{cot_id}_{hashlib.sha1(contenido).hexdigest()[:12]}.png"
+        with open(os.path.join(self.directorio, nombre), 'wb') as f:
+            f.write(contenido)
+        return f"{self.base_url}/{nombre}"
+
+# ==========================================
+# 📍 CHECKPOINT
+# ==========================================
+
+def leer_checkpoint(path=CHECKPOINT_FILE):
+    try:
+        with open(path) as f:
+            return int(json.load(f).get('ultimo_id', 0))
+    except (OSError, ValueError):
+        return 0
+
+def guardar_checkpoint(ultimo_id, path=CHECKPOINT_FILE):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({"ultimo_id": ultimo_id, "actualizado": time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+    os.replace(tmp, path)  # atómico: nunca queda un checkpoint a medio escribir
+
+# ==========================================
+# 🚀 MIGRACIÓN
+# ==========================================
+
+def _filas_pendientes(desde_id, lote):
     """
-    Recorre todas las cotizaciones. Si encuentra una imagen en Base64 en 'datos_json',
-    la sube a Cloudinary y actualiza el registro con la URL.
+    Lee (id, datos_json) con un cursor del lado del servidor sobre una conexión
+    propia, de `lote` en `lote`, sin cargar la tabla completa en memoria.
     """
-    print("🚀 Iniciando migración de imágenes a Cloudinary...")
-    
-    with app.app_context():
-        cotizaciones = Cotizacion.query.all()
-        count = 0
-        total = len(cotizaciones)
-        print(f"🔍 Analizando {total} cotizaciones...")
+    stmt = select(Cotizacion.id, Cotizacion.datos_json).where(
+        Cotizacion.id > desde_id,
+        Cotizacion.datos_json.isnot(None),
+        Cotizacion.datos_json != '',
+        ~Cotizacion.datos_json.startswith('http'),
+        ~Cotizacion.datos_json.startswith('blob:')
+    ).order_by(Cotizacion.id)
+    with db.engines['postgresql'].connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=lote).execute(stmt)
+        for fila in result:
+            yield fila.id, fila.datos_json
 
-        for cot in cotizaciones:
-            try:
-                if not cot.datos_json:
-                    continue
-
-                # Intentar detectar si es una URL o Base64
-                if cot.datos_json.startswith('http'):
-                    # Ya es una URL, saltar
-                    continue
-                
-                # Si empieza con data:, es un base64 formatted
-                # Si no, asumimos que es base64 raw (legacy)
-                
-                image_data = cot.datos_json
-                
-                # Preparar para subir
-                print(f"Subiendo imagen para Cotización ID {cot.id}...")
-                
-                # Si es raw base64 (sin prefijo), añadirselo para que cloudinary lo reconozca si hace falta,
-                # pero cloudinary.uploader.upload soporta base64 strings directamente si tienen el prefijo.
-                # Si no tienen prefijo, hay que ver.
-                
-                prefix = "data:image/png;base64,"
-                if not image_data.startswith("data:") and not image_data.startswith("http"):
-                    image_payload = prefix + image_data
-                else:
-                    image_payload = image_data
-
-                # Subir a Cloudinary
-                upload_result = cloudinary.uploader.upload(
-                    image_payload, 
-                    folder="zequitex_orders"
-                )
-                
-                secure_url = upload_result["secure_url"]
-                
-                # Actualizar DB
-                cot.datos_json = secure_url
-                count += 1
-                if count % 10 == 0:
-                    db.session.commit() # Commit parcial
-                    print(f"✅ Migradas {count} imágenes...")
+def _guardar_urls(resultados):
+    if not resultados:
+        return
+    stmt = update(Cotizacion.__table__).where(Cotizacion.__table__.c.id == bindparam('b_id')).values(datos_json=bindparam('b_url'))
+    db.session.execute(stmt, [{"b_id": cot_id, "b_url": url} for cot_id, url in resultados])
+    db.session.commit()
+
+def migrate_images(uploader=None, workers=4, lote=50, commit_cada=20, reanudar=True, checkpoint_path=CHECKPOINT_FILE):
+    """
+    Recorre las cotizaciones con imagen en Base64 en 'datos_json', las sube en
+    paralelo (pool acotado) y actualiza cada registro con la URL.
+    El progreso se guarda por último id confirmado, así que se puede cortar y
+    volver a correr: retoma desde el checkpoint.
+    """
+    uploader = uploader or CloudinaryUploader()
+    desde_id = leer_checkpoint(checkpoint_path) if reanudar else 0
+    print(f"🚀 Iniciando migración de imágenes (desde id > {desde_id}, {workers} hilos)...")
+
+    migradas, errores, bytes_subidos = 0, 0, 0
+    inicio = time.perf_counter()
+    # Ids en orden de envío con su estado: el checkpoint avanza solo hasta el
+    # primer id que aún no terminó, aunque las subidas terminen desordenadas.
+    en_orden = deque()
+    terminados = set()
+    por_guardar = []
+    ultimo_confirmado = desde_id
+
+    def confirmar():
+        nonlocal ultimo_confirmado
+        _guardar_urls(por_guardar)
+        terminados.update(cot_id for cot_id, _ in por_guardar)
+        por_guardar.clear()
+        while en_orden and en_orden[0] in terminados:
+            ultimo_confirmado = en_orden.popleft()
+            terminados.discard(ultimo_confirmado)
+        guardar_checkpoint(ultimo_confirmado, checkpoint_path)
 
+    def recoger(futures):
+        nonlocal migradas, errores
+        for future in futures:
+            cot_id = pendientes.pop(future)
+            try:
+                por_guardar.append((cot_id, future.result()))
+                migradas += 1
             except Exception as e:
-                print(f"❌ Error migrando Cotización {cot.id}: {e}")
-        
-        db.session.commit()
-        print(f"✨ Migración completada. Total imágenes migradas: {count}")
+                # Se marca como procesada: la fila sigue en Base64 y se reintenta con --desde-cero
+                print(f"❌ Error migrando Cotización {cot_id}: {e}")
+                terminados.add(cot_id)
+                errores += 1
+        if len(por_guardar) >= commit_cada:
+            confirmar()
+            transcurrido = time.perf_counter() - inicio
+            print(f"✅ Migradas {migradas} imágenes ({migradas / transcurrido:.1f} img/s, "
+                  f"{bytes_subidos / transcurrido / 1024 / 1024:.2f} MB/s)")
+
+    with app.app_context():
+        pendientes = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for cot_id, image_data in _filas_pendientes(desde_id, lote):
+                # Contrapresión: como mucho 2 lotes de trabajo en vuelo
+                while len(pendientes) >= workers * 2:
+                    hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                    recoger(hechos)
+                en_orden.append(cot_id)
+                bytes_subidos += len(image_data)
+                pendientes[pool.submit(uploader.upload, cot_id, image_data)] = cot_id
+            while pendientes:
+                hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                recoger(hechos)
+        confirmar()
+
+    transcurrido = time.perf_counter() - inicio
+    print(f"✨ Migración completada. Migradas: {migradas}, errores: {errores}, "
+          f"{transcurrido:.1f}s ({migradas / transcurrido if transcurrido else 0:.1f} img/s). "
+          f"Último id confirmado: {ultimo_confirmado}")
+    return {"migradas": migradas, "errores": errores, "segundos": transcurrido, "ultimo_id": ultimo_confirmado}
 
 if __name__ == "__main__":
-    migrate_images()
+    parser = argparse.ArgumentParser(description="Migra imágenes Base64 de cotizacion.datos_json a Cloudinary.")
+    parser.add_argument('--workers', type=int, default=4, help="Subidas en paralelo (default 4)")
+    parser.add_argument('--lote', type=int, default=50, help="Filas por lectura del cursor (default 50)")
+    parser.add_argument('--desde-cero', action='store_true', help="Ignora el checkpoint y recorre todo")
+    parser.add_argument('--local', metavar='DIR', help="Usa un destino local en DIR en vez de Cloudinary (pruebas)")
+    args = parser.parse_args()
+
+    destino = LocalUploader(args.local) if args.local else CloudinaryUploader()
+    resultado = migrate_images(destino, workers=args.workers, lote=args.lote, reanudar=not args.desde_cero)
+    sys.exit(1 if resultado['errores'] else 0)
@@ -0,0 +1,64 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# ==========================================
+# 🔑 HASH DE CONTRASEÑAS
+# ==========================================
+# scrypt es intencionalmente caro en CPU y memoria. Todas las verificaciones
+# pasan por un pool acotado: como mucho PASSWORD_WORKERS hashes a la vez y
+# PASSWORD_QUEUE en espera. Una ráfaga de logins (o fuerza bruta) recibe 503
+# en vez de ocupar todos los workers y frenar /process y las órdenes.
+# hashlib.scrypt libera el GIL, así que los hilos del pool corren en paralelo.
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_WORKERS = int(os.getenv('PASSWORD_WORKERS', 2))
+PASSWORD_QUEUE = int(os.getenv('PASSWORD_QUEUE', 8))
+PASSWORD_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_QUEUE_TIMEOUT', 2.0))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix='password')
+_cupos = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE)
+
+class HashSaturado(Exception):
+    """No hubo cupo en el pool de hashing dentro del tiempo de espera."""
+
+def _ejecutar(fn, *args):
+    if not _cupos.acquire(timeout=PASSWORD_QUEUE_TIMEOUT):
+        raise HashSaturado("Demasiadas verificaciones de contraseña en curso")
+    try:
+        future = _executor.submit(fn, *args)
+    except Exception:
+        _cupos.release()
+        raise
+    future.add_done_callback(lambda _: _cupos.release())
+    try:
+        # El cupo ya limita la cola; este timeout solo protege de un hash colgado
+        return future.result(timeout=PASSWORD_QUEUE_TIMEOUT * 10)
+    except FutureTimeoutError:
+        raise HashSaturado("La verificación de contraseña tardó demasiado")
+
+def hash_password(password, method=None):
+    return _ejecutar(generate_password_hash, password, method or PASSWORD_HASH_METHOD)
+
+def check_password(password_hash, password):
+    return _ejecutar(check_password_hash, password_hash, password)
+
+@lru_cache(maxsize=1)
+def _prefijo_actual():
+    # werkzeug normaliza el método (p. ej. 'scrypt' -> 'scrypt:32768:8:1'),
+    # así que el prefijo se toma de un hash real una sola vez.
+    return generate_password_hash('x', PASSWORD_HASH_METHOD).split('$', 1)[0]
+
+def necesita_rehash(password_hash):
+    return (password_hash or '').split('$', 1)[0] != _prefijo_actual()
+
+@lru_cache(maxsize=1)
+def _hash_dummy():
+    return generate_password_hash('zequitex-dummy', PASSWORD_HASH_METHOD)
+
+def check_dummy(password):
+    """Verificación de costo equivalente para usuarios inexistentes."""
+    check_password(_hash_dummy(), password or '')
+    return False
@@ -0,0 +1,75 @@
+import time
+import threading
+from contextlib import contextmanager
+from flask import g, has_request_context
+
+# ==========================================
+# ⏱️ MÉTRICAS POR ETAPA DE /process
+# ==========================================
+# Tiempo acumulado de cada etapa del procesamiento (fondo, puntadas, colores,
+# subida...) en este proceso, más cuántas imágenes se saltaron rembg por venir
+# ya transparentes y el tiempo estimado que eso ahorró (promedio móvil de lo
+# que tarda rembg cuando sí corre). Cada respuesta lleva sus etapas en
+# Server-Timing; el acumulado se lee en GET /process/metrics.
+
+_lock = threading.Lock()
+_etapas = {}
+_fondo = {"con_rembg": 0, "omitidas": 0, "ms_ahorrados": 0.0, "promedio_rembg_ms": None}
+
+def registrar(nombre, ms):
+    with _lock:
+        e = _etapas.setdefault(nombre, {"n": 0, "total_ms": 0.0, "max_ms": 0.0})
+        e["n"] += 1
+        e["total_ms"] += ms
+        e["max_ms"] = max(e["max_ms"], ms)
+    if has_request_context():
+        g.setdefault('etapas_process', []).append((nombre, ms))
+
+class _Medicion:
+    ms = 0.0
+
+@contextmanager
+def etapa(nombre):
+    """Cronometra el bloque; `with etapa('fondo') as m:` deja la duración en m.ms."""
+    medicion = _Medicion()
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    finally:
+        medicion.ms = (time.perf_counter() - inicio) * 1000
+        registrar(nombre, medicion.ms)
+
+def registrar_fondo(omitido, ms=None):
+    """Una imagen pasó (o no) por rembg; `ms` es lo que tardó si pasó."""
+    with _lock:
+        if omitido:
+            _fondo["omitidas"] += 1
+            _fondo["ms_ahorrados"] += _fondo["promedio_rembg_ms"] or 0.0
+        else:
+            _fondo["con_rembg"] += 1
+            previo = _fondo["promedio_rembg_ms"]
+            _fondo["promedio_rembg_ms"] = ms if previo is None else previo * 0.9 + ms * 0.1
+
+def agregar_server_timing(response):
+    """after_request: etapas del request en la cabecera Server-Timing."""
+    etapas = g.get('etapas_process') if has_request_context() else None
+    if etapas:
+        response.headers.add('Server-Timing', ', '.join(f"{nombre};dur={ms:.1f}" for nombre, ms in etapas))
+    return response
+
+def resumen():
+    with _lock:
+        total = _fondo["con_rembg"] + _fondo["omitidas"]
+        return {
+            "etapas": {
+                nombre: {"n": e["n"], "promedio_ms": round(e["total_ms"] / e["n"], 1), "max_ms": round(e["max_ms"], 1)}
+                for nombre, e in _etapas.items()
+            },
+            "fondo": {
+                "con_rembg": _fondo["con_rembg"],
+                "omitidas_ya_transparentes": _fondo["omitidas"],
+                "tasa_omision": round(_fondo["omitidas"] / total, 3) if total else 0.0,
+                "ms_ahorrados": round(_fondo["ms_ahorrados"], 1),
+                "promedio_rembg_ms": round(_fondo["promedio_rembg_ms"] or 0.0, 1),
+            },
+        }
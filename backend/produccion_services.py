@@ -0,0 +1,214 @@
+import os
+import time
+import heapq
+import bisect
+import threading
+from datetime import date, datetime, timedelta
+import serializers
+import change_feed
+
+# ==========================================
+# 🧵 PLAN DE PRODUCCIÓN POR MÁQUINA
+# ==========================================
+# Tiempo de cada orden en_proceso (minutos de máquina):
+#   cantidad × (puntadas / PPM + (colores - 1) × cambio de color + cambio de bastidor)
+# Las órdenes se reparten en N máquinas por fecha de entrega más temprana (EDD):
+# cada orden va a la máquina que se libera primero (heap). Los minutos se
+# pasan a fechas con el calendario de trabajo (horas por día, días hábiles).
+#
+# El plan vive en memoria por proceso y se mantiene con el feed de cambios
+# (change_feed): cada consulta aplica solo las órdenes que cambiaron desde la
+# anterior y re-simula desde la primera posición afectada, partiendo del
+# estado de máquinas guardado en el checkpoint más cercano.
+
+MAQUINAS = int(os.getenv('PRODUCCION_MAQUINAS', 4))
+PPM = float(os.getenv('PRODUCCION_PPM', 800))                      # puntadas por minuto
+CAMBIO_COLOR_SEG = float(os.getenv('PRODUCCION_CAMBIO_COLOR_SEG', 20))
+CAMBIO_BASTIDOR_SEG = float(os.getenv('PRODUCCION_CAMBIO_BASTIDOR_SEG', 45))
+HORA_INICIO = os.getenv('PRODUCCION_HORA_INICIO', '08:00')
+HORAS_DIA = float(os.getenv('PRODUCCION_HORAS_DIA', 8))
+DIAS_HABILES = {int(d) for d in os.getenv('PRODUCCION_DIAS', '0,1,2,3,4,5').split(',') if d.strip()}  # 0 = lunes
+PLAN_TTL = 300       # segundos: después se reconstruye con "ahora" como nuevo origen
+CADA = 256           # posiciones entre checkpoints del estado de máquinas
+
+SIN_FECHA = date.max.toordinal()
+
+def minutos_de_trabajo(puntadas, colores, cantidad, ppm=PPM,
+                       cambio_color_seg=CAMBIO_COLOR_SEG, cambio_bastidor_seg=CAMBIO_BASTIDOR_SEG):
+    por_pieza = (puntadas or 0) / ppm + (max((colores or 1) - 1, 0) * cambio_color_seg + cambio_bastidor_seg) / 60
+    return max(cantidad or 1, 1) * por_pieza
+
+class Calendario:
+    """Convierte minutos de máquina desde `ahora` en fecha y hora dentro de la jornada."""
+    def __init__(self, ahora, hora_inicio=HORA_INICIO, horas_dia=HORAS_DIA, dias_habiles=DIAS_HABILES):
+        h, m = (int(x) for x in hora_inicio.split(':'))
+        self.inicio = timedelta(hours=h, minutes=m)
+        self.capacidad = horas_dia * 60
+        self.dias_habiles = dias_habiles or {0, 1, 2, 3, 4, 5, 6}
+        dia = datetime(ahora.year, ahora.month, ahora.day)
+        apertura = dia + self.inicio
+        cierre = apertura + timedelta(minutes=self.capacidad)
+        if ahora.weekday() in self.dias_habiles and ahora < cierre:
+            self.origen = max(ahora, apertura)
+            self.primer_dia = (cierre - self.origen).total_seconds() / 60
+        else:
+            self.origen = None
+            self.primer_dia = 0
+        self.dias = [self._siguiente_habil(dia)]  # aperturas de los días hábiles siguientes
+
+    def _siguiente_habil(self, dia):
+        dia += timedelta(days=1)
+        while dia.weekday() not in self.dias_habiles:
+            dia += timedelta(days=1)
+        return dia
+
+    def fecha(self, minutos):
+        if minutos < self.primer_dia:
+            return self.origen + timedelta(minutes=minutos)
+        resto = minutos - self.primer_dia
+        k = int(resto // self.capacidad)
+        while len(self.dias) <= k:
+            self.dias.append(self._siguiente_habil(self.dias[-1]))
+        return self.dias[k] + self.inicio + timedelta(minutes=resto - k * self.capacidad)
+
+class Plan:
+    def __init__(self, maquinas=MAQUINAS, ppm=PPM):
+        self.maquinas = maquinas
+        self.ppm = ppm
+        self.trabajos = {}      # orden_id -> (clave, minutos, orden)
+        self.claves = []        # (fecha_entrega ordinal, fecha_creacion, orden_id), orden EDD
+        self.asignacion = []    # paralela a claves: (maquina, inicio, fin) en minutos
+        self.checkpoints = [tuple((0.0, m) for m in range(maquinas))]
+        self.sucio_desde = 0
+        self.cursor = 0
+        self.creado = time.monotonic()
+        self.ahora = datetime.now()
+
+    def poner(self, orden):
+        """Agrega, actualiza o quita (si ya no está en_proceso) una orden."""
+        self.quitar(orden['id'])
+        if orden.get('estado') != 'en_proceso':
+            return
+        entrega = orden.get('fecha_entrega')
+        clave = (date.fromisoformat(entrega[:10]).toordinal() if entrega else SIN_FECHA,
+                 orden.get('fecha_creacion') or '', orden['id'])
+        minutos = minutos_de_trabajo(orden.get('puntadas'), orden.get('colores'), orden.get('cantidad'), self.ppm)
+        pos = bisect.bisect_left(self.claves, clave)
+        self.claves.insert(pos, clave)
+        self.trabajos[orden['id']] = (clave, minutos, orden)
+        self._marcar(pos)
+
+    def quitar(self, orden_id):
+        actual = self.trabajos.pop(orden_id, None)
+        if actual is None:
+            return
+        pos = bisect.bisect_left(self.claves, actual[0])
+        del self.claves[pos]
+        self._marcar(pos)
+
+    def _marcar(self, pos):
+        self.sucio_desde = pos if self.sucio_desde is None else min(self.sucio_desde, pos)
+
+    def recalcular(self):
+        """Re-simula desde la primera posición cambiada (O((n - p) log m))."""
+        if self.sucio_desde is None:
+            return
+        k = min(self.sucio_desde // CADA, len(self.checkpoints) - 1)
+        desde = k * CADA
+        del self.checkpoints[k + 1:]
+        del self.asignacion[desde:]
+        libres = list(self.checkpoints[k])
+        heapq.heapify(libres)
+        for i in range(desde, len(self.claves)):
+            if i % CADA == 0 and i // CADA == len(self.checkpoints):
+                self.checkpoints.append(tuple(libres))
+            libre, maquina = heapq.heappop(libres)
+            fin = libre + self.trabajos[self.claves[i][2]][1]
+            self.asignacion.append((maquina, libre, fin))
+            heapq.heappush(libres, (fin, maquina))
+        self.sucio_desde = None
+
+    def resultado(self, solo_riesgo=False):
+        calendario = Calendario(self.ahora)
+        maquinas = [{"maquina": m + 1, "trabajos": [], "minutos": 0.0, "libre_desde": None}
+                     for m in range(self.maquinas)]
+        en_riesgo = []
+        for clave, (maquina, inicio, fin) in zip(self.claves, self.asignacion):
+            _, minutos, orden = self.trabajos[clave[2]]
+            fin_estimado = calendario.fecha(fin)
+            entrega = orden.get('fecha_entrega')
+            atrasada = bool(entrega) and fin_estimado.date() > date.fromisoformat(entrega[:10])
+            item = {
+                "orden_id": orden['id'],
+                "cotizacion_id": orden.get('cotizacion_id'),
+                "nombre_trabajo": orden.get('nombre_trabajo'),
+                "cliente_nombre": orden.get('cliente_nombre'),
+                "fecha_entrega": entrega,
+                "inicio": calendario.fecha(inicio).isoformat(timespec='minutes'),
+                "fin": fin_estimado.isoformat(timespec='minutes'),
+                "minutos": round(minutos, 1),
+                "en_riesgo": atrasada,
+            }
+            m = maquinas[maquina]
+            m["minutos"] += minutos
+            m["libre_desde"] = item["fin"]
+            if not solo_riesgo:
+                m["trabajos"].append(item)
+            if atrasada:
+                en_riesgo.append({**item, "maquina": maquina + 1})
+        for m in maquinas:
+            m["minutos"] = round(m["minutos"], 1)
+        return {
+            "generado": self.ahora.isoformat(timespec='seconds'),
+            "parametros": {"maquinas": self.maquinas, "ppm": self.ppm, "cambio_color_seg": CAMBIO_COLOR_SEG,
+                           "cambio_bastidor_seg": CAMBIO_BASTIDOR_SEG, "hora_inicio": HORA_INICIO,
+                           "horas_dia": HORAS_DIA},
+            "total_ordenes": len(self.claves),
+            "maquinas": maquinas,
+            "en_riesgo": en_riesgo,
+        }
+
+def _construir(maquinas, ppm):
+    # El cursor se toma ANTES de leer las órdenes: lo que cambie en medio se
+    # vuelve a aplicar después (poner() es idempotente)
+    plan = Plan(maquinas, ppm)
+    plan.cursor = change_feed.cursor_actual()
+    for orden in serializers.ordenes_por_estado('en_proceso'):
+        plan.poner(orden)
+    return plan
+
+def _aplicar_cambios(plan):
+    """Trae del feed solo las órdenes que cambiaron; False si hay que reconstruir."""
+    while True:
+        lote = change_feed.cambios_desde(plan.cursor)
+        if lote['reset']:
+            return False
+        for cambio in lote['changes']:
+            if cambio['tipo'] != 'orden':
+                continue
+            if cambio['op'] == 'delete':
+                plan.quitar(cambio['id'])
+            else:
+                plan.poner(cambio['data'])
+        plan.cursor = lote['cursor']
+        if not lote['has_more']:
+            return True
+
+_plan = None
+_lock = threading.Lock()
+
+def obtener_plan(maquinas=None, ppm=None, solo_riesgo=False):
+    """
+    Plan vigente. Con `maquinas`/`ppm` distintos a la configuración se calcula
+    un escenario aparte ("¿y si sumamos una máquina?") sin tocar el compartido.
+    """
+    global _plan
+    if (maquinas or MAQUINAS) != MAQUINAS or (ppm or PPM) != PPM:
+        plan = _construir(maquinas or MAQUINAS, ppm or PPM)
+        plan.recalcular()
+        return plan.resultado(solo_riesgo)
+    with _lock:
+        if _plan is None or time.monotonic() - _plan.creado > PLAN_TTL or not _aplicar_cambios(_plan):
+            _plan = _construir(MAQUINAS, PPM)
+        _plan.recalcular()
+        return _plan.resultado(solo_riesgo)
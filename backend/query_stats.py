@@ -0,0 +1,164 @@
+import os
+import re
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter, defaultdict
+from flask import request, jsonify
+from sqlalchemy import event
+
+# ==========================================
+# 🔬 INSTRUMENTACIÓN SQL POR REQUEST
+# ==========================================
+# Hooks de SQLAlchemy sobre cada engine (MySQL y PostgreSQL) que cuentan y
+# cronometran las consultas de cada request, por bind:
+#   - cabeceras Server-Timing / X-SQL-Queries en cada respuesta,
+#   - aviso de N+1 cuando la misma forma de consulta se repite SQL_N1_REPETICIONES
+#     veces en un request (p. ej. Cotizacion.cliente dentro de un bucle),
+#   - log de consultas de más de SQL_SLOW_MS con el archivo:línea que la originó,
+#   - presupuesto de consultas por ruta con @presupuesto(n); con
+#     SQL_PRESUPUESTO_ESTRICTO=1 (o app.config igual, p. ej. en tests) excederlo
+#     responde 500 en vez de solo avisar. Fuera de un request,
+#     medir(max_consultas=n) lanza PresupuestoExcedido.
+# SQL_STATS=0 desactiva todo.
+
+SQL_STATS = os.getenv('SQL_STATS', '1') != '0'
+SQL_SLOW_MS = float(os.getenv('SQL_SLOW_MS', 200))
+SQL_N1_REPETICIONES = int(os.getenv('SQL_N1_REPETICIONES', 5))
+SQL_PRESUPUESTO_ESTRICTO = os.getenv('SQL_PRESUPUESTO_ESTRICTO', '0') == '1'
+
+_DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+_actual = ContextVar('sql_stats', default=None)
+_binds = {}
+
+# Listas de parámetros (IN (?, ?, ?) / IN (%(p_1)s, ...)) y literales: la forma
+# de la consulta no depende de cuántos ids lleva
+_LISTA_PARAMETROS = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)")
+_NUMEROS = re.compile(r"\b\d+\b")
+
+class PresupuestoExcedido(Exception):
+    pass
+
+class EstadisticasSQL:
+    def __init__(self):
+        self.consultas = 0
+        self.ms = 0.0
+        self.por_bind = defaultdict(lambda: [0, 0.0])
+        self.formas = Counter()
+        self.sitios = {}
+        self.lentas = []
+
+    def registrar(self, bind, sql, ms):
+        self.consultas += 1
+        self.ms += ms
+        self.por_bind[bind][0] += 1
+        self.por_bind[bind][1] += ms
+        forma = forma_de(sql)
+        self.formas[forma] += 1
+        if self.formas[forma] == SQL_N1_REPETICIONES:
+            self.sitios[forma] = sitio_de_llamada()
+        if ms >= SQL_SLOW_MS:
+            self.lentas.append((ms, bind, sql, sitio_de_llamada()))
+
+    def repetidas(self):
+        """[(forma, veces, sitio)] de las consultas que parecen N+1."""
+        return [(forma, n, self.sitios.get(forma)) for forma, n in self.formas.most_common()
+                if n >= SQL_N1_REPETICIONES]
+
+def forma_de(sql):
+    return _NUMEROS.sub('N', _LISTA_PARAMETROS.sub('(...)', ' '.join(sql.split())))
+
+def sitio_de_llamada():
+    """Primer archivo:línea del backend (fuera de este módulo) en la pila actual."""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if (frame.filename.startswith(_DIRECTORIO) and 'site-packages' not in frame.filename
+                and not frame.filename.endswith('query_stats.py')):
+            return f"{os.path.basename(frame.filename)}:{frame.lineno} ({frame.name})"
+    return None
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    if _actual.get() is not None:
+        conn.info.setdefault('sql_stats_inicio', []).append(time.perf_counter())
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    stats = _actual.get()
+    inicios = conn.info.get('sql_stats_inicio')
+    if stats is None or not inicios:
+        return
+    ms = (time.perf_counter() - inicios.pop()) * 1000
+    stats.registrar(_binds.get(conn.engine, 'default'), statement, ms)
+
+def instrumentar_engine(engine, nombre):
+    _binds[engine] = nombre
+    if event.contains(engine, 'before_cursor_execute', _antes):
+        return
+    event.listen(engine, 'before_cursor_execute', _antes)
+    event.listen(engine, 'after_cursor_execute', _despues)
+
+@contextmanager
+def medir(max_consultas=None):
+    """Cuenta las consultas del bloque (scripts, benchmarks, tests fuera de un request)."""
+    stats = EstadisticasSQL()
+    token = _actual.set(stats)
+    try:
+        yield stats
+    finally:
+        _actual.reset(token)
+    if max_consultas is not None and stats.consultas > max_consultas:
+        raise PresupuestoExcedido(f"{stats.consultas} consultas SQL (presupuesto {max_consultas})")
+
+def presupuesto(max_consultas):
+    """Decorador de vista: máximo de consultas SQL que puede hacer la ruta."""
+    def decorador(vista):
+        vista.presupuesto_sql = max_consultas
+        return vista
+    return decorador
+
+def _reportar(app, stats):
+    ruta = f"{request.method} {request.path}"
+    for forma, veces, sitio in stats.repetidas():
+        print(f"⚠️ Posible N+1 en {ruta}: {veces}x desde {sitio or '?'} -> {forma[:160]}")
+    for ms, bind, sql, sitio in stats.lentas:
+        print(f"🐢 Consulta lenta ({ms:.0f} ms, {bind}) en {ruta} desde {sitio or '?'}: {' '.join(sql.split())[:300]}")
+
+    vista = app.view_functions.get(request.endpoint)
+    limite = getattr(vista, 'presupuesto_sql', None)
+    if limite is not None and stats.consultas > limite:
+        mensaje = f"{ruta} hizo {stats.consultas} consultas SQL (presupuesto {limite})"
+        print(f"⚠️ {mensaje}")
+        return mensaje
+    return None
+
+def init_app(app, db):
+    if not SQL_STATS:
+        return
+    with app.app_context():
+        for nombre, engine in db.engines.items():
+            instrumentar_engine(engine, nombre or 'default')
+
+    @app.before_request
+    def _iniciar():
+        request.sql_stats_token = _actual.set(EstadisticasSQL())
+
+    @app.after_request
+    def _cerrar(response):
+        stats = _actual.get()
+        if stats is None:
+            return response
+        partes = [f'db;dur={stats.ms:.1f};desc="{stats.consultas} consultas"']
+        partes += [f'db-{bind};dur={ms:.1f};desc="{n} consultas"' for bind, (n, ms) in stats.por_bind.items()]
+        response.headers.add('Server-Timing', ', '.join(partes))
+        response.headers['X-SQL-Queries'] = str(stats.consultas)
+        excedido = _reportar(app, stats)
+        if excedido and app.config.get('SQL_PRESUPUESTO_ESTRICTO', SQL_PRESUPUESTO_ESTRICTO):
+            error = jsonify({"success": False, "message": excedido})
+            error.status_code = 500
+            return error
+        return response
+
+    @app.teardown_request
+    def _limpiar(_exc):
+        token = getattr(request, 'sql_stats_token', None)
+        if token is not None:
+            _actual.reset(token)
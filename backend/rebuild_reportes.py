@@ -0,0 +1,41 @@
+import argparse
+from datetime import datetime, timedelta
+from app import app, db
+import report_services
+
+def rebuild_reportes(desde=None, hasta=None, dias_por_lote=31):
+    """
+    Reconstruye las tablas reporte_diario* desde cotizacion/orden.
+    Procesa por lotes de días (un GROUP BY por lote) con commit por lote.
+    """
+    with app.app_context():
+        primero, ultimo = report_services.rango_historial()
+        desde = desde or primero
+        hasta = hasta or ultimo
+        if not desde or not hasta:
+            print("ℹ️ No hay cotizaciones: nada que reconstruir.")
+            return
+
+        print(f"📊 Reconstruyendo resúmenes del {desde} al {hasta}...")
+        actual = desde
+        while actual <= hasta:
+            fin_lote = min(actual + timedelta(days=dias_por_lote), hasta + timedelta(days=1))
+            try:
+                report_services.refrescar_rango(actual, fin_lote)
+                db.session.commit()
+                print(f"   ✅ {actual} → {fin_lote - timedelta(days=1)}")
+            except Exception as e:
+                db.session.rollback()
+                print(f"   ❌ Error en {actual} → {fin_lote - timedelta(days=1)}: {e}")
+            actual = fin_lote
+        print("✨ Resúmenes reconstruidos.")
+
+def _fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reconstruye las tablas de resumen diario de reportes.")
+    parser.add_argument('--desde', type=_fecha, help="Primer día (YYYY-MM-DD). Por defecto, el primero con datos.")
+    parser.add_argument('--hasta', type=_fecha, help="Último día (YYYY-MM-DD). Por defecto, hoy.")
+    args = parser.parse_args()
+    rebuild_reportes(args.desde, args.hasta)
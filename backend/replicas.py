@@ -0,0 +1,227 @@
+import os
+import time
+import random
+import threading
+import sqlalchemy as sa
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+
+# ==========================================
+# 🪞 LECTURAS EN RÉPLICAS
+# ==========================================
+# Cada bind puede tener réplicas de solo lectura (opcionales):
+#   DATABASE_MYSQL_REPLICAS=mysql+pymysql://...@replica1/db,mysql+pymysql://...@replica2/db
+#   DATABASE_POSTGRESQL_REPLICAS=postgresql://...@replica/db
+# Los GET/HEAD leen de una réplica sana del bind que toque la consulta; todo
+# lo demás va a la primaria. Dentro de un GET, cualquier escritura (flush,
+# INSERT/UPDATE/DELETE) y lo que venga después en ese request va a la primaria.
+#
+# Leer lo propio: una respuesta que escribió trae X-Write-Token (hora de la
+# escritura en ms). El frontend lo reenvía, y mientras la réplica pueda no
+# tenerlo todavía (REPLICA_LECTURA_PROPIA_SEG o el retraso medido, lo que sea
+# mayor) esas lecturas van a la primaria.
+#
+# Conmutación: cada réplica se chequea cada REPLICA_CHEQUEO_SEG (conexión y,
+# en PostgreSQL/MySQL, retraso de replicación) en un hilo aparte; mientras
+# tanto los requests usan el último estado conocido, y las conexiones tienen
+# un timeout de REPLICA_TIMEOUT_SEG para que un host que no contesta no deje
+# hilos colgados. Caída, con más de REPLICA_LAG_MAX_SEG de retraso queda fuera
+# hasta el siguiente chequeo. Si
+# una lectura falla con OperationalError mientras se usa una réplica, la
+# réplica se marca caída y la consulta se repite en la primaria.
+
+REPLICA_LECTURA_PROPIA_SEG = float(os.getenv('REPLICA_LECTURA_PROPIA_SEG', 5))
+REPLICA_LAG_MAX_SEG = float(os.getenv('REPLICA_LAG_MAX_SEG', 30))
+REPLICA_CHEQUEO_SEG = float(os.getenv('REPLICA_CHEQUEO_SEG', 5))
+REPLICA_TIMEOUT_SEG = int(os.getenv('REPLICA_TIMEOUT_SEG', 3))
+
+METODOS_LECTURA = ('GET', 'HEAD')
+HEADER_TOKEN = 'X-Write-Token'
+
+_ENV_REPLICAS = {None: 'DATABASE_MYSQL_REPLICAS', 'postgresql': 'DATABASE_POSTGRESQL_REPLICAS'}
+
+_replicas = {}     # engine primario -> [Replica]
+_lock = threading.Lock()
+
+class Replica:
+    def __init__(self, engine, nombre):
+        self.engine = engine
+        self.nombre = nombre
+        self.sana = True
+        self.lag = 0.0
+        self.proximo_chequeo = 0.0
+        self.chequeando = False
+
+    def _medir_lag(self, conn):
+        dialecto = conn.dialect.name
+        if dialecto == 'postgresql':
+            # 0 si ya reprodujo todo lo recibido; si no, antigüedad de lo último reproducido
+            return conn.execute(sa.text(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            )).scalar() or 0.0
+        if dialecto == 'mysql':
+            try:
+                fila = conn.execute(sa.text("SHOW REPLICA STATUS")).mappings().first()
+            except sa.exc.ProgrammingError:
+                # Antes de MySQL 8.0.22 (y en MariaDB) se llama SHOW SLAVE STATUS
+                fila = conn.execute(sa.text("SHOW SLAVE STATUS")).mappings().first()
+            if fila is None:
+                return 0.0
+            columna = 'Seconds_Behind_Source' if 'Seconds_Behind_Source' in fila else 'Seconds_Behind_Master'
+            segundos = fila.get(columna)
+            return float('inf') if segundos is None else float(segundos)  # None = replicación detenida
+        return 0.0
+
+    def chequear(self):
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(sa.text("SELECT 1"))
+                self.lag = float(self._medir_lag(conn))
+            sana = self.lag <= REPLICA_LAG_MAX_SEG
+            if not sana:
+                print(f"⚠️ Réplica {self.nombre} con {self.lag:.1f}s de retraso: se lee de la primaria")
+        except Exception as e:
+            sana = False
+            print(f"⚠️ Réplica {self.nombre} no disponible: {e}")
+        if sana and not self.sana:
+            print(f"🪞 Réplica {self.nombre} disponible de nuevo")
+        self.sana = sana
+        self.proximo_chequeo = time.monotonic() + REPLICA_CHEQUEO_SEG
+
+    def _chequear_en_fondo(self):
+        try:
+            self.chequear()
+        finally:
+            self.chequeando = False
+
+    def disponible(self):
+        """Último estado conocido; si toca, lanza el chequeo en otro hilo sin esperarlo."""
+        if time.monotonic() >= self.proximo_chequeo and not self.chequeando:
+            with _lock:
+                lanzar = not self.chequeando and time.monotonic() >= self.proximo_chequeo
+                if lanzar:
+                    self.chequeando = True
+            if lanzar:
+                threading.Thread(target=self._chequear_en_fondo, daemon=True, name=f'chequeo-{self.nombre}').start()
+        return self.sana
+
+    def marcar_caida(self, error):
+        if self.sana:
+            print(f"⚠️ Réplica {self.nombre} falló en una consulta ({error}): se lee de la primaria")
+        self.sana = False
+        self.proximo_chequeo = time.monotonic() + REPLICA_CHEQUEO_SEG
+
+def _token():
+    try:
+        return float(request.headers.get(HEADER_TOKEN, '')) / 1000
+    except ValueError:
+        return None
+
+def elegir(primaria):
+    """Engine de réplica para la lectura actual, o None si debe ir a la primaria."""
+    replicas = _replicas.get(primaria)
+    if not replicas or not has_request_context() or not g.get('leer_de_replica'):
+        return None
+    sanas = [r for r in replicas if r.disponible()]
+    if not sanas:
+        return None
+    escritura = g.get('token_escritura')
+    if escritura is not None:
+        ventana = max(REPLICA_LECTURA_PROPIA_SEG, max(r.lag for r in sanas))
+        if time.time() - escritura < ventana:
+            return None
+    replica = random.choice(sanas)
+    g.setdefault('replicas_usadas', set()).add(replica)
+    return replica.engine
+
+class SesionConReplicas(Session):
+    """Session de Flask-SQLAlchemy que manda las lecturas de los GET a las réplicas."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not _replicas:
+            return engine
+        if self._flushing or getattr(clause, 'is_dml', False):
+            if has_request_context():
+                g.leer_de_replica = False
+                g.escribio = True
+            return engine
+        return elegir(engine) or engine
+
+    def execute(self, *args, **kwargs):
+        try:
+            return super().execute(*args, **kwargs)
+        except sa.exc.OperationalError as e:
+            usadas = g.get('replicas_usadas') if has_request_context() else None
+            if not usadas or g.get('escribio'):
+                raise
+            # Falló una lectura con una réplica en juego: fuera las réplicas y se repite en la primaria
+            for replica in usadas:
+                replica.marcar_caida(e.orig)
+            g.replicas_usadas = set()
+            g.leer_de_replica = False
+            self.rollback()
+            return super().execute(*args, **kwargs)
+
+def _antes_del_request():
+    g.leer_de_replica = request.method in METODOS_LECTURA
+    g.token_escritura = _token()
+
+def _despues_del_request(response):
+    if g.get('escribio'):
+        response.headers[HEADER_TOKEN] = str(int(time.time() * 1000))
+    return response
+
+def _urls(bind_key):
+    valor = os.getenv(_ENV_REPLICAS.get(bind_key, ''), '')
+    return [u.strip() for u in valor.split(',') if u.strip()]
+
+def _connect_args(url):
+    """Timeout de conexión según el driver (sin él, un host caído espera el timeout TCP del sistema)."""
+    backend = sa.engine.make_url(url).get_backend_name()
+    if backend == 'postgresql':
+        return {'connect_timeout': REPLICA_TIMEOUT_SEG}
+    if backend == 'mysql':
+        return {'connect_timeout': REPLICA_TIMEOUT_SEG, 'read_timeout': max(REPLICA_TIMEOUT_SEG, 30)}
+    return {}
+
+def init_app(app, db):
+    """Crea los engines de réplica configurados y engancha el ruteo de lecturas."""
+    import query_stats
+    app.after_request(_despues_del_request)
+    app.before_request(_antes_del_request)
+    with app.app_context():
+        for bind_key, primaria in db.engines.items():
+            replicas = []
+            for i, url in enumerate(_urls(bind_key)):
+                engine = sa.create_engine(url, pool_pre_ping=True, connect_args=_connect_args(url))
+                nombre = f"{bind_key or 'default'}-replica{i + 1}"
+                replica = Replica(engine, nombre)
+                if query_stats.SQL_STATS:
+                    query_stats.instrumentar_engine(engine, nombre)
+                replicas.append(replica)
+            if replicas:
+                _replicas[primaria] = replicas
+                print(f"🪞 {len(replicas)} réplica(s) de lectura para el bind {bind_key or 'default'}")
+
+def despues_del_fork():
+    """
+    En un worker recién creado (serve.py post_fork): descarta las conexiones
+    heredadas del master y el estado de chequeos que el master tenía en vuelo
+    (sus hilos no existen en el hijo).
+    """
+    global _lock
+    _lock = threading.Lock()
+    for replicas in _replicas.values():
+        for replica in replicas:
+            replica.engine.dispose(close=False)
+            replica.chequeando = False
+            replica.proximo_chequeo = 0.0
+
+def estado():
+    """Salud y retraso de cada réplica (para monitoreo)."""
+    return [
+        {"nombre": r.nombre, "sana": r.sana, "lag_seg": None if r.lag == float('inf') else round(r.lag, 2)}
+        for replicas in _replicas.values() for r in replicas
+    ]
@@ -0,0 +1,351 @@
+from database import db, Cotizacion, Orden, CotizacionArchivada, OrdenArchivada, ReporteDiario, ReporteDiarioPersonal, ReporteDiarioCliente
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func, text, case, or_, and_
+
+# ==========================================
+# 📊 RESÚMENES DIARIOS
+# ==========================================
+# Las tablas reporte_diario* guardan un resumen por día. Cada escritura en
+# db_services / bulk_services suma o resta su propio aporte (deltas) con
+# INSERT ... ON CONFLICT DO UPDATE SET x = x + EXCLUDED.x: no recalcula el día
+# ni espera a otras escrituras del mismo día (el UPDATE de la fila es atómico).
+# Editar una orden resta su aporte anterior y suma el nuevo.
+# rebuild_reportes.py recalcula cualquier rango desde cero con GROUP BY sobre
+# las tablas activas y las de archivo (ver archive_cotizaciones.py), así el
+# archivado no cambia ningún reporte.
+#
+# Locks por día (solo PostgreSQL): las escrituras toman el lock del día en modo
+# compartido (no se esperan entre ellas) y la reconstrucción en modo exclusivo,
+# así un delta no cae entre el DELETE y el INSERT de una reconstrucción.
+
+FUENTES = ((Cotizacion, Orden), (CotizacionArchivada, OrdenArchivada))
+
+# Primera clave de pg_advisory_xact_lock(LOCK_RESUMEN_DIARIO, día) en los resúmenes
+LOCK_RESUMEN_DIARIO = 0x52455031
+
+def _a_fecha(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+def _inicio(d):
+    return datetime(d.year, d.month, d.day)
+
+def _bloquear_dias(dias, compartido=False):
+    # Siempre en orden ascendente, para que dos rangos que se solapan no se
+    # bloqueen mutuamente
+    bind = db.engines['postgresql']
+    if bind.dialect.name != 'postgresql':
+        return
+    funcion = 'pg_advisory_xact_lock_shared' if compartido else 'pg_advisory_xact_lock'
+    for dia in sorted(dias):
+        db.session.execute(
+            text(f"SELECT {funcion}(:k1, :k2)"),
+            {"k1": LOCK_RESUMEN_DIARIO, "k2": dia.toordinal()},
+            bind_arguments={"bind": bind}
+        )
+
+# ==========================================
+# ➕ DELTAS POR ESCRITURA
+# ==========================================
+# Un aporte es (modelo, clave, {columna: valor}). Las cotizaciones y órdenes
+# pueden venir como objetos ORM o como los dicts de un INSERT por lote.
+
+_COLUMNAS_VALOR = {
+    ReporteDiario: ('cotizaciones', 'monto_cotizado', 'ordenes', 'monto_ordenes', 'ordenes_canceladas'),
+    ReporteDiarioPersonal: ('ordenes_entregadas', 'puntadas'),
+    ReporteDiarioCliente: ('ordenes', 'monto'),
+}
+_COLUMNAS_CLAVE = {
+    ReporteDiario: ('fecha',),
+    ReporteDiarioPersonal: ('fecha', 'personal_id'),
+    ReporteDiarioCliente: ('fecha', 'cliente_id'),
+}
+
+def _campo(fila, nombre, defecto=None):
+    valor = fila.get(nombre) if isinstance(fila, dict) else getattr(fila, nombre, None)
+    return defecto if valor is None else valor
+
+def _monto(valor):
+    return Decimal(str(valor or 0))
+
+def aportes_de_cotizacion(cot):
+    """Lo que suma una cotización al resumen (cuenta y monto en su día de pedido)."""
+    dia = _a_fecha(_campo(cot, 'fecha_pedido') or datetime.utcnow())
+    return [(ReporteDiario, (dia,), {"cotizaciones": 1, "monto_cotizado": _monto(_campo(cot, 'precio_total'))})]
+
+def aportes_de_orden(orden, cot):
+    """
+    Lo que suma una orden: confirmada o cancelada en su día de creación, al
+    cliente si no está cancelada y al personal si está entregada (en su fecha
+    de entrega, o la de creación si no tiene). Mismos criterios que refrescar_rango.
+    """
+    estado = _campo(orden, 'estado', 'en_proceso')
+    creacion = _a_fecha(_campo(orden, 'fecha_creacion') or datetime.utcnow())
+    monto = _monto(_campo(cot, 'precio_total'))
+    aportes = []
+    if estado == 'cancelado':
+        aportes.append((ReporteDiario, (creacion,), {"ordenes_canceladas": 1}))
+    else:
+        aportes.append((ReporteDiario, (creacion,), {"ordenes": 1, "monto_ordenes": monto}))
+        aportes.append((ReporteDiarioCliente, (creacion, _campo(cot, 'cliente_id')), {"ordenes": 1, "monto": monto}))
+    if estado == 'entregado':
+        dia = _a_fecha(_campo(orden, 'fecha_entrega')) or creacion
+        puntadas = _campo(cot, 'puntadas')
+        cantidad = _campo(cot, 'cantidad')
+        aportes.append((ReporteDiarioPersonal, (dia, _campo(orden, 'personal_id', 0)), {
+            "ordenes_entregadas": 1,
+            "puntadas": int(puntadas * cantidad) if puntadas is not None and cantidad is not None else 0
+        }))
+    return aportes
+
+def _insert(modelo):
+    if db.engines['postgresql'].dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        # SQLite (tests, loadtest.py) tiene el mismo ON CONFLICT
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(modelo)
+
+def aplicar(sumar=(), restar=()):
+    """
+    Suma `sumar` y resta `restar` (listas de aportes) en las tablas de resumen:
+    un INSERT ... ON CONFLICT por tabla. Corre dentro de un SAVEPOINT de la
+    transacción de quien escribe: si falla, la escritura principal sigue
+    adelante y el resumen se puede reconstruir después con rebuild_reportes.py.
+    """
+    acumulado = {}
+    for signo, aportes in ((1, sumar), (-1, restar)):
+        for modelo, clave, valores in aportes:
+            fila = acumulado.setdefault(modelo, {}).setdefault(clave, dict.fromkeys(_COLUMNAS_VALOR[modelo], 0))
+            for columna, valor in valores.items():
+                fila[columna] += signo * valor
+    filas_por_modelo = {
+        modelo: [(clave, valores) for clave, valores in sorted(filas.items()) if any(valores.values())]
+        for modelo, filas in acumulado.items()
+    }
+    dias = {clave[0] for filas in filas_por_modelo.values() for clave, _ in filas}
+    if not dias:
+        return
+    try:
+        with db.session.begin_nested():
+            _bloquear_dias(dias, compartido=True)
+            for modelo, filas in filas_por_modelo.items():
+                if not filas:
+                    continue
+                claves = _COLUMNAS_CLAVE[modelo]
+                stmt = _insert(modelo).values([{**dict(zip(claves, clave)), **valores} for clave, valores in filas])
+                tabla = modelo.__table__.c
+                db.session.execute(stmt.on_conflict_do_update(
+                    index_elements=list(claves),
+                    set_={c: tabla[c] + stmt.excluded[c] for c in _COLUMNAS_VALOR[modelo]}
+                ))
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar el resumen diario {sorted(dias)}: {e}")
+
+# ==========================================
+# 🔁 RECONSTRUCCIÓN COMPLETA (rebuild_reportes.py)
+# ==========================================
+
+def _sumar_fuente(Cot, Ord, desde, hasta, resumen, por_personal, por_cliente):
+    """Acumula los GROUP BY de [desde, hasta) de un par de tablas cotización/orden."""
+    ini, fin = _inicio(desde), _inicio(hasta)
+
+    # 1. Cotizaciones por día
+    dia_cot = func.date(Cot.fecha_pedido)
+    for dia, cantidad, monto in db.session.query(
+        dia_cot, func.count(Cot.id), func.coalesce(func.sum(Cot.precio_total), 0)
+    ).filter(Cot.fecha_pedido >= ini, Cot.fecha_pedido < fin).group_by(dia_cot):
+        fila = resumen.setdefault(_a_fecha(dia), {})
+        fila['cotizaciones'] = fila.get('cotizaciones', 0) + cantidad
+        fila['monto_cotizado'] = fila.get('monto_cotizado', 0) + monto
+
+    # 2. Órdenes confirmadas / canceladas por día de creación
+    dia_ord = func.date(Ord.fecha_creacion)
+    cancelada = func.sum(case((Ord.estado == 'cancelado', 1), else_=0))
+    activa_monto = func.sum(case((Ord.estado != 'cancelado', Cot.precio_total), else_=0))
+    for dia, cantidad, canceladas, monto in db.session.query(
+        dia_ord, func.count(Ord.id), cancelada, activa_monto
+    ).join(Cot, Ord.cotizacion_id == Cot.id).filter(
+        Ord.fecha_creacion >= ini, Ord.fecha_creacion < fin
+    ).group_by(dia_ord):
+        fila = resumen.setdefault(_a_fecha(dia), {})
+        fila['ordenes'] = fila.get('ordenes', 0) + cantidad - (canceladas or 0)
+        fila['ordenes_canceladas'] = fila.get('ordenes_canceladas', 0) + (canceladas or 0)
+        fila['monto_ordenes'] = fila.get('monto_ordenes', 0) + (monto or 0)
+
+    # 3. Producción por personal: órdenes entregadas, en su fecha de entrega
+    #    (o la de creación si no tiene una)
+    dia_prod = func.coalesce(Ord.fecha_entrega, func.date(Ord.fecha_creacion))
+    personal = func.coalesce(Ord.personal_id, 0)
+    for dia, personal_id, cantidad, puntadas in db.session.query(
+        dia_prod, personal, func.count(Ord.id),
+        func.coalesce(func.sum(Cot.puntadas * Cot.cantidad), 0)
+    ).join(Cot, Ord.cotizacion_id == Cot.id).filter(
+        Ord.estado == 'entregado',
+        or_(
+            and_(Ord.fecha_entrega >= desde, Ord.fecha_entrega < hasta),
+            and_(Ord.fecha_entrega.is_(None), Ord.fecha_creacion >= ini, Ord.fecha_creacion < fin)
+        )
+    ).group_by(dia_prod, personal):
+        clave = (_a_fecha(dia), personal_id)
+        previo = por_personal.get(clave, (0, 0))
+        por_personal[clave] = (previo[0] + cantidad, previo[1] + int(puntadas or 0))
+
+    # 4. Clientes: órdenes no canceladas por día de creación
+    for dia, cliente_id, cantidad, monto in db.session.query(
+        dia_ord, Cot.cliente_id, func.count(Ord.id),
+        func.coalesce(func.sum(Cot.precio_total), 0)
+    ).join(Cot, Ord.cotizacion_id == Cot.id).filter(
+        Ord.estado != 'cancelado', Ord.fecha_creacion >= ini, Ord.fecha_creacion < fin
+    ).group_by(dia_ord, Cot.cliente_id):
+        clave = (_a_fecha(dia), cliente_id)
+        previo = por_cliente.get(clave, (0, 0))
+        por_cliente[clave] = (previo[0] + cantidad, previo[1] + monto)
+
+def refrescar_rango(desde, hasta):
+    """
+    Recalcula desde cero los resúmenes de los días en [desde, hasta).
+    No hace commit: se ejecuta dentro de la transacción de quien lo llama.
+    """
+    _bloquear_dias([date.fromordinal(d) for d in range(desde.toordinal(), hasta.toordinal())])
+
+    for modelo in (ReporteDiario, ReporteDiarioPersonal, ReporteDiarioCliente):
+        modelo.query.filter(modelo.fecha >= desde, modelo.fecha < hasta).delete(synchronize_session=False)
+
+    resumen, por_personal, por_cliente = {}, {}, {}
+    for cot_m, ord_m in FUENTES:
+        _sumar_fuente(cot_m, ord_m, desde, hasta, resumen, por_personal, por_cliente)
+
+    db.session.add_all([
+        ReporteDiario(
+            # pyrefly: ignore [unexpected-keyword]
+            fecha=dia,
+            # pyrefly: ignore [unexpected-keyword]
+            cotizaciones=fila.get('cotizaciones', 0),
+            # pyrefly: ignore [unexpected-keyword]
+            monto_cotizado=Decimal(str(fila.get('monto_cotizado', 0))),
+            # pyrefly: ignore [unexpected-keyword]
+            ordenes=fila.get('ordenes', 0),
+            # pyrefly: ignore [unexpected-keyword]
+            monto_ordenes=Decimal(str(fila.get('monto_ordenes', 0))),
+            # pyrefly: ignore [unexpected-keyword]
+            ordenes_canceladas=fila.get('ordenes_canceladas', 0)
+        ) for dia, fila in resumen.items()
+    ])
+    db.session.add_all([
+        ReporteDiarioPersonal(
+            # pyrefly: ignore [unexpected-keyword]
+            fecha=dia,
+            # pyrefly: ignore [unexpected-keyword]
+            personal_id=personal_id,
+            # pyrefly: ignore [unexpected-keyword]
+            ordenes_entregadas=cantidad,
+            # pyrefly: ignore [unexpected-keyword]
+            puntadas=puntadas
+        ) for (dia, personal_id), (cantidad, puntadas) in por_personal.items()
+    ])
+    db.session.add_all([
+        ReporteDiarioCliente(
+            # pyrefly: ignore [unexpected-keyword]
+            fecha=dia,
+            # pyrefly: ignore [unexpected-keyword]
+            cliente_id=cliente_id,
+            # pyrefly: ignore [unexpected-keyword]
+            ordenes=cantidad,
+            # pyrefly: ignore [unexpected-keyword]
+            monto=Decimal(str(monto))
+        ) for (dia, cliente_id), (cantidad, monto) in por_cliente.items()
+    ])
+
+    db.session.flush()
+
+def rango_historial():
+    """(primer_dia, ultimo_dia) con datos en cotizacion/orden o su archivo, o (None, None)."""
+    minimo, maximo = db.session.query(func.min(Cotizacion.fecha_pedido), func.max(Cotizacion.fecha_pedido)).one()
+    max_entrega = db.session.query(func.max(Orden.fecha_entrega)).scalar()
+    minimo_archivo = db.session.query(func.min(CotizacionArchivada.fecha_pedido)).scalar()
+    if minimo_archivo is not None:
+        minimo = min(minimo, minimo_archivo) if minimo is not None else minimo_archivo
+        maximo = maximo or minimo_archivo
+    if minimo is None:
+        return None, None
+    ultimo = max(_a_fecha(maximo), _a_fecha(max_entrega) or _a_fecha(maximo), date.today())
+    return _a_fecha(minimo), ultimo
+
+# ==========================================
+# 📈 CONSULTAS DE REPORTES
+# ==========================================
+
+def _filtrar(query, modelo, desde, hasta):
+    if desde:
+        query = query.filter(modelo.fecha >= desde)
+    if hasta:
+        query = query.filter(modelo.fecha <= hasta)
+    return query
+
+def ventas_mensuales(desde=None, hasta=None):
+    anio = func.extract('year', ReporteDiario.fecha)
+    mes = func.extract('month', ReporteDiario.fecha)
+    query = db.session.query(
+        anio.label('anio'), mes.label('mes'),
+        func.sum(ReporteDiario.cotizaciones), func.sum(ReporteDiario.monto_cotizado),
+        func.sum(ReporteDiario.ordenes), func.sum(ReporteDiario.monto_ordenes),
+        func.sum(ReporteDiario.ordenes_canceladas)
+    )
+    query = _filtrar(query, ReporteDiario, desde, hasta).group_by(anio, mes).order_by(anio, mes)
+    return [{
+        "mes": f"{int(a):04d}-{int(m):02d}",
+        "cotizaciones": int(cot or 0),
+        "monto_cotizado": float(monto_cot or 0),
+        "ordenes": int(ords or 0),
+        "monto_ordenes": float(monto_ord or 0),
+        "ordenes_canceladas": int(canc or 0)
+    } for a, m, cot, monto_cot, ords, monto_ord, canc in query]
+
+def conversion(desde=None, hasta=None):
+    query = db.session.query(
+        func.sum(ReporteDiario.cotizaciones), func.sum(ReporteDiario.ordenes),
+        func.sum(ReporteDiario.ordenes_canceladas)
+    )
+    cotizaciones, ordenes, canceladas = _filtrar(query, ReporteDiario, desde, hasta).one()
+    cotizaciones, ordenes, canceladas = int(cotizaciones or 0), int(ordenes or 0), int(canceladas or 0)
+    return {
+        "cotizaciones": cotizaciones,
+        "ordenes": ordenes,
+        "ordenes_canceladas": canceladas,
+        "tasa_conversion": round(ordenes / cotizaciones, 4) if cotizaciones else 0
+    }
+
+def produccion_por_personal(desde=None, hasta=None):
+    query = db.session.query(
+        ReporteDiarioPersonal.personal_id,
+        func.sum(ReporteDiarioPersonal.ordenes_entregadas), func.sum(ReporteDiarioPersonal.puntadas)
+    )
+    query = _filtrar(query, ReporteDiarioPersonal, desde, hasta).group_by(
+        ReporteDiarioPersonal.personal_id
+    ).order_by(func.sum(ReporteDiarioPersonal.puntadas).desc())
+    return [{
+        "personal_id": personal_id or None,
+        "ordenes_entregadas": int(cantidad or 0),
+        "puntadas": int(puntadas or 0)
+    } for personal_id, cantidad, puntadas in query]
+
+def top_clientes(desde=None, hasta=None, limit=10):
+    total = func.sum(ReporteDiarioCliente.monto)
+    query = db.session.query(
+        ReporteDiarioCliente.cliente_id, func.sum(ReporteDiarioCliente.ordenes), total
+    )
+    query = _filtrar(query, ReporteDiarioCliente, desde, hasta).group_by(
+        ReporteDiarioCliente.cliente_id
+    ).order_by(total.desc()).limit(limit)
+    return [{
+        "cliente_id": cliente_id,
+        "ordenes": int(cantidad or 0),
+        "monto": float(monto or 0)
+    } for cliente_id, cantidad, monto in query]
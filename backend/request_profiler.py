@@ -0,0 +1,194 @@
+import os
+import re
+import sys
+import json
+import hmac
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from urllib.parse import parse_qs
+
+# ==========================================
+# 🩺 PERFILADO DE UN REQUEST (solo con el token de administración)
+# ==========================================
+# Para ver dónde se va el tiempo de un request lento en producción:
+#   X-Profile: 1        cProfile (determinista) + muestreo de pila
+#   X-Profile: sample   solo muestreo (menos sobrecarga, tiempos más reales)
+# (o ?_profile=1 / ?_profile=sample), junto con X-Admin-Token igual a ADMIN_TOKEN
+# (secreto del servidor; sin ADMIN_TOKEN el perfilado y /admin/* quedan
+# desactivados). X-User-Id, si viene, solo se anota en el perfil. Se guardan
+# en PROFILING_DIR:
+#   <id>.pstats     -> python -m pstats, snakeviz...
+#   <id>.collapsed  -> pilas "a;b;c N", listo para flamegraph.pl / speedscope
+#   <id>.json       -> ruta, usuario, status, duración, muestras
+# El directorio se poda a los PROFILING_MAX_PERFILES más recientes. La
+# respuesta perfilada trae X-Profile-Id; GET /admin/profiles lista los últimos.
+#
+# Es un middleware WSGI: un request sin la marca pasa directo a la app tras
+# una búsqueda en el environ, sin hooks de Flask ni profiler activo.
+
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+PROFILING_MAX_PERFILES = int(os.getenv('PROFILING_MAX_PERFILES', 100))
+PROFILING_INTERVALO_MS = float(os.getenv('PROFILING_INTERVALO_MS', 5))
+
+MODOS = {'1': 'cprofile', 'true': 'cprofile', 'cprofile': 'cprofile', 'sample': 'sample'}
+EXTENSIONES = ('pstats', 'collapsed', 'json')
+_NOMBRE_VALIDO = re.compile(r'^[\w.-]+$')
+_lock = threading.Lock()
+
+def _modo(environ):
+    valor = environ.get('HTTP_X_PROFILE')
+    if valor is None:
+        consulta = environ.get('QUERY_STRING', '')
+        if '_profile=' not in consulta:
+            return None
+        valor = parse_qs(consulta).get('_profile', [''])[0]
+    return MODOS.get(valor.strip().lower())
+
+def token_valido(token):
+    """True si `token` coincide con ADMIN_TOKEN (comparación en tiempo constante)."""
+    esperado = os.getenv('ADMIN_TOKEN', '')
+    if not esperado or not token:
+        return False
+    return hmac.compare_digest(token.encode(), esperado.encode())
+
+class Muestreador(threading.Thread):
+    """Toma la pila de un hilo cada `intervalo` segundos y cuenta pilas colapsadas."""
+    def __init__(self, hilo_id, intervalo):
+        super().__init__(daemon=True, name='profiler-muestreo')
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self.detener = threading.Event()
+
+    def run(self):
+        while not self.detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_id)
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if pila:
+                self.pilas[';'.join(reversed(pila))] += 1
+
+def _nombre(environ, ms):
+    ruta = re.sub(r'[^\w-]+', '_', environ.get('PATH_INFO', '/')).strip('_')[:60] or 'raiz'
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}_{environ.get('REQUEST_METHOD', 'GET')}_{ruta}_{ms:.0f}ms"
+
+def _podar(directorio=PROFILING_DIR, maximo=PROFILING_MAX_PERFILES):
+    perfiles = sorted(n[:-5] for n in os.listdir(directorio) if n.endswith('.json'))
+    for nombre in perfiles[:max(len(perfiles) - maximo, 0)]:
+        for ext in EXTENSIONES:
+            try:
+                os.remove(os.path.join(directorio, f"{nombre}.{ext}"))
+            except OSError:
+                pass
+
+def _guardar(environ, modo, user_id, status, ms, profiler, muestreador):
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    nombre = _nombre(environ, ms)
+    base = os.path.join(PROFILING_DIR, nombre)
+    if profiler is not None:
+        pstats.Stats(profiler).dump_stats(f"{base}.pstats")
+    with open(f"{base}.collapsed", 'w') as f:
+        for pila, n in muestreador.pilas.most_common():
+            f.write(f"{pila} {n}\n")
+    meta = {
+        "id": nombre,
+        "fecha": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "metodo": environ.get('REQUEST_METHOD'),
+        "ruta": environ.get('PATH_INFO'),
+        "query": environ.get('QUERY_STRING', ''),
+        "usuario_id": user_id,
+        "modo": modo,
+        "status": status,
+        "ms": round(ms, 1),
+        "muestras": sum(muestreador.pilas.values()),
+        "intervalo_ms": PROFILING_INTERVALO_MS,
+        "archivos": [ext for ext in EXTENSIONES if ext != 'pstats' or profiler is not None],
+    }
+    with open(f"{base}.json", 'w') as f:
+        json.dump(meta, f, indent=2)
+    with _lock:
+        _podar()
+    return nombre
+
+def listar(limite=50):
+    """Metadatos de los perfiles más recientes."""
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    perfiles = []
+    for nombre in sorted((n for n in os.listdir(PROFILING_DIR) if n.endswith('.json')), reverse=True)[:limite]:
+        try:
+            with open(os.path.join(PROFILING_DIR, nombre)) as f:
+                perfiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return perfiles
+
+def ruta_archivo(perfil_id, ext):
+    """Ruta de un archivo de perfil, o None si no existe o el nombre no es válido."""
+    if ext not in EXTENSIONES or not _NOMBRE_VALIDO.match(perfil_id):
+        return None
+    ruta = os.path.join(PROFILING_DIR, f"{perfil_id}.{ext}")
+    return ruta if os.path.isfile(ruta) else None
+
+class ProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+
+    def __call__(self, environ, start_response):
+        modo = _modo(environ)
+        if modo is None:
+            return self.wsgi_app(environ, start_response)
+        if not token_valido(environ.get('HTTP_X_ADMIN_TOKEN')):
+            # Sin permiso se atiende normal: la marca no cambia nada para otros usuarios
+            return self.wsgi_app(environ, start_response)
+        return self._perfilar(environ, start_response, modo, environ.get('HTTP_X_USER_ID'))
+
+    def _perfilar(self, environ, start_response, modo, user_id):
+        respuesta = {}
+
+        def capturar(status, headers, exc_info=None):
+            respuesta['status'], respuesta['headers'], respuesta['exc_info'] = status, headers, exc_info
+            return lambda dato: respuesta.setdefault('escritos', []).append(dato)
+
+        def atender():
+            resultado = self.wsgi_app(environ, capturar)
+            try:
+                return b''.join(resultado)  # el cuerpo se genera dentro del perfil
+            finally:
+                if hasattr(resultado, 'close'):
+                    resultado.close()
+
+        muestreador = Muestreador(threading.get_ident(), PROFILING_INTERVALO_MS / 1000)
+        profiler = cProfile.Profile() if modo == 'cprofile' else None
+        inicio = time.perf_counter()
+        muestreador.start()
+        try:
+            cuerpo = profiler.runcall(atender) if profiler else atender()
+        finally:
+            muestreador.detener.set()
+            muestreador.join()
+        ms = (time.perf_counter() - inicio) * 1000
+
+        status = respuesta['status']
+        headers = list(respuesta['headers'])
+        try:
+            perfil_id = _guardar(environ, modo, user_id, int(status.split()[0]), ms, profiler, muestreador)
+            headers.append(('X-Profile-Id', perfil_id))
+            print(f"🩺 Perfil {perfil_id} ({modo}, {ms:.0f} ms, {sum(muestreador.pilas.values())} muestras)")
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el perfil: {e}")
+        cuerpo = b''.join(respuesta.get('escritos', [])) + cuerpo
+        headers = [(k, v) for k, v in headers if k.lower() != 'content-length']
+        headers.append(('Content-Length', str(len(cuerpo))))
+        start_response(status, headers, respuesta['exc_info'])
+        return [cuerpo]
+
+def init_app(app):
+    app.wsgi_app = ProfilerMiddleware(app)
@@ -1,5 +1,5 @@
 from app import app, db, Personal
-from werkzeug.security import generate_password_hash
+import password_services
 
 def reset_password():
     with app.app_context():
@@ -8,7 +8,7 @@ def reset_password():
             print(f"Usuario encontrado: {user.usuario}")
             # Resetear a '12345678'
             new_pass = '12345678'
-            user.password_hash = generate_password_hash(new_pass)
+            user.password_hash = password_services.hash_password(new_pass)
             db.session.commit()
             print(f"✅ Contraseña actualizada exitosamente a: {new_pass}")
         else:
@@ -0,0 +1,112 @@
+import gzip
+import json
+from flask import request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ==========================================
+# 📦 FORMATOS Y COMPRESIÓN DE RESPUESTAS
+# ==========================================
+# Las listas (/ordenes, /clients/<id>/orders...) repiten las mismas claves en
+# cada fila. Con ?formato=columnar (o Accept: application/vnd.zequitex.columnar+json)
+# las claves van una sola vez: {"columns": [...], "rows": [[...], ...]}.
+# Con Accept: application/x-msgpack se envía lo mismo en MessagePack.
+# Todas las respuestas JSON se comprimen con br/gzip según Accept-Encoding.
+
+MIME_COLUMNAR = 'application/vnd.zequitex.columnar+json'
+MIME_MSGPACK = 'application/x-msgpack'
+MIN_BYTES_COMPRESION = 1024
+COMPRIMIBLES = ('application/json', MIME_COLUMNAR, MIME_MSGPACK, 'text/csv', 'application/x-ndjson')
+
+def dumps(obj):
+    """JSON en bytes: orjson si está instalado, si no json de la librería estándar."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def a_columnar(filas):
+    columnas = list(filas[0].keys()) if filas else []
+    return {"columns": columnas, "rows": [[f.get(c) for c in columnas] for f in filas]}
+
+def aceptados(cabecera):
+    """Valores de una cabecera Accept* con q > 0 (q=0 significa "no lo mandes")."""
+    valores = set()
+    for parte in (cabecera or '').split(','):
+        valor, *parametros = [p.strip() for p in parte.split(';')]
+        q = 1.0
+        for parametro in parametros:
+            nombre, _, numero = parametro.partition('=')
+            if nombre.strip().lower() == 'q':
+                try:
+                    q = float(numero)
+                except ValueError:
+                    q = 0.0
+        if valor and q > 0:
+            valores.add(valor.lower())
+    return valores
+
+def formato_pedido():
+    formato = request.args.get('formato')
+    if formato in ('columnar', 'msgpack', 'json'):
+        return formato
+    accept = aceptados(request.headers.get('Accept'))
+    if MIME_MSGPACK in accept:
+        return 'msgpack'
+    if MIME_COLUMNAR in accept:
+        return 'columnar'
+    return 'json'
+
+def responder_lista(filas):
+    """Responde una lista de dicts en el formato negociado (json por defecto)."""
+    formato = formato_pedido()
+    if formato == 'msgpack' and msgpack is not None:
+        response = Response(msgpack.packb(a_columnar(filas), use_bin_type=True), mimetype=MIME_MSGPACK)
+    elif formato in ('columnar', 'msgpack'):
+        response = Response(dumps(a_columnar(filas)), mimetype=MIME_COLUMNAR)
+    else:
+        response = Response(dumps(filas), mimetype='application/json')
+    # La misma URL cambia de cuerpo según Accept: las cachés no deben mezclarlos
+    response.vary.add('Accept')
+    return response
+
+def codificacion_aceptada(accept_encoding):
+    encodings = aceptados(accept_encoding)
+    if brotli is not None and 'br' in encodings:
+        return 'br'
+    if 'gzip' in encodings:
+        return 'gzip'
+    return None
+
+def comprimir(contenido, encoding):
+    if encoding == 'br':
+        return brotli.compress(contenido, quality=5)
+    return gzip.compress(contenido, compresslevel=6)
+
+def comprimir_respuesta(response):
+    """after_request: comprime respuestas con cuerpo en memoria y tamaño suficiente."""
+    if (response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code >= 300
+            or response.mimetype not in COMPRIMIBLES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = codificacion_aceptada(request.headers.get('Accept-Encoding'))
+    contenido = response.get_data()
+    if not encoding or len(contenido) < MIN_BYTES_COMPRESION:
+        return response
+    response.set_data(comprimir(contenido, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
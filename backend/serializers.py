@@ -0,0 +1,173 @@
+from sqlalchemy import select
+from database import db, Cotizacion, Orden
+import db_services
+
+# ==========================================
+# ⚡ SERIALIZACIÓN RÁPIDA DE LISTAS
+# ==========================================
+# Equivalente a [x.to_summary_dict() for x in ...] pero:
+#   - un SELECT con las columnas exactas, sin cargar objetos ORM ni disparar
+#     las propiedades .cliente / .personal fila por fila,
+#   - nombres de cliente y personal resueltos con una consulta por lote,
+#   - conversores por campo armados una sola vez al importar el módulo.
+# El JSON final lo arma response_formats (orjson si está instalado).
+# Las claves, su orden y los valores son los mismos que los de to_summary_dict().
+
+# Marcadores de campos que se resuelven con los nombres buscados por lote
+CLIENTE = 'cliente'
+PERSONAL = 'personal'
+
+def _fecha(v):
+    return v.isoformat() if v else None
+
+def _float_o_cero(v):
+    return float(v) if v else 0
+
+def _compilar(campos):
+    """
+    [(clave, columna, conversor)] -> (columnas únicas del SELECT, plan).
+    El plan es [(clave, índice en la fila, conversor)], listo para recorrerse
+    sin volver a mirar los modelos.
+    """
+    columnas, indices, plan = [], {}, []
+    for clave, columna, conversor in campos:
+        llave = (columna.class_.__name__, columna.key)
+        if llave not in indices:
+            indices[llave] = len(columnas)
+            columnas.append(columna)
+        plan.append((clave, indices[llave], conversor))
+    return columnas, plan
+
+_ORDEN_COLUMNAS, _ORDEN_PLAN = _compilar([
+    ("id", Orden.id, None),
+    ("cotizacion_id", Orden.cotizacion_id, None),
+    ("estado", Orden.estado, None),
+    ("fecha_entrega", Orden.fecha_entrega, _fecha),
+    ("detail", Orden.detail, None),
+    ("fecha_creacion", Orden.fecha_creacion, _fecha),
+    ("cliente_id", Cotizacion.cliente_id, None),
+    ("nombre_trabajo", Cotizacion.nombre_trabajo, None),
+    ("cliente_nombre", Cotizacion.cliente_id, CLIENTE),
+    ("precio_total", Cotizacion.precio_total, _float_o_cero),
+    ("cantidad", Cotizacion.cantidad, None),
+    ("fecha_pedido", Cotizacion.fecha_pedido, _fecha),
+    ("puntadas", Cotizacion.puntadas, None),
+    ("colores", Cotizacion.colores, None),
+    ("personal_id", Orden.personal_id, None),
+    ("personal_nombre", Orden.personal_id, PERSONAL),
+])
+
+_COTIZACION_COLUMNAS, _COTIZACION_PLAN = _compilar([
+    ("id", Cotizacion.id, None),
+    ("cliente_id", Cotizacion.cliente_id, None),
+    ("configuracion_id", Cotizacion.configuracion_id, None),
+    ("nombre_trabajo", Cotizacion.nombre_trabajo, None),
+    ("fecha_pedido", Cotizacion.fecha_pedido, _fecha),
+    ("puntadas", Cotizacion.puntadas, None),
+    ("colores", Cotizacion.colores, None),
+    ("ancho", Cotizacion.ancho, _float_o_cero),
+    ("alto", Cotizacion.alto, _float_o_cero),
+    ("bastidor", Cotizacion.bastidor, None),
+    ("tipo_tela", Cotizacion.tipo_tela, None),
+    ("tiene_sublimacion", Cotizacion.tiene_sublimacion, bool),
+    ("cantidad", Cotizacion.cantidad, None),
+    ("precio_unitario", Cotizacion.precio_unitario, _float_o_cero),
+    ("precio_total", Cotizacion.precio_total, _float_o_cero),
+    ("personal_id", Cotizacion.personal_id, None),
+    ("personal_nombre", Cotizacion.personal_id, PERSONAL),
+])
+
+def _nombres(filas, plan, marcador, buscar):
+    indices = {i for _, i, conv in plan if conv == marcador}
+    if not indices:
+        return None
+    return buscar(fila[i] for fila in filas for i in indices).get
+
+def _serializar(filas, plan, nombres=None):
+    """
+    Convierte filas (tuplas) en dicts siguiendo el plan compilado.
+    `nombres` ({CLIENTE|PERSONAL: get}) reutiliza nombres ya buscados en vez de consultarlos.
+    """
+    nombres = nombres or {}
+    resolver = {
+        CLIENTE: nombres.get(CLIENTE) or _nombres(filas, plan, CLIENTE, db_services.get_client_names),
+        PERSONAL: nombres.get(PERSONAL) or _nombres(filas, plan, PERSONAL, db_services.get_user_names),
+    }
+    pasos = [(clave, i, resolver[conv] if isinstance(conv, str) else conv) for clave, i, conv in plan]
+    return [
+        {clave: (fila[i] if conv is None else conv(fila[i])) for clave, i, conv in pasos}
+        for fila in filas
+    ]
+
+def _ordenes(*condiciones, orden=()):
+    stmt = select(*_ORDEN_COLUMNAS).join(Cotizacion, Orden.cotizacion_id == Cotizacion.id)
+    return _serializar(db.session.execute(stmt.where(*condiciones).order_by(*orden)).all(), _ORDEN_PLAN)
+
+def _cotizaciones(*condiciones, orden=()):
+    stmt = select(*_COTIZACION_COLUMNAS).where(*condiciones).order_by(*orden)
+    return _serializar(db.session.execute(stmt).all(), _COTIZACION_PLAN)
+
+def ordenes_resumen(cliente_id=None):
+    """Mismo contenido y orden que get_all_ordenes() / get_ordenes_by_client() + to_summary_dict()."""
+    if cliente_id is None:
+        return _ordenes(orden=(Orden.fecha_entrega.asc(), Orden.fecha_creacion.desc()))
+    return _ordenes(Cotizacion.cliente_id == cliente_id, orden=(Orden.fecha_creacion.desc(),))
+
+def cotizaciones_resumen(cliente_id):
+    """Mismo contenido y orden que get_cotizaciones_by_client() + to_summary_dict()."""
+    return _cotizaciones(Cotizacion.cliente_id == cliente_id, orden=(Cotizacion.fecha_pedido.desc(),))
+
+def ordenes_por_ids(ids):
+    return _ordenes(Orden.id.in_(set(ids))) if ids else []
+
+def cotizaciones_por_ids(ids):
+    return _cotizaciones(Cotizacion.id.in_(set(ids))) if ids else []
+
+def ordenes_por_estado(estado):
+    return _ordenes(Orden.estado == estado)
+
+def _indices(plan, marcador):
+    return [i for _, i, conv in plan if conv == marcador]
+
+# Posiciones fijas en las filas de la vista de trabajo (se calculan una vez)
+_COTIZACION_ID = next(i for clave, i, _ in _COTIZACION_PLAN if clave == "id")
+_COTIZACION_PERSONAL = _indices(_COTIZACION_PLAN, PERSONAL)
+_ORDEN_PERSONAL = _indices(_ORDEN_PLAN, PERSONAL)
+
+def espacio_cliente(cliente_id, cliente_nombre, per_page, offset=0):
+    """
+    Vista de trabajo de un cliente: una página de cotizaciones (más recientes
+    primero), las órdenes de esas cotizaciones y los nombres del personal de
+    ambas. Tres consultas (cotizaciones, órdenes y personal) sin importar el
+    tamaño de la página; con la del cliente en la ruta son cuatro. Los dicts
+    son los mismos de cotizaciones_resumen() / ordenes_resumen().
+    """
+    # Una fila extra para saber si hay más páginas sin un COUNT(*)
+    filas_cot = db.session.execute(
+        select(*_COTIZACION_COLUMNAS)
+        .where(Cotizacion.cliente_id == cliente_id)
+        .order_by(Cotizacion.fecha_pedido.desc(), Cotizacion.id.desc())
+        .limit(per_page + 1).offset(offset)
+    ).all()
+    has_more = len(filas_cot) > per_page
+    filas_cot = filas_cot[:per_page]
+
+    ids = [fila[_COTIZACION_ID] for fila in filas_cot]
+    filas_ord = db.session.execute(
+        select(*_ORDEN_COLUMNAS)
+        .join(Cotizacion, Orden.cotizacion_id == Cotizacion.id)
+        .where(Orden.cotizacion_id.in_(ids))
+        .order_by(Orden.fecha_creacion.desc())
+    ).all() if ids else []
+
+    personal = db_services.get_user_names(
+        [fila[i] for fila in filas_cot for i in _COTIZACION_PERSONAL] +
+        [fila[i] for fila in filas_ord for i in _ORDEN_PERSONAL]
+    )
+    nombres = {CLIENTE: {cliente_id: cliente_nombre}.get, PERSONAL: personal.get}
+    return {
+        "cotizaciones": _serializar(filas_cot, _COTIZACION_PLAN, nombres),
+        "has_more": has_more,
+        "ordenes": _serializar(filas_ord, _ORDEN_PLAN, nombres),
+        "personal": personal,
+    }
@@ -0,0 +1,83 @@
+import os
+from gunicorn.app.base import BaseApplication
+
+# ==========================================
+# 🚀 SERVIDOR DE PRODUCCIÓN (gunicorn, pre-fork)
+# ==========================================
+# - La app y el modelo de rembg se cargan en el master antes del fork
+#   (preload_app): los workers comparten los pesos copy-on-write. La sesión de
+#   ONNX Runtime se crea sin pools de hilos (image_services.opciones_sin_hilos),
+#   así no queda ningún hilo del master del que dependa un worker.
+# - post_fork descarta las conexiones heredadas del master (primarias y réplicas).
+# - Cada worker se recicla de forma ordenada tras WORKER_MAX_REQUESTS
+#   requests o al superar WORKER_MAX_RSS_MB de memoria residente.
+# - No inicializa la base: eso se hace una vez con init_db.py.
+# Requiere Linux/macOS (gunicorn no corre en Windows; ahí usar app.py).
+
+WORKER_MAX_RSS_MB = int(os.getenv('WORKER_MAX_RSS_MB', 1500))
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss: KB en Linux, bytes en macOS
+        return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+def post_fork(server, worker):
+    # Las conexiones abiertas en el master no deben compartirse entre procesos
+    from app import app
+    from database import db
+    import replicas
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    replicas.despues_del_fork()
+
+def post_request(worker, req, environ, resp):
+    rss = _rss_mb()
+    if rss > WORKER_MAX_RSS_MB:
+        worker.log.info(f"Worker {worker.pid}: RSS {rss:.0f} MB > {WORKER_MAX_RSS_MB} MB, reciclando")
+        # Termina el request en curso y sale; el master levanta uno nuevo
+        worker.alive = False
+
+class ZequitexServer(BaseApplication):
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key.lower(), value)
+
+    def load(self):
+        from app import app
+        from image_services import get_rembg_session
+        print("🧠 Cargando modelo de segmentación en el master (sin pools de hilos)...")
+        get_rembg_session(un_hilo=True)
+        return app
+
+def opciones():
+    host = os.getenv('FLASK_HOST', '0.0.0.0')
+    port = os.getenv('FLASK_PORT', '5000')
+    return {
+        'bind': f"{host}:{port}",
+        'workers': int(os.getenv('WEB_WORKERS', 2)),
+        'threads': int(os.getenv('WEB_THREADS', 4)),
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'max_requests': int(os.getenv('WORKER_MAX_REQUESTS', 1000)),
+        'max_requests_jitter': int(os.getenv('WORKER_MAX_REQUESTS_JITTER', 100)),
+        'timeout': int(os.getenv('WORKER_TIMEOUT', 120)),
+        'graceful_timeout': 30,
+        'post_fork': post_fork,
+        'post_request': post_request,
+    }
+
+if __name__ == '__main__':
+    ZequitexServer(opciones()).run()
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# ==========================================
+# 🧪 APP DE PRUEBA SOBRE SQLITE
+# ==========================================
+# Los dos binds (MySQL y PostgreSQL) apuntan a archivos SQLite temporales. Las
+# variables se fijan antes de importar app: la configuración se lee al importar.
+
+_DIRECTORIO = tempfile.mkdtemp(prefix='zequi-tests-')
+os.environ['DATABASE_MYSQL'] = f"sqlite:///{os.path.join(_DIRECTORIO, 'mysql.db')}"
+os.environ['DATABASE_POSTGRESQL'] = f"sqlite:///{os.path.join(_DIRECTORIO, 'postgresql.db')}"
+os.environ.pop('DATABASE_MYSQL_REPLICAS', None)
+os.environ.pop('DATABASE_POSTGRESQL_REPLICAS', None)
+os.environ['SQL_STATS'] = '1'
+os.environ['SQL_PRESUPUESTO_ESTRICTO'] = '1'
+os.environ['BLOB_DIR'] = os.path.join(_DIRECTORIO, 'blobs')
+os.environ['TICKETS_DIR'] = os.path.join(_DIRECTORIO, 'tickets')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app  # noqa: E402
+from database import db, init_db_data  # noqa: E402
+import db_services  # noqa: E402
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config.update(TESTING=True, SQL_PRESUPUESTO_ESTRICTO=True)
+    init_db_data(flask_app)
+    with flask_app.app_context():
+        db_services.ensure_default_admin()
+    return flask_app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
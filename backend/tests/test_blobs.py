@@ -0,0 +1,111 @@
+import io
+import json
+import base64
+import pytest
+from PIL import Image
+from database import db, Clientes, Cotizacion
+import blob_store
+from blob_store import FilesystemBlobStore, DescargaNoPermitida, PREFIJO_REF
+
+# ==========================================
+# 🧪 ALMACÉN DE IMÁGENES Y DESCARGAS PERMITIDAS
+# ==========================================
+# La misma imagen se guarda una sola vez; solo se bajan URLs de hosts
+# permitidos y hasta IMAGEN_DESCARGA_MAX_MB.
+
+def _png(color=(200, 0, 0)):
+    salida = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(salida, format='PNG')
+    return salida.getvalue()
+
+def _archivos(raiz):
+    return [p for p in raiz.rglob('*') if p.is_file()]
+
+def test_misma_imagen_un_solo_blob(tmp_path):
+    store = FilesystemBlobStore(str(tmp_path))
+    png = _png()
+    data_url = 'data:image/png;base64,' + base64.b64encode(png).decode()
+    legacy = json.dumps({"imagen_procesada": base64.b64encode(png).decode(), "puntadas": 10})
+
+    ref = blob_store.compactar_datos_json(data_url, store)
+    assert ref.startswith(PREFIJO_REF)
+    assert json.loads(blob_store.compactar_datos_json(legacy, store))['imagen_procesada'] == ref
+    assert store.put(png, 'image/png') == ref
+    assert len(_archivos(tmp_path)) == 1
+    assert store.get(ref) == png
+
+    otra = store.put(_png((0, 0, 200)), 'image/png')
+    assert otra != ref and len(_archivos(tmp_path)) == 2
+
+def test_solo_se_compactan_imagenes(tmp_path):
+    store = FilesystemBlobStore(str(tmp_path))
+    # Base64 válido que no es imagen, URLs y JSON sin imagen quedan igual
+    for valor in ("null", "abcd", "https://res.cloudinary.com/x.png", '{"puntadas": 5}', None):
+        assert blob_store.compactar_datos_json(valor, store) == valor
+    assert _archivos(tmp_path) == []
+    assert blob_store.tipo_de_contenido(b'RIFF\x00\x00\x00\x00WEBPVP8 ') == 'image/webp'
+    assert blob_store.tipo_de_contenido(b'<svg') is None
+
+def test_open_rechaza_digests_invalidos(tmp_path):
+    store = FilesystemBlobStore(str(tmp_path))
+    assert store.open('../../etc/passwd') == (None, None)
+    assert store.open('A' * 64) == (None, None)
+
+class _Respuesta:
+    def __init__(self, contenido, largo=None):
+        self.contenido = contenido
+        self.headers = {'Content-Length': str(largo)} if largo is not None else {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def read(self, n):
+        return self.contenido[:n]
+
+def test_descargar_solo_hosts_permitidos(monkeypatch):
+    pedidas = []
+    monkeypatch.setattr(blob_store, 'DESCARGA_MAX_BYTES', 100)
+    monkeypatch.setattr(blob_store.urllib.request, 'urlopen',
+                        lambda url, timeout: pedidas.append(url) or _Respuesta(b'x' * 10))
+    assert blob_store.descargar('https://res.cloudinary.com/demo/logo.png') == b'x' * 10
+
+    for url in ('http://169.254.169.254/latest/meta-data/', 'file:///etc/passwd',
+                'https://res.cloudinary.com.evil.test/logo.png', 'ftp://res.cloudinary.com/logo.png'):
+        with pytest.raises(DescargaNoPermitida):
+            blob_store.descargar(url)
+    assert pedidas == ['https://res.cloudinary.com/demo/logo.png']
+
+def test_descargar_respeta_el_tope(monkeypatch):
+    monkeypatch.setattr(blob_store, 'DESCARGA_MAX_BYTES', 100)
+    monkeypatch.setattr(blob_store.urllib.request, 'urlopen', lambda url, timeout: _Respuesta(b'x', largo=5000))
+    with pytest.raises(DescargaNoPermitida):
+        blob_store.descargar('https://res.cloudinary.com/grande.png')
+    # Sin Content-Length: se corta al leer
+    monkeypatch.setattr(blob_store.urllib.request, 'urlopen', lambda url, timeout: _Respuesta(b'x' * 500))
+    with pytest.raises(DescargaNoPermitida):
+        blob_store.descargar('https://res.cloudinary.com/grande.png')
+
+def test_cotizaciones_comparten_el_blob(app, client):
+    with app.app_context():
+        cliente = Clientes(nombre='Blobs SA')  # pyrefly: ignore [unexpected-keyword]
+        db.session.add(cliente)
+        db.session.commit()
+        cliente_id = cliente.id
+    png = _png((0, 150, 0))
+    data_url = 'data:image/png;base64,' + base64.b64encode(png).decode()
+    ids = [client.post('/orders', json={"cliente_id": cliente_id, "configuracion_id": 1, "nombre_trabajo": f"Logo {i}",
+                                        "datos_json": data_url}).get_json()['id'] for i in range(2)]
+    with app.app_context():
+        guardados = {db.session.get(Cotizacion, cot_id).datos_json for cot_id in ids}
+    assert len(guardados) == 1
+    ref = guardados.pop()
+    assert blob_store.es_referencia(ref)
+
+    r = client.get(f'/blobs/{blob_store.digest_de(ref)}')
+    assert r.status_code == 200 and r.mimetype == 'image/png'
+    assert r.get_data() == png
+    assert 'immutable' in r.headers['Cache-Control']
+    assert client.get('/blobs/' + '0' * 64).status_code == 404
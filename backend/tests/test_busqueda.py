@@ -0,0 +1,22 @@
+from database import db, Clientes
+
+# ==========================================
+# 🧪 BÚSQUEDA CON COMODINES DE LIKE
+# ==========================================
+# "%", "_" y "\" en el término se buscan como texto, no como comodines.
+
+def test_comodines_se_buscan_literales(app, client):
+    with app.app_context():
+        for nombre in ("Descuento 100% algodón", "Descuento 1000 piezas"):
+            db.session.add(Clientes(nombre=nombre))  # pyrefly: ignore [unexpected-keyword]
+        db.session.commit()
+        cliente_id = Clientes.query.filter_by(nombre="Descuento 1000 piezas").one().id
+    for nombre in ("Logo_A escuela", "LogoXA escuela"):
+        r = client.post('/orders', json={"cliente_id": cliente_id, "configuracion_id": 1, "nombre_trabajo": nombre})
+        assert r.status_code == 200, r.get_json()
+
+    clientes = client.get('/search', query_string={"q": "100%", "tipo": "clientes"}).get_json()['clientes']['items']
+    assert [c['nombre'] for c in clientes] == ["Descuento 100% algodón"]
+    cotizaciones = client.get('/search', query_string={"q": "o_a esc", "tipo": "cotizaciones"}).get_json()['cotizaciones']['items']
+    assert [c['nombre_trabajo'] for c in cotizaciones] == ["Logo_A escuela"]
+    assert client.get('/search', query_string={"q": "\\%", "tipo": "clientes"}).get_json()['clientes']['items'] == []
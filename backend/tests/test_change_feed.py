@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import select
+from database import db, Clientes, CambioOrden
+import change_feed
+
+# ==========================================
+# 🧪 FEED INCREMENTAL DE ÓRDENES
+# ==========================================
+# El cursor de /ordenes/changes avanza en orden de commit, compacta los cambios
+# por entidad, deja lápidas por lo borrado y pide reset si el cursor no existe.
+
+@pytest.fixture(scope='module')
+def cliente_id(app):
+    with app.app_context():
+        cliente = Clientes(nombre='Feed SA')  # pyrefly: ignore [unexpected-keyword]
+        db.session.add(cliente)
+        db.session.commit()
+        return cliente.id
+
+def _cotizacion(client, cliente_id, nombre):
+    r = client.post('/orders', json={"cliente_id": cliente_id, "configuracion_id": 1, "nombre_trabajo": nombre,
+                                     "cantidad": 1, "precio_total": 20})
+    assert r.status_code == 200, r.get_json()
+    return r.get_json()['id']
+
+def _cambios(client, since, **params):
+    r = client.get('/ordenes/changes', query_string={"since": since, **params})
+    assert r.status_code == 200, r.get_json()
+    return r.get_json()
+
+def test_cursor_compacta_y_deja_lapidas(client, cliente_id):
+    inicio = client.get('/ordenes/changes').get_json()['cursor']
+    cot_id = _cotizacion(client, cliente_id, "Feed 1")
+    orden_id = client.post('/ordenes', json={"cotizacion_id": cot_id}).get_json()['id']
+    assert client.put(f'/ordenes/{orden_id}', json={"estado": "en_proceso"}).status_code == 200
+
+    primera = _cambios(client, inicio, cliente_id=cliente_id)
+    assert primera['cursor'] > inicio and not primera['reset']
+    # Creada y modificada: un solo upsert, con el estado actual
+    ordenes = [c for c in primera['changes'] if c['tipo'] == 'orden']
+    assert len(ordenes) == 1 and ordenes[0]['op'] == 'upsert'
+    assert ordenes[0]['data']['estado'] == 'en_proceso'
+
+    # Desde el nuevo cursor no hay nada hasta el próximo cambio
+    assert _cambios(client, primera['cursor'], cliente_id=cliente_id)['changes'] == []
+    assert client.delete(f'/ordenes/{orden_id}').status_code == 200
+    segunda = _cambios(client, primera['cursor'], cliente_id=cliente_id)
+    assert segunda['changes'] == [{"tipo": "orden", "op": "delete", "id": orden_id}]
+
+    # Creada y borrada después del cursor: solo la lápida
+    assert {"tipo": "orden", "op": "delete", "id": orden_id} in _cambios(client, inicio)['changes']
+
+def test_filtro_por_cliente_y_paginas(client, cliente_id):
+    inicio = client.get('/ordenes/changes').get_json()['cursor']
+    with client.application.app_context():
+        otro = Clientes(nombre='Otro feed')  # pyrefly: ignore [unexpected-keyword]
+        db.session.add(otro)
+        db.session.commit()
+        otro_id = otro.id
+    propias = [_cotizacion(client, cliente_id, f"Página {i}") for i in range(3)]
+    ajena = _cotizacion(client, otro_id, "Ajena")
+
+    pagina = _cambios(client, inicio, cliente_id=cliente_id, limit=2)
+    assert pagina['has_more'] and [c['id'] for c in pagina['changes']] == propias[:2]
+    resto = _cambios(client, pagina['cursor'], cliente_id=cliente_id, limit=2)
+    assert not resto['has_more'] and [c['id'] for c in resto['changes']] == propias[2:]
+    assert ajena in [c['id'] for c in _cambios(client, inicio)['changes']]
+
+def test_cursor_desconocido_pide_reset(client):
+    actual = client.get('/ordenes/changes').get_json()['cursor']
+    r = _cambios(client, actual + 1000)
+    assert r['reset'] and r['changes'] == [] and r['cursor'] == actual
+
+def test_posicion_se_asigna_al_hacer_commit(app, cliente_id):
+    with app.app_context():
+        antes = change_feed.cursor_actual()
+        change_feed.registrar([('cotizacion', 987654, cliente_id, 'delete')])
+        # Un savepoint no es el commit de verdad
+        with db.session.begin_nested():
+            pass
+        pendiente = db.session.execute(select(CambioOrden).where(CambioOrden.entidad_id == 987654)).scalar_one()
+        assert pendiente.posicion is None
+        assert change_feed.cambios_desde(antes)['changes'] == []
+        db.session.commit()
+        assert change_feed.cursor_actual() == antes + 1
+        assert change_feed.cambios_desde(antes)['changes'] == [{"tipo": "cotizacion", "op": "delete", "id": 987654}]
+
+        # Lo que se deshace no deja posiciones pendientes para la próxima transacción
+        change_feed.registrar([('cotizacion', 987655, cliente_id, 'delete')])
+        db.session.rollback()
+        assert change_feed._PENDIENTES not in db.session.info
+        assert db.session.execute(select(CambioOrden).where(CambioOrden.entidad_id == 987655)).first() is None
@@ -0,0 +1,75 @@
+import gzip
+import json
+import pytest
+from database import db, Clientes
+import response_formats
+from response_formats import aceptados, codificacion_aceptada, MIME_COLUMNAR, MIME_MSGPACK
+
+# ==========================================
+# 🧪 FORMATOS Y COMPRESIÓN DE RESPUESTAS
+# ==========================================
+# Negociación por Accept / ?formato, q=0 como "no lo mandes", Vary, y
+# compresión según Accept-Encoding.
+
+@pytest.fixture(scope='module')
+def cliente_id(app):
+    client = app.test_client()
+    with app.app_context():
+        cliente = Clientes(nombre='Formatos SA')  # pyrefly: ignore [unexpected-keyword]
+        db.session.add(cliente)
+        db.session.commit()
+        cliente_id = cliente.id
+    # Suficientes órdenes para pasar MIN_BYTES_COMPRESION
+    for i in range(12):
+        r = client.post('/orders', json={"cliente_id": cliente_id, "configuracion_id": 1,
+                                         "nombre_trabajo": f"Bordado formatos {i}", "precio_total": 10 + i})
+        assert client.post('/ordenes', json={"cotizacion_id": r.get_json()['id']}).status_code == 200
+    return cliente_id
+
+def test_aceptados_respeta_q():
+    assert aceptados('gzip, br;q=0, deflate;q=0.5') == {'gzip', 'deflate'}
+    assert aceptados('Application/JSON ; q=0.9, */*;q=0.1') == {'application/json', '*/*'}
+    assert aceptados('gzip;q=abc, identity') == {'identity'}
+    assert aceptados(None) == set()
+
+def test_codificacion_aceptada():
+    assert codificacion_aceptada('gzip, deflate') == 'gzip'
+    assert codificacion_aceptada('gzip;q=0, deflate') is None
+    assert codificacion_aceptada('') is None
+
+def test_codificacion_prefiere_br():
+    pytest.importorskip('brotli')
+    assert codificacion_aceptada('gzip, br') == 'br'
+    assert codificacion_aceptada('gzip, br;q=0') == 'gzip'
+
+def test_formato_por_accept_y_por_parametro(client, cliente_id):
+    ruta = f'/clients/{cliente_id}/ordenes'
+    normal = client.get(ruta)
+    assert normal.mimetype == 'application/json'
+    assert 'Accept' in normal.headers['Vary']
+    filas = normal.get_json()
+
+    columnar = client.get(ruta, headers={'Accept': MIME_COLUMNAR})
+    assert columnar.mimetype == MIME_COLUMNAR
+    cuerpo = json.loads(columnar.get_data())
+    assert [dict(zip(cuerpo['columns'], fila)) for fila in cuerpo['rows']] == filas
+    assert client.get(f'{ruta}?formato=columnar').mimetype == MIME_COLUMNAR
+
+    # q=0: el cliente dice explícitamente que no lo quiere
+    assert client.get(ruta, headers={'Accept': f'{MIME_COLUMNAR};q=0, application/json'}).mimetype == 'application/json'
+
+    esperado = MIME_MSGPACK if response_formats.msgpack is not None else MIME_COLUMNAR
+    assert client.get(ruta, headers={'Accept': MIME_MSGPACK}).mimetype == esperado
+
+def test_compresion_segun_accept_encoding(client, cliente_id):
+    ruta = f'/clients/{cliente_id}/ordenes'
+    plano = client.get(ruta)
+    assert 'Content-Encoding' not in plano.headers
+    assert len(plano.get_data()) >= response_formats.MIN_BYTES_COMPRESION
+
+    comprimido = client.get(ruta, headers={'Accept-Encoding': 'gzip'})
+    assert comprimido.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in comprimido.headers['Vary']
+    assert gzip.decompress(comprimido.get_data()) == plano.get_data()
+
+    assert 'Content-Encoding' not in client.get(ruta, headers={'Accept-Encoding': 'gzip;q=0'}).headers
@@ -0,0 +1,72 @@
+import random
+from PIL import Image, ImageDraw
+from database import db, Clientes
+import huellas_services
+from huellas_services import BKTree, distancia, calcular, firmar, parsear
+
+# ==========================================
+# 🧪 DISEÑOS PARECIDOS (hash perceptual)
+# ==========================================
+# El BK-tree encuentra lo mismo que recorrer todo; la huella tolera recolorear
+# y redimensionar el mismo logo pero separa siluetas distintas.
+
+def _logo(lado, color, forma='estrella'):
+    """Diseño ya recortado: figura opaca sobre fondo transparente."""
+    imagen = Image.new('RGBA', (lado, lado), (0, 0, 0, 0))
+    dibujo = ImageDraw.Draw(imagen)
+    escala = lado / 100
+    if forma == 'estrella':
+        puntos = [(50, 5), (61, 38), (95, 38), (67, 58), (78, 92), (50, 71), (22, 92), (33, 58), (5, 38), (39, 38)]
+    else:
+        puntos = [(10, 20), (90, 10), (80, 90), (30, 75)]
+    dibujo.polygon([(x * escala, y * escala) for x, y in puntos], fill=color)
+    dibujo.ellipse([40 * escala, 40 * escala, 60 * escala, 60 * escala], fill=(255, 255, 255, 255))
+    return imagen
+
+def test_bktree_igual_que_fuerza_bruta():
+    azar = random.Random(44)
+    hashes = [azar.getrandbits(64) for _ in range(400)]
+    # Algunos casi repetidos, para que haya vecinos cercanos
+    hashes += [h ^ (1 << azar.randrange(64)) for h in hashes[:50]]
+    arbol = BKTree()
+    for cot_id, h in enumerate(hashes):
+        arbol.agregar(h, cot_id)
+    assert arbol.total == len(hashes)
+    for consulta in hashes[:20] + [azar.getrandbits(64) for _ in range(5)]:
+        for radio in (0, 3, 10, 24):
+            esperado = sorted((distancia(consulta, h), cot_id) for cot_id, h in enumerate(hashes)
+                              if distancia(consulta, h) <= radio)
+            assert sorted(arbol.buscar(consulta, radio)) == esperado
+
+def test_huella_tolera_color_y_tamano():
+    original = calcular(_logo(400, (200, 30, 30, 255)))
+    mismo = calcular(_logo(173, (20, 90, 200, 255)))
+    otro = calcular(_logo(400, (200, 30, 30, 255), forma='trapecio'))
+    assert distancia(original[1], mismo[1]) <= huellas_services.UMBRAL_PHASH
+    assert distancia(original[1], otro[1]) > huellas_services.UMBRAL_PHASH
+
+def test_firma_de_la_huella():
+    huella = calcular(_logo(200, (0, 0, 0, 255)))
+    assert parsear(firmar(huella)) == huella
+    texto, _, firma = firmar(huella).partition('.')
+    otra = ('0' if texto[0] != '0' else '1') + texto[1:]
+    assert parsear(f"{otra}.{firma}") is None
+    assert parsear(texto) is None and parsear(None) is None
+
+def test_cotizacion_con_huella_aparece_como_similar(app, client):
+    logo = _logo(300, (10, 120, 10, 255))
+    with app.app_context():
+        cliente = Clientes(nombre='Huellas SA')  # pyrefly: ignore [unexpected-keyword]
+        db.session.add(cliente)
+        db.session.commit()
+        cliente_id = cliente.id
+    r = client.post('/orders', json={"cliente_id": cliente_id, "configuracion_id": 1, "nombre_trabajo": "Estrella verde",
+                                     "puntadas": 4200, "precio_total": 90, "huella": firmar(calcular(logo))})
+    assert r.status_code == 200, r.get_json()
+    cot_id = r.get_json()['id']
+    with app.app_context():
+        similares = huellas_services.buscar_similares(calcular(_logo(120, (250, 200, 0, 255))))
+        distinto = huellas_services.buscar_similares(calcular(_logo(300, (10, 120, 10, 255), forma='trapecio')))
+    assert similares and similares[0]['cotizacion_id'] == cot_id
+    assert similares[0]['puntadas'] == 4200
+    assert cot_id not in [s['cotizacion_id'] for s in distinto]
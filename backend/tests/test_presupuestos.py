@@ -0,0 +1,192 @@
+import json
+import threading
+from datetime import datetime, timedelta
+import pytest
+from database import db, Clientes, Cotizacion, Orden, RespuestaIdempotente
+import archive_cotizaciones
+import db_services
+import idempotencia
+
+# ==========================================
+# 🧪 PRESUPUESTOS DE CONSULTAS SQL POR RUTA
+# ==========================================
+# Con SQL_PRESUPUESTO_ESTRICTO una ruta que excede su @query_stats.presupuesto
+# responde 500, así que basta con pedir cada una y revisar status y
+# X-SQL-Queries. También cubre Idempotency-Key (incluida una reserva tomada por
+# un reintento), los detalles de lo archivado y la cantidad de consultas de
+# /clients/:id/workspace.
+
+def _crear_cotizacion(client, cliente_id, nombre, personal_id, **extra):
+    r = client.post('/orders', json={
+        "cliente_id": cliente_id, "configuracion_id": 1, "nombre_trabajo": nombre,
+        "puntadas": 1000, "cantidad": 2, "precio_total": 50.0, "personal_id": personal_id, **extra
+    })
+    assert r.status_code == 200, r.get_json()
+    return r.get_json()['id']
+
+def _crear_orden(client, cotizacion_id, personal_id, **extra):
+    r = client.post('/ordenes', json={"cotizacion_id": cotizacion_id, "personal_id": personal_id,
+                                      "fecha_entrega": "2030-01-15", **extra})
+    assert r.status_code == 200, r.get_json()
+    return r.get_json()['id']
+
+@pytest.fixture(scope='module')
+def datos(app):
+    client = app.test_client()
+    with app.app_context():
+        cliente = Clientes(nombre='Bordados Ana')  # pyrefly: ignore [unexpected-keyword]
+        db.session.add(cliente)
+        db.session.commit()
+        cliente_id = cliente.id
+        personal_id = 1
+    cotizaciones, ordenes = [], []
+    for i in range(5):
+        cot_id = _crear_cotizacion(client, cliente_id, f"Logo escuela {i}", personal_id)
+        cotizaciones.append(cot_id)
+        ordenes.append(_crear_orden(client, cot_id, personal_id))
+    return {"cliente_id": cliente_id, "cotizaciones": cotizaciones, "ordenes": ordenes}
+
+def _rutas(datos):
+    cliente_id = datos['cliente_id']
+    return [
+        f"/orders/{datos['cotizaciones'][0]}",
+        f"/clients/{cliente_id}/orders",
+        f"/clients/{cliente_id}/workspace",
+        "/ordenes",
+        f"/clients/{cliente_id}/ordenes",
+        f"/ordenes/{datos['ordenes'][0]}",
+        "/search?q=logo",
+        "/search?q=logo&tipo=ordenes",
+        "/reportes/ventas-mensuales",
+        "/reportes/conversion",
+        "/reportes/produccion-personal",
+        "/reportes/top-clientes",
+    ]
+
+def test_todas_las_rutas_con_presupuesto_estan_cubiertas(app, datos):
+    cubiertas = set()
+    adaptador = app.url_map.bind('localhost')
+    for ruta in _rutas(datos):
+        endpoint, _ = adaptador.match(ruta.split('?')[0], method='GET')
+        cubiertas.add(endpoint)
+    con_presupuesto = {endpoint for endpoint, vista in app.view_functions.items()
+                       if getattr(vista, 'presupuesto_sql', None) is not None}
+    assert con_presupuesto <= cubiertas, f"Rutas con presupuesto sin test: {con_presupuesto - cubiertas}"
+
+def test_rutas_dentro_del_presupuesto(app, client, datos):
+    for ruta in _rutas(datos):
+        r = client.get(ruta)
+        assert r.status_code == 200, f"{ruta}: {r.get_json()}"
+        vista = app.view_functions[app.url_map.bind('localhost').match(ruta.split('?')[0], method='GET')[0]]
+        assert int(r.headers['X-SQL-Queries']) <= vista.presupuesto_sql, ruta
+
+def test_workspace_consultas_constantes(client, datos):
+    consultas = set()
+    for per_page in (1, 2, 50):
+        r = client.get(f"/clients/{datos['cliente_id']}/workspace?per_page={per_page}")
+        assert r.status_code == 200
+        cuerpo = r.get_json()
+        assert len(cuerpo['cotizaciones']) == min(per_page, len(datos['cotizaciones']))
+        assert len(cuerpo['ordenes']) == len(cuerpo['cotizaciones'])
+        consultas.add(int(r.headers['X-SQL-Queries']))
+    # cliente, cotizaciones, órdenes y personal
+    assert consultas == {4}
+
+def test_idempotency_key_repite_la_respuesta(app, client, datos):
+    cuerpo = {"cliente_id": datos['cliente_id'], "configuracion_id": 1, "nombre_trabajo": "Reintento"}
+    cabeceras = {"Idempotency-Key": "test-reintento-1"}
+    primera = client.post('/orders', json=cuerpo, headers=cabeceras)
+    segunda = client.post('/orders', json=cuerpo, headers=cabeceras)
+    assert primera.status_code == segunda.status_code == 200
+    assert segunda.headers.get('Idempotent-Replayed') == 'true'
+    assert 'Idempotent-Replayed' not in primera.headers
+    assert segunda.get_json()['id'] == primera.get_json()['id']
+    with app.app_context():
+        assert Cotizacion.query.filter_by(nombre_trabajo='Reintento').count() == 1
+
+    otra = client.post('/orders', json={**cuerpo, "nombre_trabajo": "Otra cosa"}, headers=cabeceras)
+    assert otra.status_code == 422
+
+    # La misma clave en otra ruta es otra reserva
+    orden = client.post('/ordenes', json={"cotizacion_id": primera.get_json()['id']}, headers=cabeceras)
+    assert orden.status_code == 200
+    assert 'Idempotent-Replayed' not in orden.headers
+
+def test_idempotency_key_repite_tambien_los_4xx(client, datos):
+    cabeceras = {"Idempotency-Key": "test-reintento-2"}
+    r = client.post('/orders', data=json.dumps({"cliente_id": datos['cliente_id']}),
+                    content_type='application/json', headers=cabeceras)
+    assert r.status_code == 400
+    repetida = client.post('/orders', data=json.dumps({"cliente_id": datos['cliente_id']}),
+                           content_type='application/json', headers=cabeceras)
+    assert repetida.status_code == 400
+    assert repetida.headers.get('Idempotent-Replayed') == 'true'
+
+def test_idempotency_key_reserva_tomada_no_guarda_dos_veces(app, client, datos, monkeypatch):
+    cuerpo = {"cliente_id": datos['cliente_id'], "configuracion_id": 1, "nombre_trabajo": "Lenta"}
+    cabeceras = {"Idempotency-Key": "test-lenta-1"}
+    original = db_services.create_cotizacion
+    respuestas = {}
+
+    def lenta(payload):
+        # Mientras el primer request "tarda", el reintento toma la reserva vencida y termina antes
+        if not respuestas:
+            respuestas['reintento'] = None
+            monkeypatch.setattr(idempotencia, 'IDEMPOTENCIA_RESERVA_SEG', 0)
+            # En otro hilo, como otro worker: su propio app context y su propia sesión
+            hilo = threading.Thread(target=lambda: respuestas.update(
+                reintento=app.test_client().post('/orders', json=cuerpo, headers=cabeceras)))
+            hilo.start()
+            hilo.join()
+        return original(payload)
+
+    monkeypatch.setattr(db_services, 'create_cotizacion', lenta)
+    primera = client.post('/orders', json=cuerpo, headers=cabeceras)
+    reintento = respuestas['reintento']
+    assert reintento.status_code == 200, reintento.get_json()
+    # El commit del primero ya no encuentra su reserva y no se guarda
+    assert primera.status_code == 500
+    with app.app_context():
+        assert Cotizacion.query.filter_by(nombre_trabajo='Lenta').count() == 1
+        assert db.session.get(RespuestaIdempotente, ("test-lenta-1", "POST /orders")).estado == 'completa'
+
+    otra = client.post('/orders', json=cuerpo, headers=cabeceras)
+    assert otra.headers.get('Idempotent-Replayed') == 'true'
+    assert otra.get_json()['id'] == reintento.get_json()['id']
+
+def test_idempotency_key_hecha_sin_respuesta_no_se_repite(app, client, datos, monkeypatch):
+    cuerpo = {"cliente_id": datos['cliente_id'], "configuracion_id": 1, "nombre_trabajo": "Sin respuesta"}
+    cabeceras = {"Idempotency-Key": "test-caida-1"}
+    # El worker "muere" entre el commit de la vista y guardar la respuesta
+    monkeypatch.setattr(idempotencia, '_guardar', lambda *args: None)
+    assert client.post('/orders', json=cuerpo, headers=cabeceras).status_code == 200
+    monkeypatch.setattr(idempotencia, 'IDEMPOTENCIA_RESERVA_SEG', 0)
+    reintento = client.post('/orders', json=cuerpo, headers=cabeceras)
+    assert reintento.status_code == 409
+    with app.app_context():
+        assert Cotizacion.query.filter_by(nombre_trabajo='Sin respuesta').count() == 1
+
+def test_detalles_de_lo_archivado(app, client, datos):
+    cot_id = _crear_cotizacion(client, datos['cliente_id'], "Uniforme viejo", 1)
+    orden_id = _crear_orden(client, cot_id, 1, estado='entregado')
+    with app.app_context():
+        db.session.get(Cotizacion, cot_id).fecha_pedido = datetime.utcnow() - timedelta(days=800)
+        db.session.commit()
+
+    resultado = archive_cotizaciones.archivar(horizonte_dias=730)
+    assert resultado['cotizaciones'] == 1 and resultado['ordenes'] == 1
+    with app.app_context():
+        assert db.session.get(Cotizacion, cot_id) is None
+        assert db.session.get(Orden, orden_id) is None
+
+    for ruta in (f"/orders/{cot_id}", f"/ordenes/{orden_id}"):
+        r = client.get(ruta)
+        assert r.status_code == 200, f"{ruta}: {r.get_json()}"
+        assert r.get_json()['id'] in (cot_id, orden_id)
+
+    assert client.get('/orders/999999').status_code == 404
+    assert client.get('/ordenes/999999').status_code == 404
+
+    # Lo archivado ya no aparece en las listas del cliente
+    lista = client.get(f"/clients/{datos['cliente_id']}/ordenes").get_json()
+    assert orden_id not in [o['id'] for o in lista]
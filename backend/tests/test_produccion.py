@@ -0,0 +1,107 @@
+import random
+from datetime import date, datetime, timedelta
+import produccion_services
+from produccion_services import Plan, Calendario, minutos_de_trabajo
+from database import db, Clientes
+
+# ==========================================
+# 🧪 PLAN DE PRODUCCIÓN (EDD)
+# ==========================================
+# Reparto por fecha de entrega más temprana, re-simulación incremental igual a
+# simular de cero, calendario de jornada y el plan servido por /produccion/plan.
+
+def _orden(orden_id, entrega=None, puntadas=8000, colores=1, cantidad=1, estado='en_proceso'):
+    return {"id": orden_id, "estado": estado, "fecha_entrega": entrega, "fecha_creacion": f"2030-01-01T00:00:{orden_id % 60:02d}",
+            "puntadas": puntadas, "colores": colores, "cantidad": cantidad}
+
+def test_minutos_de_trabajo():
+    # 8000 / 800 = 10 min por pieza + 2 cambios de color (40 s) + bastidor (45 s)
+    assert minutos_de_trabajo(8000, 3, 2, ppm=800, cambio_color_seg=20, cambio_bastidor_seg=45) == 2 * (10 + 85 / 60)
+    assert minutos_de_trabajo(None, None, 0, ppm=800, cambio_color_seg=20, cambio_bastidor_seg=45) == 45 / 60
+
+def test_edd_reparte_en_la_maquina_que_se_libera_primero():
+    plan = Plan(maquinas=2, ppm=800)
+    plan.poner(_orden(1, "2030-03-10", puntadas=80000))   # 100 min
+    plan.poner(_orden(2, "2030-03-01", puntadas=8000))    # 10 min
+    plan.poner(_orden(3, "2030-03-05", puntadas=16000))   # 20 min
+    plan.poner(_orden(4))                                 # sin fecha: al final
+    plan.recalcular()
+    orden = [clave[2] for clave in plan.claves]
+    assert orden == [2, 3, 1, 4]
+    bastidor = produccion_services.CAMBIO_BASTIDOR_SEG / 60
+    asignacion = dict(zip(orden, plan.asignacion))
+    assert asignacion[2][:2] == (0, 0.0) and asignacion[3][:2] == (1, 0.0)
+    # La 1 va a la máquina 0, que se libera primero (10 min < 20 min)
+    assert asignacion[1][0] == 0 and abs(asignacion[1][1] - (10 + bastidor)) < 1e-9
+    assert asignacion[4][0] == 1
+
+def test_incremental_igual_a_simular_de_cero():
+    azar = random.Random(41)
+    plan = Plan(maquinas=3, ppm=800)
+    vivas = {}
+    # Más órdenes que CADA para pasar por varios checkpoints
+    for paso in range(1500):
+        orden_id = azar.randrange(1, 700)
+        if orden_id in vivas and azar.random() < 0.3:
+            estado = azar.choice(['entregado', 'cancelado'])
+            plan.poner(_orden(orden_id, estado=estado))
+            vivas.pop(orden_id)
+        else:
+            entrega = None if azar.random() < 0.1 else (date(2030, 1, 1) + timedelta(days=azar.randrange(60))).isoformat()
+            orden = _orden(orden_id, entrega, puntadas=azar.randrange(1000, 30000), colores=azar.randrange(1, 6),
+                           cantidad=azar.randrange(1, 4))
+            plan.poner(orden)
+            vivas[orden_id] = orden
+        if paso % 97 == 0:
+            plan.recalcular()
+    plan.recalcular()
+
+    de_cero = Plan(maquinas=3, ppm=800)
+    for orden in vivas.values():
+        de_cero.poner(orden)
+    de_cero.recalcular()
+    assert plan.claves == de_cero.claves
+    assert plan.asignacion == de_cero.asignacion
+
+def test_calendario_respeta_jornada_y_dias_habiles():
+    lunes = datetime(2030, 1, 7, 7, 0)  # antes de abrir
+    calendario = Calendario(lunes, hora_inicio='08:00', horas_dia=8, dias_habiles={0, 1, 2, 3, 4})
+    assert calendario.fecha(0) == datetime(2030, 1, 7, 8, 0)
+    assert calendario.fecha(479) == datetime(2030, 1, 7, 15, 59)
+    assert calendario.fecha(480) == datetime(2030, 1, 8, 8, 0)
+    # 5 jornadas después: el sábado y el domingo no cuentan
+    assert calendario.fecha(5 * 480 + 30) == datetime(2030, 1, 14, 8, 30)
+
+    viernes_tarde = Calendario(datetime(2030, 1, 11, 18, 0), hora_inicio='08:00', horas_dia=8,
+                               dias_habiles={0, 1, 2, 3, 4})
+    assert viernes_tarde.fecha(0) == datetime(2030, 1, 14, 8, 0)
+
+def test_plan_en_riesgo():
+    plan = Plan(maquinas=1, ppm=800)
+    plan.ahora = datetime(2030, 1, 7, 8, 0)
+    plan.poner(_orden(1, "2030-01-07", puntadas=800 * 600))  # 10 h: termina al día siguiente
+    plan.poner(_orden(2, "2030-02-01"))
+    plan.recalcular()
+    resultado = plan.resultado(solo_riesgo=True)
+    assert resultado["total_ordenes"] == 2
+    assert [r["orden_id"] for r in resultado["en_riesgo"]] == [1]
+    assert resultado["maquinas"][0]["trabajos"] == []
+
+def test_plan_sigue_al_feed(app, client):
+    with app.app_context():
+        cliente = Clientes(nombre='Producción SA')  # pyrefly: ignore [unexpected-keyword]
+        db.session.add(cliente)
+        db.session.commit()
+        cliente_id = cliente.id
+    cot_id = client.post('/orders', json={"cliente_id": cliente_id, "configuracion_id": 1, "nombre_trabajo": "Parches",
+                                          "puntadas": 5000, "cantidad": 10}).get_json()['id']
+    orden_id = client.post('/ordenes', json={"cotizacion_id": cot_id, "fecha_entrega": "2030-06-01"}).get_json()['id']
+
+    def en_plan():
+        r = client.get('/produccion/plan')
+        assert r.status_code == 200, r.get_json()
+        return {t["orden_id"] for m in r.get_json()["maquinas"] for t in m["trabajos"]}
+
+    assert orden_id in en_plan()
+    assert client.put(f'/ordenes/{orden_id}', json={"estado": "entregado"}).status_code == 200
+    assert orden_id not in en_plan()
@@ -0,0 +1,83 @@
+import os
+import time
+import sqlite3
+import pytest
+import sqlalchemy as sa
+from database import db, Clientes
+import replicas
+
+# ==========================================
+# 🧪 LECTURAS EN RÉPLICAS
+# ==========================================
+# La "réplica" es una copia del archivo SQLite del bind postgresql tomada en un
+# momento dado: lo creado después solo existe en la primaria, así se ve de
+# dónde leyó cada request.
+
+def _crear_cotizacion(client, cliente_id, nombre):
+    r = client.post('/orders', json={"cliente_id": cliente_id, "configuracion_id": 1, "nombre_trabajo": nombre})
+    assert r.status_code == 200, r.get_json()
+    return r
+
+@pytest.fixture
+def replica(app, client, tmp_path, monkeypatch):
+    with app.app_context():
+        cliente = Clientes(nombre='Réplicas SA')  # pyrefly: ignore [unexpected-keyword]
+        db.session.add(cliente)
+        db.session.commit()
+        cliente_id = cliente.id
+        primaria = db.engines['postgresql']
+    vieja = _crear_cotizacion(client, cliente_id, "Antes de la copia").get_json()['id']
+
+    copia = tmp_path / 'replica.db'
+    origen = sqlite3.connect(primaria.url.database)
+    destino = sqlite3.connect(str(copia))
+    origen.backup(destino)
+    origen.close()
+    destino.close()
+
+    r = replicas.Replica(sa.create_engine(f"sqlite:///{copia}"), 'postgresql-replica-test')
+    r.proximo_chequeo = time.monotonic() + 3600  # sin chequeos en segundo plano durante el test
+    monkeypatch.setitem(replicas._replicas, primaria, [r])
+    return {"replica": r, "cliente_id": cliente_id, "vieja": vieja}
+
+def test_get_lee_de_la_replica(client, replica):
+    nueva = _crear_cotizacion(client, replica['cliente_id'], "Después de la copia")
+    assert client.get(f"/orders/{replica['vieja']}").status_code == 200
+    # Solo está en la primaria: leyendo de la réplica no existe todavía
+    assert client.get(f"/orders/{nueva.get_json()['id']}").status_code == 404
+
+def test_leer_lo_propio_con_write_token(client, replica):
+    nueva = _crear_cotizacion(client, replica['cliente_id'], "Propia")
+    token = nueva.headers[replicas.HEADER_TOKEN]
+    ruta = f"/orders/{nueva.get_json()['id']}"
+    assert client.get(ruta, headers={replicas.HEADER_TOKEN: token}).status_code == 200
+    # Un token viejo (fuera de la ventana) vuelve a leer de la réplica
+    viejo = str(int(token) - int(replicas.REPLICA_LECTURA_PROPIA_SEG * 1000) - 60000)
+    assert client.get(ruta, headers={replicas.HEADER_TOKEN: viejo}).status_code == 404
+
+def test_replica_no_sana_lee_de_la_primaria(client, replica):
+    nueva = _crear_cotizacion(client, replica['cliente_id'], "Réplica caída").get_json()['id']
+    replica['replica'].sana = False
+    assert client.get(f"/orders/{nueva}").status_code == 200
+
+def test_error_en_la_replica_repite_en_la_primaria(client, replica, tmp_path):
+    # Una réplica que no se puede abrir: la lectura falla, se marca caída y se repite en la primaria
+    rota = replica['replica']
+    rota.engine = sa.create_engine(f"sqlite:///{tmp_path / 'no-existe' / 'replica.db'}")
+    nueva = _crear_cotizacion(client, replica['cliente_id'], "Réplica rota").get_json()['id']
+    assert client.get(f"/orders/{nueva}").status_code == 200
+    assert rota.sana is False
+    assert replicas.estado() == [{"nombre": 'postgresql-replica-test', "sana": False, "lag_seg": 0.0}]
+
+def test_escrituras_van_a_la_primaria(client, replica):
+    # Un POST nunca lee de la réplica: la cotización que solo está en la primaria se encuentra
+    nueva = _crear_cotizacion(client, replica['cliente_id'], "Para orden").get_json()['id']
+    r = client.post('/ordenes', json={"cotizacion_id": nueva})
+    assert r.status_code == 200, r.get_json()
+    assert replicas.HEADER_TOKEN in r.headers
+
+def test_urls_de_replicas(monkeypatch):
+    monkeypatch.setenv('DATABASE_POSTGRESQL_REPLICAS', ' postgresql://a/db , ,postgresql://b/db')
+    assert replicas._urls('postgresql') == ['postgresql://a/db', 'postgresql://b/db']
+    assert replicas._connect_args('postgresql://a/db') == {'connect_timeout': replicas.REPLICA_TIMEOUT_SEG}
+    assert replicas._connect_args(f"sqlite:///{os.devnull}") == {}
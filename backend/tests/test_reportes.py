@@ -0,0 +1,84 @@
+import io
+from datetime import date
+import pytest
+from database import db, Clientes, ReporteDiario, ReporteDiarioPersonal, ReporteDiarioCliente
+import report_services
+
+# ==========================================
+# 🧪 RESÚMENES DIARIOS INCREMENTALES
+# ==========================================
+# Después de altas, ediciones y bajas (sueltas, por lote e importadas), lo que
+# dejaron los deltas debe ser igual a reconstruir todo desde cero.
+
+DESDE, HASTA = date(2000, 1, 1), date(2100, 1, 1)
+
+def _foto():
+    def filas(modelo, claves, valores):
+        return sorted(
+            tuple(getattr(r, c) for c in claves) + tuple(float(getattr(r, v)) for v in valores)
+            for r in modelo.query
+            if any(getattr(r, v) for v in valores)
+        )
+    return (
+        filas(ReporteDiario, ('fecha',), ('cotizaciones', 'monto_cotizado', 'ordenes', 'monto_ordenes', 'ordenes_canceladas')),
+        filas(ReporteDiarioPersonal, ('fecha', 'personal_id'), ('ordenes_entregadas', 'puntadas')),
+        filas(ReporteDiarioCliente, ('fecha', 'cliente_id'), ('ordenes', 'monto')),
+    )
+
+@pytest.fixture(scope='module')
+def cliente_id(app):
+    with app.app_context():
+        cliente = Clientes(nombre='Reportes SA')  # pyrefly: ignore [unexpected-keyword]
+        db.session.add(cliente)
+        db.session.commit()
+        return cliente.id
+
+def _reconstruir(app):
+    with app.app_context():
+        report_services.refrescar_rango(DESDE, HASTA)
+        db.session.commit()
+
+def test_deltas_igual_a_reconstruir(app, client, cliente_id):
+    # Punto de partida consistente (otros tests tocan fechas directo en la base)
+    _reconstruir(app)
+    ids = []
+    for i, precio in enumerate((100, 250.5, 80, 40)):
+        r = client.post('/orders', json={"cliente_id": cliente_id, "configuracion_id": 1, "nombre_trabajo": f"Gorra {i}",
+                                         "puntadas": 1500, "cantidad": 3, "precio_total": precio, "personal_id": 1})
+        ids.append(r.get_json()['id'])
+    ordenes = [client.post('/ordenes', json={"cotizacion_id": cot_id, "personal_id": 1}).get_json()['id'] for cot_id in ids[:3]]
+
+    # Cambios de estado, fecha de entrega y personal: restan el aporte anterior y suman el nuevo
+    assert client.put(f'/ordenes/{ordenes[0]}', json={"estado": "entregado", "fecha_entrega": "2031-02-03"}).status_code == 200
+    assert client.put(f'/ordenes/{ordenes[1]}', json={"estado": "cancelado"}).status_code == 200
+    assert client.put(f'/ordenes/{ordenes[0]}', json={"personal_id": None}).status_code == 200
+    assert client.put(f'/ordenes/{ordenes[1]}', json={"estado": "entregado"}).status_code == 200
+    assert client.delete(f'/ordenes/{ordenes[2]}').status_code == 200
+
+    lote = client.post('/orders/batch', json={"crear_ordenes": True, "cotizaciones": [
+        {"cliente_id": cliente_id, "configuracion_id": 1, "nombre_trabajo": "Lote", "precio_total": 10, "cantidad": 1}
+        for _ in range(3)
+    ]})
+    assert lote.status_code == 200, lote.get_json()
+    csv = "cliente_id,configuracion_id,nombre_trabajo,precio_total,fecha_pedido\n" + "".join(
+        f"{cliente_id},1,Importada {i},{5 * i},2029-06-0{i + 1}\n" for i in range(3)
+    )
+    importacion = client.post('/orders/import', data={'file': (io.BytesIO(csv.encode()), 'x.csv')})
+    assert importacion.get_json()['insertadas'] == 3, importacion.get_json()
+
+    with app.app_context():
+        incremental = _foto()
+    _reconstruir(app)
+    with app.app_context():
+        reconstruido = _foto()
+    assert incremental == reconstruido
+    assert any(fila[1] == cliente_id for fila in incremental[2])
+
+def test_aportes_de_orden():
+    dia = date(2030, 5, 1)
+    cot = {"cliente_id": 7, "precio_total": 12.5, "puntadas": 1000, "cantidad": 2}
+    entregada = report_services.aportes_de_orden({"estado": "entregado", "fecha_creacion": dia, "personal_id": None}, cot)
+    assert (ReporteDiarioPersonal, (dia, 0), {"ordenes_entregadas": 1, "puntadas": 2000}) in entregada
+    assert any(m is ReporteDiarioCliente and clave == (dia, 7) for m, clave, _ in entregada)
+    cancelada = report_services.aportes_de_orden({"estado": "cancelado", "fecha_creacion": dia}, cot)
+    assert cancelada == [(ReporteDiario, (dia,), {"ordenes_canceladas": 1})]
@@ -0,0 +1,357 @@
+import io
+import os
+import json
+import shutil
+import hashlib
+import zipfile
+import tempfile
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw, ImageFont
+from sqlalchemy import select
+from database import db, Orden, OrdenArchivada
+import db_services
+import image_derivatives
+
+# ==========================================
+# 🧾 TICKETS DE COTIZACIÓN / ORDEN (PNG / PDF)
+# ==========================================
+# El mismo ticket que arma ShareableTicket con html2canvas, pero dibujado en
+# el servidor con Pillow a partir de lo guardado (cotización, orden, nombre del
+# cliente y la vista previa de la imagen del diseño).
+#
+# Caché en disco: <TICKETS_DIR>/<cot-id | orden-id>/<versión>.<png|pdf>. La
+# versión es un hash de todo lo que se dibuja (más PLANTILLA), así que un ticket
+# nunca se sirve desactualizado aunque lo haya cambiado otro proceso; además
+# update_orden/delete_orden borran los de esa orden al momento. El directorio
+# se poda por antigüedad al superar TICKETS_MAX_MB.
+
+TICKETS_DIR = os.getenv('TICKETS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tickets'))
+TICKETS_MAX_BYTES = int(float(os.getenv('TICKETS_MAX_MB', 200)) * 1024 * 1024)
+TICKETS_WORKERS = int(os.getenv('TICKETS_WORKERS', 4))
+TICKETS_FUENTE = os.getenv('TICKETS_FUENTE')  # .ttf normal; la negrita se busca como <nombre>-Bold.ttf
+
+PLANTILLA = 1          # subir al cambiar el dibujo: invalida toda la caché
+FORMATOS = {'png': 'image/png', 'pdf': 'application/pdf'}
+
+ANCHO = 1000
+MARGEN = 80
+VERDE = '#10b981'
+VERDE_OSCURO = '#059669'
+VERDE_TOTAL = '#064e3b'
+TEXTO = '#1f2937'
+GRIS = '#6b7280'
+GRIS_CLARO = '#9ca3af'
+BORDE = '#e5e7eb'
+
+_lock = threading.Lock()
+
+# --- DATOS ---
+
+def _mensaje_guardado(datos_json):
+    """'mensaje' del snapshot JSON que guarda WorkClientView (tela, apliqué...)."""
+    if isinstance(datos_json, str) and datos_json.lstrip().startswith('{'):
+        try:
+            return json.loads(datos_json).get('mensaje')
+        except (ValueError, AttributeError):
+            return None
+    return None
+
+def datos_ticket(cot, cliente_nombre, orden=None, mensaje=None):
+    """Todo lo que se dibuja en el ticket, en tipos simples (también define la versión)."""
+    datos = {
+        "cotizacion_id": cot.id,
+        "nombre_trabajo": cot.nombre_trabajo or 'Servicio de Bordado',
+        "cliente_nombre": cliente_nombre,
+        "fecha": cot.fecha_pedido.strftime('%d/%m/%Y') if cot.fecha_pedido else None,
+        "puntadas": cot.puntadas or 0,
+        "colores": cot.colores or 1,
+        "ancho": float(cot.ancho or 0),
+        "alto": float(cot.alto or 0),
+        "bastidor": cot.bastidor,
+        "tipo_tela": cot.tipo_tela,
+        "cantidad": cot.cantidad or 1,
+        "precio_unitario": float(cot.precio_unitario or 0),
+        "precio_total": float(cot.precio_total or 0),
+        "mensaje": mensaje or _mensaje_guardado(cot.datos_json),
+        # La imagen entra en la versión por su referencia guardada
+        "imagen": hashlib.sha1((cot.datos_json or '').encode()).hexdigest(),
+    }
+    if orden is not None:
+        datos.update({
+            "orden_id": orden.id,
+            "estado": orden.estado,
+            "fecha_entrega": orden.fecha_entrega.strftime('%d/%m/%Y') if orden.fecha_entrega else None,
+            "detail": orden.detail,
+        })
+    return datos
+
+def version_de(datos):
+    return hashlib.sha1(json.dumps([PLANTILLA, datos], sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def clave_de(datos):
+    return f"orden-{datos['orden_id']}" if 'orden_id' in datos else f"cot-{datos['cotizacion_id']}"
+
+# --- DIBUJO ---
+
+@lru_cache(maxsize=None)
+def _fuente(tamano, negrita=False):
+    candidatos = []
+    if TICKETS_FUENTE:
+        base, ext = os.path.splitext(TICKETS_FUENTE)
+        candidatos.append(f"{base}-Bold{ext}" if negrita else TICKETS_FUENTE)
+    candidatos += ['DejaVuSans-Bold.ttf', 'arialbd.ttf'] if negrita else ['DejaVuSans.ttf', 'arial.ttf']
+    for nombre in candidatos:
+        try:
+            return ImageFont.truetype(nombre, tamano)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=tamano)
+
+def _moneda(valor):
+    # Formato es-BO: Bs 1.234,50
+    return "Bs " + f"{valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+
+def _recortar(draw, texto, fuente, ancho):
+    if draw.textlength(texto, font=fuente) <= ancho:
+        return texto
+    while texto and draw.textlength(texto + '…', font=fuente) > ancho:
+        texto = texto[:-1]
+    return texto + '…'
+
+def _fila(draw, y, etiqueta, valor):
+    draw.text((MARGEN, y), etiqueta, font=_fuente(30, True), fill='#374151')
+    draw.text((ANCHO - MARGEN, y), valor, font=_fuente(30, True), fill=TEXTO, anchor='ra')
+    return y + 54
+
+def renderizar(datos, imagen=None):
+    """Dibuja el ticket (RGB) con los datos de datos_ticket() y la imagen del diseño."""
+    lienzo = Image.new('RGB', (ANCHO, 4000), 'white')
+    draw = ImageDraw.Draw(lienzo)
+    contenido = ANCHO - 2 * MARGEN
+    es_orden = 'orden_id' in datos
+
+    # Encabezado
+    y = MARGEN
+    draw.text((MARGEN, y), 'ORDEN DE TRABAJO' if es_orden else 'COTIZACIÓN', font=_fuente(52, True), fill='#111827')
+    draw.text((ANCHO - MARGEN, y + 6), 'ZEQUITEX', font=_fuente(36, True), fill=VERDE_OSCURO, anchor='ra')
+    numero = f"N° {datos['orden_id' if es_orden else 'cotizacion_id']:06d}"
+    if es_orden:
+        numero += f"  •  Cotización {datos['cotizacion_id']:06d}"
+    draw.text((MARGEN, y + 70), numero, font=_fuente(28, True), fill=GRIS)
+    if datos['fecha']:
+        draw.text((ANCHO - MARGEN, y + 56), datos['fecha'], font=_fuente(26), fill='#374151', anchor='ra')
+    ancho_cliente = 0
+    if datos['cliente_nombre']:
+        cliente = _recortar(draw, datos['cliente_nombre'], _fuente(28, True), contenido // 2)
+        draw.text((ANCHO - MARGEN, y + 116), cliente, font=_fuente(28, True), fill='black', anchor='ra')
+        ancho_cliente = draw.textlength(cliente, font=_fuente(28, True)) + 30
+    nombre = _recortar(draw, datos['nombre_trabajo'], _fuente(32), contenido - ancho_cliente)
+    draw.text((MARGEN, y + 112), nombre, font=_fuente(32), fill='#4b5563')
+    y += 180
+    draw.rectangle((MARGEN, y, ANCHO - MARGEN, y + 8), fill=VERDE)
+    y += 48
+
+    # Imagen central
+    alto_caja = 500
+    draw.rounded_rectangle((MARGEN, y, ANCHO - MARGEN, y + alto_caja), radius=16, outline=BORDE, width=2)
+    if imagen is not None:
+        imagen = imagen.convert('RGBA')
+        imagen.thumbnail((contenido - 60, alto_caja - 60), Image.LANCZOS)
+        x_img = (ANCHO - imagen.width) // 2
+        y_img = y + (alto_caja - imagen.height) // 2
+        lienzo.paste(imagen, (x_img, y_img), imagen)
+    else:
+        draw.text((ANCHO // 2, y + alto_caja // 2), 'Sin vista previa', font=_fuente(30), fill='#cccccc', anchor='mm')
+    y += alto_caja + 50
+
+    # Detalle
+    draw.text((MARGEN, y), 'DETALLE DEL TRABAJO', font=_fuente(28, True), fill=GRIS)
+    y += 44
+    draw.line((MARGEN, y, ANCHO - MARGEN, y), fill=BORDE, width=2)
+    y += 24
+    y = _fila(draw, y, 'Bordado / Puntadas', f"{datos['puntadas']:,} pts".replace(',', '.'))
+    y = _fila(draw, y, 'Colores', str(datos['colores']))
+    if datos['ancho'] and datos['alto']:
+        y = _fila(draw, y, 'Tamaño', f"{datos['ancho']:.1f} × {datos['alto']:.1f} cm")
+    if datos['bastidor']:
+        y = _fila(draw, y, 'Bastidor', datos['bastidor'])
+    if datos['tipo_tela']:
+        y = _fila(draw, y, 'Tela', datos['tipo_tela'])
+    if es_orden:
+        y = _fila(draw, y, 'Estado', (datos['estado'] or '').replace('_', ' ').capitalize())
+        if datos['fecha_entrega']:
+            y = _fila(draw, y, 'Entrega', datos['fecha_entrega'])
+    for nota in (datos.get('mensaje'), datos.get('detail') if es_orden else None):
+        if nota:
+            draw.text((MARGEN, y), _recortar(draw, nota, _fuente(26), contenido),
+                      font=_fuente(26), fill=GRIS)
+            y += 44
+    y += 10
+    draw.line((MARGEN, y, ANCHO - MARGEN, y), fill='#d1d5db', width=2)
+    y += 20
+    draw.text((MARGEN, y), 'Precio Unitario Base:', font=_fuente(28), fill='#4b5563')
+    draw.text((ANCHO - MARGEN, y), _moneda(datos['precio_unitario']), font=_fuente(28, True), fill='#374151', anchor='ra')
+    y += 80
+
+    # Totales
+    cantidad = max(datos['cantidad'], 1)
+    descuento = datos['precio_unitario'] * cantidad - datos['precio_total']
+    alto_total = 300 + (50 if descuento > 0.005 else 0)
+    draw.rounded_rectangle((MARGEN, y, ANCHO - MARGEN, y + alto_total), radius=24, fill=VERDE_TOTAL)
+    x1, x2 = MARGEN + 50, ANCHO - MARGEN - 50
+    yt = y + 50
+    draw.text((x1, yt), 'Cantidad Solicitada:', font=_fuente(30), fill='#d1fae5')
+    draw.text((x2, yt), f"{cantidad} pzs", font=_fuente(30, True), fill='white', anchor='ra')
+    yt += 50
+    if descuento > 0.005:
+        draw.text((x1, yt), 'Descuento Volumen:', font=_fuente(28, True), fill='#fca5a5')
+        draw.text((x2, yt), f"- {_moneda(descuento)}", font=_fuente(28, True), fill='#fca5a5', anchor='ra')
+        yt += 50
+    draw.line((x1, yt + 10, x2, yt + 10), fill='#4d7c6f', width=2)
+    yt += 40
+    draw.text((x1, yt + 18), 'TOTAL A PAGAR:', font=_fuente(40), fill='white')
+    draw.text((x2, yt), _moneda(datos['precio_total']), font=_fuente(64, True), fill='white', anchor='ra')
+    yt += 96
+    draw.text((x2, yt), f"Unitario Final: {_moneda(datos['precio_total'] / cantidad)} c/u",
+              font=_fuente(24), fill='#d1fae5', anchor='ra')
+    y += alto_total + 60
+
+    # Pie
+    draw.line((MARGEN, y, ANCHO - MARGEN, y), fill='#f3f4f6', width=2)
+    y += 30
+    draw.text((ANCHO // 2, y), 'Zequitex Soluciones Textiles • Cotización válida por 15 días',
+              font=_fuente(24), fill=GRIS_CLARO, anchor='ma')
+    return lienzo.crop((0, 0, ANCHO, y + 30 + MARGEN))
+
+def codificar(imagen, formato):
+    buffer = io.BytesIO()
+    if formato == 'pdf':
+        imagen.save(buffer, format='PDF', resolution=200)
+    else:
+        imagen.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+# --- CACHÉ ---
+
+def _ruta(clave, version, formato):
+    return os.path.join(TICKETS_DIR, clave, f"{version}.{formato}")
+
+def _podar():
+    archivos = []
+    for raiz, _, nombres in os.walk(TICKETS_DIR):
+        for nombre in nombres:
+            if not _es_ticket(nombre):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            try:
+                st = os.stat(ruta)
+                archivos.append((st.st_mtime, st.st_size, ruta))
+            except OSError:
+                continue
+    total = sum(tam for _, tam, _ in archivos)
+    if total <= TICKETS_MAX_BYTES:
+        return
+    for _, tam, ruta in sorted(archivos):
+        if total <= TICKETS_MAX_BYTES * 0.9:
+            break
+        try:
+            os.remove(ruta)
+            total -= tam
+        except OSError:
+            pass
+
+def _es_ticket(nombre):
+    """Ticket terminado (<versión>.png|pdf); los .tmp son de escritores en curso."""
+    return nombre.rpartition('.')[2] in FORMATOS
+
+def _guardar(clave, version, formato, contenido):
+    directorio = os.path.join(TICKETS_DIR, clave)
+    ruta = _ruta(clave, version, formato)
+    for intento in range(2):
+        os.makedirs(directorio, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directorio, prefix='.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenido)
+        try:
+            os.replace(tmp, ruta)
+            break
+        except FileNotFoundError:
+            # invalidar() borró el directorio mientras se dibujaba: se vuelve a crear
+            if intento:
+                raise
+    with _lock:
+        # Versiones anteriores del mismo ticket ya no sirven
+        try:
+            nombres = os.listdir(directorio)
+        except OSError:
+            nombres = []
+        for nombre in nombres:
+            if _es_ticket(nombre) and nombre.rpartition('.')[0] != version:
+                try:
+                    os.remove(os.path.join(directorio, nombre))
+                except OSError:
+                    pass
+        _podar()
+    return ruta
+
+def invalidar(clave):
+    """Borra los tickets cacheados de 'cot-<id>' u 'orden-<id>'."""
+    shutil.rmtree(os.path.join(TICKETS_DIR, clave), ignore_errors=True)
+
+def _imagen_de(cot):
+    try:
+        ruta = image_derivatives.obtener_para_cotizacion(cot, 'preview')
+    except Exception as e:
+        print(f"⚠️ Ticket sin imagen para cotización {cot.id}: {e}")
+        return None
+    if not ruta:
+        return None
+    with Image.open(ruta) as imagen:
+        return imagen.copy()
+
+def obtener(cot, cliente_nombre, formato='png', orden=None, mensaje=None):
+    """(ruta, versión) del ticket, dibujándolo solo si no está en caché."""
+    datos = datos_ticket(cot, cliente_nombre, orden, mensaje)
+    version = version_de(datos)
+    ruta = _ruta(clave_de(datos), version, formato)
+    if os.path.exists(ruta):
+        try:
+            os.utime(ruta)  # mtime = último uso, para la poda
+        except OSError:
+            pass
+        return ruta, version
+    imagen = _imagen_de(cot)
+    contenido = codificar(renderizar(datos, imagen), formato)
+    return _guardar(clave_de(datos), version, formato, contenido), version
+
+def historial_cliente(cliente_id, formato='png'):
+    """
+    ZIP (archivo temporal) con el ticket de cada cotización del cliente,
+    incluidas las archivadas; las que tienen orden salen como ticket de orden.
+    Se dibujan en paralelo y se reutiliza la caché.
+    """
+    activas = db_services.get_cotizaciones_by_client(cliente_id)
+    archivadas = db_services.get_cotizaciones_archivadas_by_client(cliente_id)
+    ordenes = {}
+    for modelo, lote in ((Orden, activas), (OrdenArchivada, archivadas)):
+        if lote:
+            ordenes.update({o.cotizacion_id: o for o in db.session.execute(
+                select(modelo).where(modelo.cotizacion_id.in_([c.id for c in lote]))).scalars()})
+    cotizaciones = activas + archivadas
+    cliente_nombre = db_services.get_client_names([cliente_id]).get(cliente_id)
+
+    def tarea(cot):
+        orden = ordenes.get(cot.id)
+        ruta, _ = obtener(cot, cliente_nombre, formato, orden)
+        nombre = f"orden_{orden.id:06d}" if orden else f"cotizacion_{cot.id:06d}"
+        return f"{nombre}.{formato}", ruta
+
+    archivo = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+    with ThreadPoolExecutor(max_workers=TICKETS_WORKERS) as pool, \
+            zipfile.ZipFile(archivo, 'w', zipfile.ZIP_STORED) as zf:  # PNG/PDF ya vienen comprimidos
+        for nombre, ruta in pool.map(tarea, cotizaciones):
+            zf.write(ruta, nombre)
+    archivo.seek(0)
+    return archivo, len(cotizaciones)
@@ -211,7 +211,9 @@ function App() {
           precio_unitario: precioUnitarioAjustado,
           precio_total: totalFinal,
           datos_json: result.imagen_procesada ? result.imagen_procesada : null,
-          personal_id: currentUser ? currentUser.id : null
+          personal_id: currentUser ? currentUser.id : null,
+          huella: result.huella ?? null,
+          imagen_id: result.imagen_id ?? null
       };
 
       try {
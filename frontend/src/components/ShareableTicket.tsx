@@ -2,6 +2,7 @@ import { useRef, useState } from 'react';
 import html2canvas from 'html2canvas';
 import type { ProcessResult, Config, Client } from '../types';
 import { AlertModal } from './ui/AlertModal'; 
+import { api } from '../services/api';
 
 interface Props {
   result: ProcessResult;
@@ -100,113 +101,115 @@ export const ShareableTicket = ({ result, config, quantity, jobName, client, cot
     setIsSharing(true);
 
     try {
-      // 3. Generar Imagen (PNG)
-      const canvas = await html2canvas(ticketRef.current, {
-        scale: 2,
-        backgroundColor: '#ffffff',
-        useCORS: true, 
-        logging: false
-      });
-
-      canvas.toBlob(async (blob) => {
-        if (!blob) {
-          showError('Error al generar la imagen del ticket.');
-          return;
-        }
-
-        // Construir mensaje de WhatsApp con formato requerido
-        const textLines = [
-          `📋 *COTIZACIÓN #${cotizacionId}*`,
-          ``,
-          `Hola ${client.nombre}, aquí tienes tu cotización para "${jobName || 'Bordado'}":`,
-          ``,
-          `🧵 *Puntadas:* ${result.estimatedStitches ? Math.round(result.estimatedStitches).toLocaleString() : 0} pts`,
-          `💰 *Costo bordado:* ${formatMoney(costoPuntadas)}`,
-          `📦 *Otros costos:* ${formatMoney(costoOtros)}`,
-          ``,
-          `💵 *TOTAL: ${formatMoney(totalPagar)}* (${quantity} pzs)`,
-        ];
-        
-        if (mensajeAdicional && mensajeAdicional.trim()) {
-          textLines.push(``);
-          textLines.push(`📝 ${mensajeAdicional}`);
-        }
-        
+      // 3. Imagen (PNG): la dibuja el servidor desde lo guardado (cacheada);
+      // si no está disponible se captura la plantilla oculta con html2canvas
+      let blob = await api.getTicketBlob(cotizacionId, mensajeAdicional);
+      if (!blob && ticketRef.current) {
+        const canvas = await html2canvas(ticketRef.current, {
+          scale: 2,
+          backgroundColor: '#ffffff',
+          useCORS: true, 
+          logging: false
+        });
+        blob = await new Promise<Blob | null>(resolve => canvas.toBlob(resolve, 'image/png', 1.0));
+      }
+      if (!blob) {
+        showError('Error al generar la imagen del ticket.');
+        return;
+      }
+
+      // Construir mensaje de WhatsApp con formato requerido
+      const textLines = [
+        `📋 *COTIZACIÓN #${cotizacionId}*`,
+        ``,
+        `Hola ${client.nombre}, aquí tienes tu cotización para "${jobName || 'Bordado'}":`,
+        ``,
+        `🧵 *Puntadas:* ${result.estimatedStitches ? Math.round(result.estimatedStitches).toLocaleString() : 0} pts`,
+        `💰 *Costo bordado:* ${formatMoney(costoPuntadas)}`,
+        `📦 *Otros costos:* ${formatMoney(costoOtros)}`,
+        ``,
+        `💵 *TOTAL: ${formatMoney(totalPagar)}* (${quantity} pzs)`,
+      ];
+      
+      if (mensajeAdicional && mensajeAdicional.trim()) {
         textLines.push(``);
-        textLines.push(`(Te adjunto el detalle en la imagen 👇)`);
+        textLines.push(`📝 ${mensajeAdicional}`);
+      }
+      
+      textLines.push(``);
+      textLines.push(`(Te adjunto el detalle en la imagen 👇)`);
 
-        const textMessage = textLines.join('\n');
-        
-        const waLink = getWhatsAppLink(textMessage);
-        const hasValidPhone = client.numero_referencia && client.numero_referencia.replace(/\D/g, '').length > 5;
-        const file = new File([blob], 'cotizacion.png', { type: 'image/png' });
-        
-        let nativeShareSuccess = false;
+      const textMessage = textLines.join('\n');
+      
+      const waLink = getWhatsAppLink(textMessage);
+      const hasValidPhone = client.numero_referencia && client.numero_referencia.replace(/\D/g, '').length > 5;
+      const file = new File([blob], 'cotizacion.png', { type: 'image/png' });
+      
+      let nativeShareSuccess = false;
+
+      // INTENTO 1: Share Nativo (SOLO MÓVIL)
+      if (isMobile() && navigator.share && navigator.canShare && navigator.canShare({ files: [file] })) {
+        try {
+          await navigator.share({
+            files: [file],
+            title: `Cotización ${cotizacionId ? '#' + cotizacionId : ''}`,
+            text: textMessage
+          });
+          nativeShareSuccess = true;
+        } catch (err: any) {
+           if (err.name === 'AbortError') {
+               setIsSharing(false);
+               return; // Usuario canceló explícitamente
+           }
+           console.log("Share nativo falló:", err);
+        }
+      }
 
-        // INTENTO 1: Share Nativo (SOLO MÓVIL)
-        if (isMobile() && navigator.share && navigator.canShare && navigator.canShare({ files: [file] })) {
+      if (nativeShareSuccess) {
+          setIsSharing(false);
+          return;
+      }
+
+      // INTENTO 2: Fallback según dispositivo
+      if (isMobile()) {
+          // == FALLBACK MÓVIL: DESCARGAR IMAGEN ==
+          const link = document.createElement('a');
+          link.href = URL.createObjectURL(blob);
+          link.download = `Cotizacion_${cotizacionId || 'zequitex'}.png`;
+          document.body.appendChild(link);
+          link.click();
+          document.body.removeChild(link);
+          
+          setModalConfig({
+              title: 'Imagen Descargada',
+              message: '📥 La imagen se guardó en tu dispositivo.\n\nPuedes abrirla y compartirla a la aplicación que desees (Facebook, WhatsApp, etc.).',
+              type: 'success'
+          });
+          setModalOpen(true);
+      } else {
+          // == FALLBACK PC: CLIPBOARD + WHATSAPP ==
           try {
-            await navigator.share({
-              files: [file],
-              title: `Cotización ${cotizacionId ? '#' + cotizacionId : ''}`,
-              text: textMessage
-            });
-            nativeShareSuccess = true;
-          } catch (err: any) {
-             if (err.name === 'AbortError') {
-                 setIsSharing(false);
-                 return; // Usuario canceló explícitamente
-             }
-             console.log("Share nativo falló:", err);
-          }
-        }
+            const item = new ClipboardItem({ 'image/png': blob });
+            await navigator.clipboard.write([item]);
+            setPendingWaLink(waLink);
 
-        if (nativeShareSuccess) {
-            setIsSharing(false);
-            return;
-        }
+            const msgExito = hasValidPhone 
+              ? `✅ Imagen copiada.\nSe abrirá WhatsApp con ${client.nombre}.\nPresiona PEGAR (Ctrl + V).`
+              : `✅ Imagen copiada.\nEl cliente no tiene un número válido.\nPresiona PEGAR (Ctrl + V).`;
 
-        // INTENTO 2: Fallback según dispositivo
-        if (isMobile()) {
-            // == FALLBACK MÓVIL: DESCARGAR IMAGEN ==
-            const link = document.createElement('a');
-            link.href = URL.createObjectURL(blob);
-            link.download = `Cotizacion_${cotizacionId || 'zequitex'}.png`;
-            document.body.appendChild(link);
-            link.click();
-            document.body.removeChild(link);
-            
             setModalConfig({
-                title: 'Imagen Descargada',
-                message: '📥 La imagen se guardó en tu dispositivo.\n\nPuedes abrirla y compartirla a la aplicación que desees (Facebook, WhatsApp, etc.).',
-                type: 'success'
+              title: 'Listo para enviar',
+              message: msgExito,
+              type: 'success'
             });
             setModalOpen(true);
-        } else {
-            // == FALLBACK PC: CLIPBOARD + WHATSAPP ==
-            try {
-              const item = new ClipboardItem({ 'image/png': blob });
-              await navigator.clipboard.write([item]);
-              setPendingWaLink(waLink);
-
-              const msgExito = hasValidPhone 
-                ? `✅ Imagen copiada.\nSe abrirá WhatsApp con ${client.nombre}.\nPresiona PEGAR (Ctrl + V).`
-                : `✅ Imagen copiada.\nEl cliente no tiene un número válido.\nPresiona PEGAR (Ctrl + V).`;
-
-              setModalConfig({
-                title: 'Listo para enviar',
-                message: msgExito,
-                type: 'success'
-              });
-              setModalOpen(true);
-            } catch (err) {
-              console.error(err);
-              showError('Tu navegador no soporta copiado automático. Captura la pantalla manualmente.');
-            }
-        }
+          } catch (err) {
+            console.error(err);
+            showError('Tu navegador no soporta copiado automático. Captura la pantalla manualmente.');
+          }
+      }
 
-        setIsSharing(false);
-      }, 'image/png', 1.0);
+      setIsSharing(false);
     } catch (err) {
       console.error(err);
       showError('Error inesperado.');
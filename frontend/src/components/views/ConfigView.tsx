@@ -17,6 +17,32 @@ import checkIcon from '../../assets/images/check.svg';
 import cancelIcon from '../../assets/images/cancel.svg';
 import processIcon from '../../assets/images/process.svg';
 
+// WorkClientView muestra cualquier documento con la forma de una cotización: para
+// una orden se usan los datos de su cotización que manda el backend y el id de
+// la orden (con docType 'orden' el detalle completo se pide por ese id)
+const ordenComoDocumento = (orden: Orden): Order => ({
+  id: orden.id,
+  cliente_id: orden.cliente_id ?? 0,
+  configuracion_id: 0,
+  nombre_trabajo: orden.nombre_trabajo ?? '',
+  fecha_pedido: orden.fecha_pedido ?? orden.fecha_creacion,
+  puntadas: orden.puntadas ?? 0,
+  colores: orden.colores ?? 1,
+  ancho: orden.ancho ?? 0,
+  alto: orden.alto ?? 0,
+  bastidor: orden.bastidor ?? '',
+  tipo_tela: orden.tipo_tela ?? '',
+  tiene_sublimacion: orden.tiene_sublimacion ?? false,
+  cantidad: orden.cantidad ?? 0,
+  precio_unitario: orden.precio_unitario ?? 0,
+  precio_total: orden.precio_total ?? 0,
+  datos_json: orden.datos_json ?? '',
+  detalles: orden.detail ?? undefined,
+  cliente_nombre: orden.cliente_nombre,
+  personal_id: orden.personal_id,
+  personal_nombre: orden.personal_nombre
+});
+
 interface Props {
   config: Config;
   setConfig: (c: Config) => void;
@@ -67,10 +93,12 @@ export const ConfigView = ({ config, setConfig, setView, setIsLoggedIn, currentU
 
   const [confirmModal, setConfirmModal] = useState<{isOpen: boolean, id: number, type: 'user'|'client'}>({isOpen: false, id: 0, type: 'user'});
   const [alertInfo, setAlertInfo] = useState<{open: boolean, msg: string}>({open: false, msg: ''});
+  const [downloadingTickets, setDownloadingTickets] = useState(false);
 
   const [clientOptionsModal, setClientOptionsModal] = useState<Client | null>(null);
   const [viewMode, setViewMode] = useState<'cotizaciones' | 'ordenes' | null>(null);
   const [clientOrdenes, setClientOrdenes] = useState<Orden[]>([]);
+  const [workspacePage, setWorkspacePage] = useState<{ page: number; hasMore: boolean }>({ page: 1, hasMore: false });
   
   const [orderFromCotizacion, setOrderFromCotizacion] = useState<Order | null>(null);
   const [newOrderFechaEntrega, setNewOrderFechaEntrega] = useState('');
@@ -99,28 +127,65 @@ export const ConfigView = ({ config, setConfig, setView, setIsLoggedIn, currentU
     setViewMode(null);
   };
 
+  // Cotizaciones (paginadas) y sus órdenes en una sola petición
+  const fetchClientWorkspace = async (clientId: number, page = 1) => {
+      const ws = await api.getClientWorkspace(clientId, page);
+      setClientOrders(prev => page === 1 ? ws.cotizaciones : [...prev, ...ws.cotizaciones]);
+      setClientOrdenes(prev => page === 1 ? ws.ordenes : [...prev, ...ws.ordenes]);
+      setWorkspacePage({ page: ws.page, hasMore: ws.has_more });
+  };
+
   const loadClientCotizaciones = async (client: Client) => {
       setSelectedClientForOrders(client);
       setClientOptionsModal(null);
       setViewMode('cotizaciones');
       setClientOrders([]); 
+      setClientOrdenes([]);
       try {
-          const orders = await api.getClientOrders(client.id);
-          setClientOrders(orders);
+          await fetchClientWorkspace(client.id);
       } catch { setAlertInfo({open: true, msg: "Error cargando cotizaciones"}); }
   };
 
+  const loadMoreClientWorkspace = async () => {
+      if (!selectedClientForOrders) return;
+      try {
+          await fetchClientWorkspace(selectedClientForOrders.id, workspacePage.page + 1);
+      } catch { setAlertInfo({open: true, msg: viewMode === 'ordenes' ? "Error cargando órdenes" : "Error cargando cotizaciones"}); }
+  };
+
+  // Las órdenes salen del mismo workspace: las de las cotizaciones cargadas, con "Cargar más"
   const loadClientOrdenes = async (client: Client) => {
       setSelectedClientForOrders(client);
       setClientOptionsModal(null);
       setViewMode('ordenes');
+      setClientOrders([]);
       setClientOrdenes([]);
       try {
-          const clientOrdenesData = await api.getClientOrdenes(client.id);
-          setClientOrdenes(clientOrdenesData);
+          await fetchClientWorkspace(client.id);
       } catch { setAlertInfo({open: true, msg: "Error cargando órdenes"}); }
   };
 
+  const handleDownloadTickets = async (clientId: number) => {
+    setDownloadingTickets(true);
+    try {
+      const zip = await api.getClientTicketsBlob(clientId);
+      if (!zip) {
+        setAlertInfo({ open: true, msg: 'Error al descargar los tickets' });
+        return;
+      }
+      const url = URL.createObjectURL(zip.blob);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = zip.nombre;
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      setTimeout(() => URL.revokeObjectURL(url), 1000);
+    } finally {
+      setDownloadingTickets(false);
+    }
+  };
+
   const handleCreateOrderFromCotizacion = async () => {
     if (!orderFromCotizacion) return;
     try {
@@ -134,8 +199,7 @@ export const ConfigView = ({ config, setConfig, setView, setIsLoggedIn, currentU
       setNewOrderFechaEntrega('');
       setRefreshOrdenesTrigger(prev => prev + 1); // Forzar recarga de OrdenesView
       if (selectedClientForOrders) {
-        const updatedOrders = await api.getClientOrders(selectedClientForOrders.id);
-        setClientOrders(updatedOrders);
+        await fetchClientWorkspace(selectedClientForOrders.id);
       }
     } catch {
       setAlertInfo({ open: true, msg: 'Error al crear orden' });
@@ -154,8 +218,7 @@ export const ConfigView = ({ config, setConfig, setView, setIsLoggedIn, currentU
           setAlertInfo({ open: true, msg: '✅ Nueva cotización generada correctamente' });
           setViewingOrder(null); 
           if (selectedClientForOrders) {
-              const updatedOrders = await api.getClientOrders(selectedClientForOrders.id);
-              setClientOrders(updatedOrders);
+              await fetchClientWorkspace(selectedClientForOrders.id);
           }
       } catch { setAlertInfo({ open: true, msg: 'Error al generar cotización' }); }
   };
@@ -341,7 +404,14 @@ export const ConfigView = ({ config, setConfig, setView, setIsLoggedIn, currentU
                         <div className="modal-card modal-lg">
                             <div className="card-header">
                                 <h3><img src={cotizacionIcon} className="icono-img icono-cotizacion" alt="cotización" /> Cotizaciones: {selectedClientForOrders.nombre}</h3>
-                                <button className="icon-btn" onClick={() => { setSelectedClientForOrders(null); setViewMode(null); }}><img src={closeIcon} className="icono-img icono-close icono-no-margin" alt="cerrar" /></button>
+                                <div style={{ display: 'flex', alignItems: 'center', gap: '8px' }}>
+                                    {clientOrders.length > 0 && (
+                                        <button className="btn-secondary sm" disabled={downloadingTickets} onClick={() => handleDownloadTickets(selectedClientForOrders.id)}>
+                                            {downloadingTickets ? 'Descargando...' : 'Descargar tickets (ZIP)'}
+                                        </button>
+                                    )}
+                                    <button className="icon-btn" onClick={() => { setSelectedClientForOrders(null); setViewMode(null); }}><img src={closeIcon} className="icono-img icono-close icono-no-margin" alt="cerrar" /></button>
+                                </div>
                             </div>
                             <div className="table-container-scroll cotizacion-clientes">
                                 {clientOrders.length === 0 ? <p>No hay cotizaciones guardadas.</p> : (
@@ -354,19 +424,29 @@ export const ConfigView = ({ config, setConfig, setView, setIsLoggedIn, currentU
                                             </tr>
                                         </thead>
                                         <tbody>
-                                            {clientOrders.map(o => (
+                                            {clientOrders.map(o => {
+                                                const orden = clientOrdenes.find(x => x.cotizacion_id === o.id);
+                                                return (
                                                 <tr key={o.id}>
                                                     <td>{new Date(o.fecha_pedido).toLocaleDateString()}</td>
                                                     <td className="font-bold text-sm">{o.nombre_trabajo}</td>
                                                     <td className="text-right">
                                                         <button className="btn-secondary sm" onClick={() => { setViewingOrder(o); setViewingDocType('cotizacion'); }}><img src={viewIcon} className="icono-img icono-view" alt="ver" /> Ver</button>
-                                                        <button className="btn-main sm" onClick={() => setOrderFromCotizacion(o)}><img src={ordenIcon} className="icono-img icono-orden" alt="orden" /> Ordenar</button>
+                                                        {orden ? (
+                                                            <button className="btn-secondary sm" onClick={() => { setViewingOrder(ordenComoDocumento(orden)); setViewingDocType('orden'); }}><img src={ordenIcon} className="icono-img icono-orden" alt="orden" /> Ver orden</button>
+                                                        ) : (
+                                                            <button className="btn-main sm" onClick={() => setOrderFromCotizacion(o)}><img src={ordenIcon} className="icono-img icono-orden" alt="orden" /> Ordenar</button>
+                                                        )}
                                                     </td>
                                                 </tr>
-                                            ))}
+                                                );
+                                            })}
                                         </tbody>
                                     </table>
                                 )}
+                                {workspacePage.hasMore && (
+                                    <button className="btn-secondary sm" onClick={loadMoreClientWorkspace}>Cargar más</button>
+                                )}
                             </div>
                         </div>
                     </div>
@@ -381,7 +461,7 @@ export const ConfigView = ({ config, setConfig, setView, setIsLoggedIn, currentU
                                 <button className="icon-btn" onClick={() => { setSelectedClientForOrders(null); setViewMode(null); }}><img src={closeIcon} className="icono-img icono-close icono-no-margin" alt="cerrar" /></button>
                             </div>
                             <div className="table-container-scroll">
-                                {clientOrdenes.length === 0 ? <p>No hay órdenes para este cliente.</p> : (
+                                {clientOrdenes.length === 0 ? <p>{workspacePage.hasMore ? 'No hay órdenes en las cotizaciones más recientes.' : 'No hay órdenes para este cliente.'}</p> : (
                                     <table className="data-table">
                                         <thead>
                                             <tr>
@@ -402,13 +482,16 @@ export const ConfigView = ({ config, setConfig, setView, setIsLoggedIn, currentU
                                                     </td>
                                                     <td>{o.fecha_entrega ? new Date(o.fecha_entrega).toLocaleDateString() : '—'}</td>
                                                     <td>
-                                                        <button className="btn-secondary sm" onClick={() => { setViewingOrder(o as unknown as Order); setViewingDocType('orden'); }}><img src={viewIcon} className="icono-img icono-view" alt="ver" /> Ver</button>
+                                                        <button className="btn-secondary sm" onClick={() => { setViewingOrder(ordenComoDocumento(o)); setViewingDocType('orden'); }}><img src={viewIcon} className="icono-img icono-view" alt="ver" /> Ver</button>
                                                     </td>
                                                 </tr>
                                             ))}
                                         </tbody>
                                     </table>
                                 )}
+                                {workspacePage.hasMore && (
+                                    <button className="btn-secondary sm" onClick={loadMoreClientWorkspace}>Cargar más</button>
+                                )}
                             </div>
                         </div>
                     </div>
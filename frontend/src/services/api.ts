@@ -1,17 +1,53 @@
-import type { Config, ProcessResult, LoginResponse, User, Client, Pricing, Orden, Cotizacion } from '../types';
+import type { Config, ProcessResult, LoginResponse, User, Client, Pricing, Orden, Cotizacion, OrdenesChanges, ClientWorkspace } from '../types';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
 //const API_URL = 'http://192.168.40.116:5000'
 // Cabecera indispensable para que zrok no bloquee la conexión
-const headersBase = {
+const headersBase: Record<string, string> = {
   "skip_zrok_interstitial": "true"
 };
 
-const headersJson = {
+const headersJson: Record<string, string> = {
   ...headersBase,
   "Content-Type": "application/json"
 };
 
+// Leer lo propio con réplicas: tras una escritura el servidor manda X-Write-Token
+// y se reenvía en las peticiones siguientes para que lean de la primaria
+const recordarEscritura = (res: Response) => {
+  const token = res.headers.get('X-Write-Token');
+  if (token) {
+    headersBase['X-Write-Token'] = token;
+    headersJson['X-Write-Token'] = token;
+  }
+};
+
+// Idempotency-Key: la misma clave en cada reintento de una creación, así el
+// servidor devuelve el resultado original en vez de insertar de nuevo
+const nuevaClave = (): string =>
+  typeof crypto !== 'undefined' && 'randomUUID' in crypto
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+
+const esperar = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+// POST de creación con reintentos ante fallas de red o 409 "todavía en proceso"
+const postIdempotente = async (url: string, body: unknown, intentos = 3): Promise<Response> => {
+  const headers = { ...headersJson, 'Idempotency-Key': nuevaClave() };
+  const cuerpo = JSON.stringify(body);
+  for (let intento = 1; ; intento++) {
+    try {
+      const res = await fetch(url, { method: 'POST', headers, body: cuerpo });
+      const enProceso = res.status === 409 && res.headers.has('Retry-After');
+      if (!enProceso || intento >= intentos) return res;
+      await esperar(Number(res.headers.get('Retry-After')) * 1000 || 1000);
+    } catch (err) {
+      if (intento >= intentos) throw err;
+      await esperar(500 * intento);
+    }
+  }
+};
+
 export const api = {
   // --- CONFIGURACIÓN ---
   getConfig: async (): Promise<Config> => {
@@ -26,6 +62,7 @@ export const api = {
       headers: headersJson,
       body: JSON.stringify(config)
     });
+    recordarEscritura(res);
     return res.json();
   },
 
@@ -41,6 +78,7 @@ export const api = {
       headers: headersJson,
       body: JSON.stringify({ username, password })
     });
+    recordarEscritura(res);
     return res.json();
   },
 
@@ -58,6 +96,7 @@ export const api = {
       headers: headersJson,
       body: JSON.stringify(user)
     });
+    recordarEscritura(res);
     return res.json();
   },
 
@@ -66,6 +105,7 @@ export const api = {
       method: 'DELETE',
       headers: headersBase 
     });
+    recordarEscritura(res);
     return res.json();
   },
 
@@ -83,6 +123,7 @@ export const api = {
       headers: headersJson,
       body: JSON.stringify(client)
     });
+    recordarEscritura(res);
     return res.json();
   },
 
@@ -91,6 +132,7 @@ export const api = {
       method: 'DELETE',
       headers: headersBase 
     });
+    recordarEscritura(res);
     return res.json();
   },
 
@@ -101,6 +143,7 @@ export const api = {
       headers: headersBase, // IMPORTANTE: Sin Content-Type aquí
       body: formData
     });
+    recordarEscritura(res);
     const data = await res.json();
     if (!res.ok || !data.success) throw new Error(data.message || 'Error al procesar');
     return data;
@@ -122,22 +165,66 @@ export const api = {
     return res.json();
   },
 
+  // Cliente + cotizaciones paginadas + sus órdenes en un solo viaje
+  getClientWorkspace: async (clientId: number, page = 1, perPage = 100): Promise<ClientWorkspace> => {
+    const params = new URLSearchParams({ page: String(page), per_page: String(perPage) });
+    const res = await fetch(`${API_URL}/clients/${clientId}/workspace?${params}`, { headers: headersBase });
+    if (!res.ok) throw new Error('Error al obtener el cliente');
+    return res.json();
+  },
+
+  // Sin `since` devuelve solo el cursor actual (pedirlo antes de cargar la lista)
+  getOrdenesChanges: async (since?: number, options: { wait?: number; clienteId?: number } = {}): Promise<OrdenesChanges> => {
+    const params = new URLSearchParams();
+    if (since !== undefined) params.set('since', String(since));
+    if (options.wait) params.set('wait', String(options.wait));
+    if (options.clienteId !== undefined) params.set('cliente_id', String(options.clienteId));
+    const res = await fetch(`${API_URL}/ordenes/changes?${params}`, { headers: headersBase });
+    return res.json();
+  },
+
   getOrdenDetail: async (id: number): Promise<Orden> => {
     const res = await fetch(`${API_URL}/ordenes/${id}`, { headers: headersBase });
     return res.json();
   },
 
+  // Miniatura WebP cacheada en el servidor (id de cotización o imagen_id de /process)
+  getImageUrl: (id: number | string, size: 'thumb' | 'preview' = 'thumb'): string => {
+    return `${API_URL}/images/${id}/${size}`;
+  },
+
+  // Ticket PNG dibujado en el servidor; null si no se pudo generar
+  getTicketBlob: async (cotizacionId: number, mensaje?: string): Promise<Blob | null> => {
+    const params = new URLSearchParams({ formato: 'png' });
+    if (mensaje && mensaje.trim()) params.set('mensaje', mensaje.trim());
+    try {
+      const res = await fetch(`${API_URL}/orders/${cotizacionId}/ticket?${params}`, { headers: headersBase });
+      return res.ok ? await res.blob() : null;
+    } catch {
+      return null;
+    }
+  },
+
+  // ZIP con los tickets del cliente; por fetch (no con un <a href>) para mandar la cabecera de zrok
+  getClientTicketsBlob: async (clientId: number, formato: 'png' | 'pdf' = 'pdf'): Promise<{ blob: Blob; nombre: string } | null> => {
+    try {
+      const res = await fetch(`${API_URL}/clients/${clientId}/tickets?formato=${formato}`, { headers: headersBase });
+      if (!res.ok) return null;
+      const nombre = /filename="?([^";]+)"?/.exec(res.headers.get('Content-Disposition') || '')?.[1];
+      return { blob: await res.blob(), nombre: nombre || `tickets_cliente_${clientId}.zip` };
+    } catch {
+      return null;
+    }
+  },
+
   getCotizacionDetail: async (id: number): Promise<Cotizacion> => {
     const res = await fetch(`${API_URL}/orders/${id}`, { headers: headersBase }); 
     return res.json();
   },
 
   createOrden: async (data: any) => {
-    const res = await fetch(`${API_URL}/ordenes`, {
-      method: 'POST',
-      headers: headersJson,
-      body: JSON.stringify(data)
-    });
+    const res = await postIdempotente(`${API_URL}/ordenes`, data);
+    recordarEscritura(res);
     return res.json();
   },
 
@@ -147,6 +234,7 @@ export const api = {
       headers: headersJson,
       body: JSON.stringify(data)
     });
+    recordarEscritura(res);
     return res.json();
   },
 
@@ -155,15 +243,13 @@ export const api = {
       method: 'DELETE',
       headers: headersBase
     });
+    recordarEscritura(res);
     return res.json();
   },
 
   saveOrder: async (orderData: any): Promise<{success: boolean, id: number, message?: string}> => {
-    const res = await fetch(`${API_URL}/orders`, {
-      method: 'POST',
-      headers: headersJson,
-      body: JSON.stringify(orderData)
-    });
+    const res = await postIdempotente(`${API_URL}/orders`, orderData);
+    recordarEscritura(res);
     if (!res.ok) {
         const err = await res.json();
         throw new Error(err.message || 'Error al guardar cotización');
@@ -28,6 +28,9 @@ export interface ProcessResult {
   
   precio_sugerido: number; // Precio final total
   imagen_procesada: string; // Base64
+  imagen_id?: string;       // Para /images/<imagen_id>/thumb|preview
+  huella?: string;          // Hash perceptual del diseño; se manda al guardar la cotización
+  similares?: CotizacionSimilar[]; // Cotizaciones anteriores con un diseño parecido
   
   // Campos opcionales de error
   message?: string;
@@ -35,6 +38,22 @@ export interface ProcessResult {
   mensaje?: string;
 }
 
+export interface CotizacionSimilar {
+  cotizacion_id: number;
+  cliente_id: number;
+  nombre_trabajo: string;
+  fecha_pedido: string | null;
+  puntadas: number;
+  colores: number;
+  ancho: number;
+  alto: number;
+  precio_unitario: number;
+  precio_total: number;
+  con_orden: boolean;
+  distancia_silueta: number; // bits distintos (0-64) del hash de la silueta
+  distancia_detalle: number; // bits distintos (0-64) del hash de luminancia
+}
+
 export interface Config {
   pricing: Pricing;
   discounts: any[]; 
@@ -123,6 +142,7 @@ export interface Orden {
   detail: string | null;
   fecha_creacion: string;
   // Datos expandidos de la cotización (enviados por el backend)
+  cliente_id?: number;
   nombre_trabajo?: string;
   cliente_nombre?: string;
   precio_total?: number;
@@ -142,5 +162,33 @@ export interface Orden {
   personal_nombre?: string;
 }
 
+// Feed incremental: GET /ordenes/changes
+export type CambioOrden =
+  | { tipo: 'orden'; op: 'upsert'; id: number; data: Orden }
+  | { tipo: 'cotizacion'; op: 'upsert'; id: number; data: Cotizacion }
+  | { tipo: 'orden' | 'cotizacion'; op: 'delete'; id: number };
+
+export interface OrdenesChanges {
+  success: boolean;
+  cursor: number;
+  changes: CambioOrden[];
+  has_more: boolean;
+  // true: el cursor ya no sirve, hay que recargar la lista completa
+  reset: boolean;
+}
+
+// GET /clients/:id/workspace: cliente, una página de cotizaciones y sus órdenes
+export interface ClientWorkspace {
+  success: boolean;
+  cliente: Client;
+  cotizaciones: Cotizacion[];
+  ordenes: Orden[];
+  // id del personal -> nombre
+  personal: Record<string, string>;
+  page: number;
+  per_page: number;
+  has_more: boolean;
+}
+
 export type TabMode = 'upload' | 'camera' | 'manual';
 export type View = 'main' | 'config' | 'login' | 'ordenes';